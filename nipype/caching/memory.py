@@ -28,7 +28,7 @@ class PipeFunc(object):
             out = fsl_merge(in_files=files, dimension='t')
     """
 
-    def __init__(self, interface, base_dir, callback=None):
+    def __init__(self, interface, base_dir, callback=None, memory=None):
         """
 
             Parameters
@@ -41,6 +41,10 @@ class PipeFunc(object):
             callback: a callable
                 An optional callable called each time after the function
                 is called.
+            memory: a Memory object
+                An optional Memory tracking the accesses to the cache
+                (and evicting old computations) each time the function
+                is called.
         """
         if not (isinstance(interface, type) and issubclass(interface, BaseInterface)):
             raise ValueError(
@@ -56,6 +60,7 @@ class PipeFunc(object):
         doc = "%s\n%s" % (self.interface.__doc__, self.interface.help(returnhelp=True))
         self.__doc__ = doc
         self.callback = callback
+        self.memory = memory
 
     def __call__(self, **kwargs):
         kwargs = modify_paths(kwargs, relative=False)
@@ -74,15 +79,22 @@ class PipeFunc(object):
         node = Node(interface, name=job_name)
         node.base_dir = os.path.join(self.base_dir, dir_name)
 
+        # Results files are only written when the interface is run
+        resultfile = os.path.join(node.output_dir(), "result_%s.pklz" % job_name)
+        mtime = os.stat(resultfile).st_mtime_ns if os.path.exists(resultfile) else None
+
         cwd = os.getcwd()
         try:
             out = node.run()
+            cached = mtime is not None and os.stat(resultfile).st_mtime_ns == mtime
         finally:
             # node.run() changes to the node directory - if something goes
             # wrong before it cds back you would end up in strange places
             os.chdir(cwd)
         if self.callback is not None:
             self.callback(dir_name, job_name)
+        if self.memory is not None:
+            self.memory._access(dir_name, job_name, cached)
         return out
 
     def __repr__(self):
@@ -154,6 +166,13 @@ class Memory(object):
         ==========
         base_dir: string
             The directory name of the location for the caching
+        max_bytes: integer, optional
+            The size budget of the cache: after each call of a cached
+            interface, the least recently used runs are removed until
+            the cache fits in max_bytes
+        max_days: float, optional
+            After each call of a cached interface, the runs that were not
+            used in the last max_days days are removed
 
         Methods
         =======
@@ -165,15 +184,25 @@ class Memory(object):
         clear_previous_runs
             Removes from the disk all the runs that where not used after
             the given time
+        evict
+            Removes from the disk the least recently used runs beyond
+            a size budget, or not used for a given time
+        stats
+            Reports the cache hits and misses, and the size on disk of
+            the runs of each interface
     """
 
-    def __init__(self, base_dir):
+    def __init__(self, base_dir, max_bytes=None, max_days=None):
         base_dir = os.path.join(os.path.abspath(base_dir), "nipype_mem")
         if not os.path.exists(base_dir):
             os.mkdir(base_dir)
         elif not os.path.isdir(base_dir):
             raise ValueError("base_dir should be a directory")
         self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_days = max_days
+        self._counts = dict()
+        self._sizes = dict()
         open(os.path.join(base_dir, "log.current"), "a").close()
 
     def cache(self, interface):
@@ -215,7 +244,7 @@ class Memory(object):
             >>> results.outputs.merged_file # doctest: +SKIP
             '...'
         """
-        return PipeFunc(interface, self.base_dir, _MemoryCallback(self))
+        return PipeFunc(interface, self.base_dir, _MemoryCallback(self), memory=self)
 
     def _log_name(self, dir_name, job_name):
         """ Increment counters tracking which cached function get executed.
@@ -242,6 +271,110 @@ class Memory(object):
         with open(os.path.join(month_dir, "%02i.log" % t.tm_mday), "a") as rotatefile:
             rotatefile.write("%s/%s\n" % (dir_name, job_name))
 
+    def _access(self, dir_name, job_name, cached):
+        """ Track the access to a run, and apply the eviction policy.
+        """
+        counts = self._counts.setdefault(dir_name, [0, 0])
+        counts[0 if cached else 1] += 1
+        # The modification time of a run records its last access
+        job_dir = os.path.join(self.base_dir, dir_name, job_name)
+        os.utime(job_dir)
+        if self.max_bytes is not None or self.max_days is not None:
+            self.evict(self.max_bytes, self.max_days, keep=job_dir, warn=False)
+
+    def _runs(self):
+        """ List the (last access, size, interface, directory) of the runs.
+
+            Sizes are computed again for the runs modified (or accessed)
+            since they were last listed, by any process.
+        """
+        runs = list()
+        sizes = dict()
+        for dir_name in os.listdir(self.base_dir):
+            interface_dir = os.path.join(self.base_dir, dir_name)
+            if dir_name.startswith("log.") or not os.path.isdir(interface_dir):
+                continue
+            for job_name in os.listdir(interface_dir):
+                job_dir = os.path.join(interface_dir, job_name)
+                try:
+                    stat = os.stat(job_dir)
+                except OSError:
+                    continue
+                key = (job_dir, stat.st_mtime_ns)
+                if key in self._sizes:
+                    sizes[key] = self._sizes[key]
+                else:
+                    sizes[key] = sum(
+                        os.path.getsize(os.path.join(root, filename))
+                        for root, _, filenames in os.walk(job_dir)
+                        for filename in filenames
+                        if not os.path.islink(os.path.join(root, filename))
+                    )
+                runs.append((stat.st_mtime, sizes[key], dir_name, job_dir))
+        self._sizes = sizes
+        return runs
+
+    def evict(self, max_bytes=None, max_days=None, keep=None, warn=True):
+        """ Remove the least recently used runs from the disk
+
+            Parameters
+            ==========
+            max_bytes: integer, optional
+                Runs are removed, starting with the least recently used
+                one, until the size of the cache is below max_bytes
+            max_days: float, optional
+                The runs that were not used in the last max_days days
+                are removed
+            keep: string, optional
+                The directory of a run that should not be removed
+            warn: boolean, optional
+                If true, echoes warning messages for all directory
+                removed
+
+            Returns
+            =======
+            The number of bytes freed
+        """
+        runs = sorted(self._runs())
+        total = sum(run[1] for run in runs)
+        oldest = None if max_days is None else time.time() - max_days * 86400
+        freed = 0
+        for accessed, size, _, job_dir in runs:
+            too_old = oldest is not None and accessed < oldest
+            too_big = max_bytes is not None and total - freed > max_bytes
+            if not (too_old or too_big):
+                continue
+            if job_dir == keep:
+                continue
+            if warn:
+                print("removing directory: %s" % job_dir)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            freed += size
+        return freed
+
+    def stats(self):
+        """ Report the usage of the cache, for each interface
+
+            Returns
+            =======
+            A dictionary mapping the directory of each interface to a
+            dictionary with the number of cache hits and misses (since
+            the creation of this Memory object), and the number of runs
+            and bytes in the cache.
+        """
+        stats = dict()
+        for _, size, dir_name, _ in self._runs():
+            entry = stats.setdefault(dir_name, dict(runs=0, bytes=0))
+            entry["runs"] += 1
+            entry["bytes"] += size
+        for dir_name, (hits, misses) in self._counts.items():
+            entry = stats.setdefault(dir_name, dict(runs=0, bytes=0))
+            entry.update(hits=hits, misses=misses)
+        for entry in stats.values():
+            entry.setdefault("hits", 0)
+            entry.setdefault("misses", 0)
+        return stats
+
     def clear_previous_runs(self, warn=True):
         """ Remove all the cache that where not used in the latest run of
             the memory object: i.e. since the corresponding Python object
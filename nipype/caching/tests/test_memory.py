@@ -2,6 +2,8 @@
 """ Test the nipype interface caching mechanism
 """
 
+import os
+
 from .. import Memory
 from ...pipeline.engine.tests.test_engine import EngineTestInterface
 
@@ -39,3 +41,49 @@ def test_caching(tmpdir):
         assert results.outputs.output1 == [1, 1]
     finally:
         config.set("execution", "stop_on_first_rerun", old_rerun)
+
+
+def test_caching_stats_and_eviction(tmpdir):
+    mem = Memory(tmpdir.strpath)
+    func = mem.cache(SideEffectInterface)
+    func(input1=1, input2=1)
+    func(input1=1, input2=1)
+    func(input1=2, input2=1)
+    stats = mem.stats()
+    assert list(stats) == ["nipype-caching-tests-test_memory-SideEffectInterface"]
+    (stats,) = stats.values()
+    assert (stats["hits"], stats["misses"], stats["runs"]) == (1, 2, 2)
+    assert stats["bytes"] > 0
+
+    # Only the run used last fits in the budget
+    mem.max_bytes = stats["bytes"] // 2 + 1
+    first_nb_run = nb_runs
+    func(input1=2, input2=1)
+    assert nb_runs == first_nb_run
+    (stats,) = mem.stats().values()
+    assert stats["runs"] == 1
+    func(input1=1, input2=1)
+    assert nb_runs == first_nb_run + 1
+
+    # Runs not used recently are removed
+    assert mem.evict(max_days=-1, warn=False) > 0
+    (stats,) = mem.stats().values()
+    assert stats["runs"] == 0
+
+
+def test_caching_sizes_of_other_processes(tmpdir):
+    mem = Memory(tmpdir.strpath)
+    mem.cache(SideEffectInterface)(input1=1, input2=1)
+    ((_, size, _, job_dir),) = mem._runs()
+
+    # Runs modified by another process are sized again
+    with open(os.path.join(job_dir, "extra.txt"), "w") as fobj:
+        fobj.write("0123456789")
+    ((_, new_size, _, _),) = mem._runs()
+    assert new_size == size + 10
+
+    # and runs of other processes are accounted for
+    Memory(tmpdir.strpath).cache(SideEffectInterface)(input1=2, input2=1)
+    (stats,) = mem.stats().values()
+    assert stats["runs"] == 2
+    assert stats["bytes"] > new_size
@@ -12,6 +12,7 @@ The I/O specifications corresponding to these base
 interfaces are found in the ``specs`` module.
 
 """
+from contextlib import ExitStack
 from copy import deepcopy
 from datetime import datetime as dt
 import os
@@ -26,7 +27,14 @@ from traits.trait_errors import TraitError
 from ... import config, logging, LooseVersion
 from ...utils.provenance import write_provenance
 from ...utils.misc import str2bool, rgetcwd
-from ...utils.filemanip import split_filename, which, get_dependencies
+from ...utils.filemanip import (
+    split_filename,
+    which,
+    get_dependencies,
+    get_thread_workdir,
+    thread_workdir,
+    workdir_lock,
+)
 from ...utils.subprocess import run_command
 
 from ...external.due import due
@@ -154,6 +162,11 @@ class BaseInterface(Interface):
         If ``False``, prevents resource-monitoring this interface
         If ``True`` monitoring will be enabled IFF the general
         Nipype config is set on (``resource_monitor = true``).
+    _chdir: bool
+        whether the working directory of the process is changed to ``cwd``
+        while the interface runs (default is ``True``). Interfaces that
+        resolve relative paths against ``runtime.cwd`` set it to ``False``,
+        and then can run concurrently in several threads.
 
     """
 
@@ -161,6 +174,7 @@ class BaseInterface(Interface):
     _version = None
     _additional_metadata = []
     _redirect_x = False
+    _chdir = True
     references_ = []
     resource_monitor = True  # Enabled for this interface IFF enabled in the config
     _etelemetry_version_data = None
@@ -340,125 +354,142 @@ class BaseInterface(Interface):
         if ignore_exception is None:
             ignore_exception = self.ignore_exception
 
+        # The working directory of the process is shared by all threads,
+        # hold it while running interfaces that change into it
+        context = ExitStack()
+        if self._chdir:
+            context.enter_context(workdir_lock)
         # Tear-up: get current and prev directories
         syscwd = rgetcwd(error=False)  # Recover when wd does not exist
         if cwd is None:
             cwd = syscwd
-
-        os.chdir(cwd)  # Change to the interface wd
-
-        enable_rm = config.resource_monitor and self.resource_monitor
-        self.inputs.trait_set(**inputs)
-        self._check_mandatory_inputs()
-        self._check_version_requirements(self.inputs)
-        interface = self.__class__
-        self._duecredit_cite()
-
-        # initialize provenance tracking
-        store_provenance = str2bool(
-            config.get("execution", "write_provenance", "false")
-        )
-        env = deepcopy(dict(os.environ))
-        if self._redirect_x:
-            env["DISPLAY"] = config.get_display()
-
-        runtime = Bunch(
-            cwd=cwd,
-            prevcwd=syscwd,
-            returncode=None,
-            duration=None,
-            environ=env,
-            startTime=dt.isoformat(dt.utcnow()),
-            endTime=None,
-            platform=platform.platform(),
-            hostname=platform.node(),
-            version=self.version,
-        )
-        runtime_attrs = set(runtime.dictcopy())
-
-        mon_sp = None
-        if enable_rm:
-            mon_freq = float(config.get("execution", "resource_monitor_frequency", 1))
-            proc_pid = os.getpid()
-            iflogger.debug(
-                "Creating a ResourceMonitor on a %s interface, PID=%d.",
-                self.__class__.__name__,
-                proc_pid,
-            )
-            mon_sp = ResourceMonitor(proc_pid, freq=mon_freq)
-            mon_sp.start()
-
-        # Grab inputs now, as they should not change during execution
-        inputs = self.inputs.get_traitsfree()
-        outputs = None
+        cwd = os.path.abspath(cwd)
+        # Relative paths of inputs and outputs are resolved against cwd
+        context.enter_context(thread_workdir(cwd))
 
         try:
-            runtime = self._pre_run_hook(runtime)
-            runtime = self._run_interface(runtime)
-            runtime = self._post_run_hook(runtime)
-            outputs = self.aggregate_outputs(runtime)
-        except Exception as e:
-            import traceback
-
-            # Retrieve the maximum info fast
-            runtime.traceback = traceback.format_exc()
-            # Gather up the exception arguments and append nipype info.
-            exc_args = e.args if getattr(e, "args") else tuple()
-            exc_args += (
-                "An exception of type %s occurred while running interface %s."
-                % (type(e).__name__, self.__class__.__name__),
-            )
-            if config.get("logging", "interface_level", "info").lower() == "debug":
-                exc_args += ("Inputs: %s" % str(self.inputs),)
-
-            runtime.traceback_args = ("\n".join(["%s" % arg for arg in exc_args]),)
-
-            if not ignore_exception:
-                raise
-        finally:
-            if runtime is None or runtime_attrs - set(runtime.dictcopy()):
-                raise RuntimeError(
-                    "{} interface failed to return valid "
-                    "runtime object".format(interface.__class__.__name__)
-                )
-            # This needs to be done always
-            runtime.endTime = dt.isoformat(dt.utcnow())
-            timediff = parseutc(runtime.endTime) - parseutc(runtime.startTime)
-            runtime.duration = (
-                timediff.days * 86400 + timediff.seconds + timediff.microseconds / 1e6
+            if self._chdir:
+                os.chdir(cwd)  # Change to the interface wd
+
+            enable_rm = config.resource_monitor and self.resource_monitor
+            self.inputs.trait_set(**inputs)
+            self._check_mandatory_inputs()
+            self._check_version_requirements(self.inputs)
+            interface = self.__class__
+            self._duecredit_cite()
+
+            # initialize provenance tracking
+            store_provenance = str2bool(
+                config.get("execution", "write_provenance", "false")
             )
-            results = InterfaceResult(
-                interface, runtime, inputs=inputs, outputs=outputs, provenance=None
+            env = deepcopy(dict(os.environ))
+            if self._redirect_x:
+                env["DISPLAY"] = config.get_display()
+
+            runtime = Bunch(
+                cwd=cwd,
+                prevcwd=syscwd,
+                returncode=None,
+                duration=None,
+                environ=env,
+                startTime=dt.isoformat(dt.utcnow()),
+                endTime=None,
+                platform=platform.platform(),
+                hostname=platform.node(),
+                version=self.version,
             )
+            runtime_attrs = set(runtime.dictcopy())
 
-            # Add provenance (if required)
-            if store_provenance:
-                # Provenance will only throw a warning if something went wrong
-                results.provenance = write_provenance(results)
-
-            # Make sure runtime profiler is shut down
+            mon_sp = None
             if enable_rm:
-                import numpy as np
-
-                mon_sp.stop()
+                mon_freq = float(
+                    config.get("execution", "resource_monitor_frequency", 1)
+                )
+                proc_pid = os.getpid()
+                iflogger.debug(
+                    "Creating a ResourceMonitor on a %s interface, PID=%d.",
+                    self.__class__.__name__,
+                    proc_pid,
+                )
+                mon_sp = ResourceMonitor(proc_pid, freq=mon_freq)
+                mon_sp.start()
 
-                runtime.mem_peak_gb = None
-                runtime.cpu_percent = None
+            # Grab inputs now, as they should not change during execution
+            inputs = self.inputs.get_traitsfree()
+            outputs = None
 
-                # Read .prof file in and set runtime values
-                vals = np.loadtxt(mon_sp.fname, delimiter=",")
-                if vals.size:
-                    vals = np.atleast_2d(vals)
-                    runtime.mem_peak_gb = vals[:, 2].max() / 1024
-                    runtime.cpu_percent = vals[:, 1].max()
+            try:
+                runtime = self._pre_run_hook(runtime)
+                runtime = self._run_interface(runtime)
+                runtime = self._post_run_hook(runtime)
+                outputs = self.aggregate_outputs(runtime)
+            except Exception as e:
+                import traceback
+
+                # Retrieve the maximum info fast
+                runtime.traceback = traceback.format_exc()
+                # Gather up the exception arguments and append nipype info.
+                exc_args = e.args if getattr(e, "args") else tuple()
+                exc_args += (
+                    "An exception of type %s occurred while running interface %s."
+                    % (type(e).__name__, self.__class__.__name__),
+                )
+                if config.get("logging", "interface_level", "info").lower() == "debug":
+                    exc_args += ("Inputs: %s" % str(self.inputs),)
+
+                runtime.traceback_args = ("\n".join(["%s" % arg for arg in exc_args]),)
+
+                if not ignore_exception:
+                    raise
+            finally:
+                if runtime is None or runtime_attrs - set(runtime.dictcopy()):
+                    raise RuntimeError(
+                        "{} interface failed to return valid "
+                        "runtime object".format(interface.__class__.__name__)
+                    )
+                # This needs to be done always
+                runtime.endTime = dt.isoformat(dt.utcnow())
+                timediff = parseutc(runtime.endTime) - parseutc(runtime.startTime)
+                runtime.duration = (
+                    timediff.days * 86400
+                    + timediff.seconds
+                    + timediff.microseconds / 1e6
+                )
+                results = InterfaceResult(
+                    interface, runtime, inputs=inputs, outputs=outputs, provenance=None
+                )
 
-                    runtime.prof_dict = {
-                        "time": vals[:, 0].tolist(),
-                        "cpus": vals[:, 1].tolist(),
-                        "rss_GiB": (vals[:, 2] / 1024).tolist(),
-                        "vms_GiB": (vals[:, 3] / 1024).tolist(),
-                    }
-            os.chdir(syscwd)
+                # Add provenance (if required)
+                if store_provenance:
+                    # Provenance will only throw a warning if something went wrong
+                    results.provenance = write_provenance(results)
+
+                # Make sure runtime profiler is shut down
+                if enable_rm:
+                    import numpy as np
+
+                    mon_sp.stop()
+
+                    runtime.mem_peak_gb = None
+                    runtime.cpu_percent = None
+
+                    # Read .prof file in and set runtime values
+                    vals = np.loadtxt(mon_sp.fname, delimiter=",")
+                    if vals.size:
+                        vals = np.atleast_2d(vals)
+                        runtime.mem_peak_gb = vals[:, 2].max() / 1024
+                        runtime.cpu_percent = vals[:, 1].max()
+
+                        runtime.prof_dict = {
+                            "time": vals[:, 0].tolist(),
+                            "cpus": vals[:, 1].tolist(),
+                            "rss_GiB": (vals[:, 2] / 1024).tolist(),
+                            "vms_GiB": (vals[:, 3] / 1024).tolist(),
+                        }
+        finally:
+            if self._chdir:
+                os.chdir(syscwd)
+            context.close()
 
         return results
 
@@ -924,7 +955,9 @@ class CommandLine(BaseInterface):
                     out_name = trait_spec.output_name
                 fname = self._filename_from_source(name)
                 if isdefined(fname):
-                    outputs[out_name] = os.path.abspath(fname)
+                    outputs[out_name] = os.path.abspath(
+                        os.path.join(get_thread_workdir() or os.getcwd(), fname)
+                    )
             return outputs
 
     def _parse_inputs(self, skip=None):
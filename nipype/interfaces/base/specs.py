@@ -10,6 +10,7 @@ Define the API for the I/O of interfaces
 
 """
 import os
+from concurrent.futures import ThreadPoolExecutor
 from inspect import isclass
 from copy import deepcopy
 from warnings import warn
@@ -18,6 +19,7 @@ from packaging.version import Version
 from traits.trait_errors import TraitError
 from traits.trait_handlers import TraitDictObject, TraitListObject
 from ...utils.filemanip import md5, hash_infile, hash_timestamp
+from ...utils.digests import get_digest_cache
 from .traits_extension import (
     traits,
     File,
@@ -34,6 +36,69 @@ _float_fmt = "{:.10f}".format
 nipype_version = Version(__version__)
 
 
+def _hash_file(afile, hash_method, algorithm=None, cache=None):
+    """
+    Return the digest of a file with the given hash method.
+
+    The ``algorithm`` of content hashes, and whether digests are cached
+    (``cache``), default to the ``hash_algorithm`` and
+    ``content_hash_cache`` options of the ``execution`` section.
+    """
+    if hash_method.lower() == "timestamp":
+        return hash_timestamp(afile)
+    if hash_method.lower() != "content":
+        raise Exception("Unknown hash method: %s" % hash_method)
+
+    if algorithm is None:
+        algorithm = config.get("execution", "hash_algorithm", "md5")
+    algorithm = algorithm.lower()
+    if cache is None:
+        cache = config.getboolean("execution", "content_hash_cache")
+    if cache:
+        hash = get_digest_cache().hash_infile(afile, algorithm)
+    else:
+        hash = hash_infile(afile, crypto=algorithm)
+    # Record other algorithms than the (historical) md5
+    if hash is not None and algorithm != "md5":
+        hash = "%s:%s" % (algorithm, hash)
+    return hash
+
+
+def _find_files(objekt):
+    """Yield the paths to existing files in a (nested) input value"""
+    if isinstance(objekt, dict):
+        for val in objekt.values():
+            if isdefined(val):
+                yield from _find_files(val)
+    elif isinstance(objekt, (list, tuple)):
+        for val in objekt:
+            if isdefined(val):
+                yield from _find_files(val)
+    elif isinstance(objekt, (str, bytes)) and os.path.isfile(objekt):
+        yield objekt
+
+
+def _hash_files(files, hash_method, algorithm=None, threads=None, cache=None):
+    """
+    Return a dictionary with the digests of a collection of files.
+
+    Files are hashed concurrently by up to ``threads`` (by default, the
+    ``hash_threads`` option of the ``execution`` section) threads.
+    """
+    files = list(files)
+    if threads is None:
+        threads = config.get("execution", "hash_threads", 1)
+    nthreads = min(int(threads), len(files))
+
+    def hash_file(afile):
+        return _hash_file(afile, hash_method, algorithm=algorithm, cache=cache)
+
+    if nthreads <= 1:
+        return {afile: hash_file(afile) for afile in files}
+    with ThreadPoolExecutor(nthreads) as pool:
+        return dict(zip(files, pool.map(hash_file, files)))
+
+
 class BaseTraitedSpec(traits.HasTraits):
     """
     Provide a few methods necessary to support nipype interface api
@@ -222,7 +287,7 @@ class BaseTraitedSpec(traits.HasTraits):
         """
         return has_metadata(self.trait(name).trait_type, metadata, value, recursive)
 
-    def get_hashval(self, hash_method=None):
+    def get_hashval(self, hash_method=None, algorithm=None, threads=None, cache=None):
         """Return a dictionary of our items with hashes for each file.
 
         Searches through dictionary items and if an item is a file, it
@@ -233,6 +298,12 @@ class BaseTraitedSpec(traits.HasTraits):
         value of a file. The path and name of the file are not used in
         the overall hash calculation.
 
+        The ``hash_method``, the ``algorithm`` of content hashes, the
+        number of ``threads`` hashing files and whether digests are
+        cached (``cache``) default to the ``hash_method``,
+        ``hash_algorithm``, ``hash_threads`` and ``content_hash_cache``
+        options of the ``execution`` section.
+
         Returns
         -------
         list_withhash : dict
@@ -242,8 +313,11 @@ class BaseTraitedSpec(traits.HasTraits):
             The md5 hash value of the traited spec
 
         """
-        list_withhash = []
-        list_nofilename = []
+        if hash_method is None:
+            hash_method = config.get("execution", "hash_method")
+
+        items = []
+        files = set()
         for name, val in sorted(self.trait_get().items()):
             if not isdefined(val) or self.has_metadata(name, "nohash", True):
                 # skip undefined traits and traits with nohash=True
@@ -252,11 +326,25 @@ class BaseTraitedSpec(traits.HasTraits):
             hash_files = not self.has_metadata(
                 name, "hash_files", False
             ) and not self.has_metadata(name, "name_source")
+            if hash_files:
+                files.update(_find_files(val))
+            items.append((name, val, hash_files))
+
+        # Every file is hashed once, and the digests shared by both lists
+        digests = _hash_files(
+            files, hash_method, algorithm=algorithm, threads=threads, cache=cache
+        )
+        list_withhash = []
+        list_nofilename = []
+        for name, val, hash_files in items:
             list_nofilename.append(
                 (
                     name,
                     self._get_sorteddict(
-                        val, hash_method=hash_method, hash_files=hash_files
+                        val,
+                        hash_method=hash_method,
+                        hash_files=hash_files,
+                        digests=digests,
                     ),
                 )
             )
@@ -264,14 +352,23 @@ class BaseTraitedSpec(traits.HasTraits):
                 (
                     name,
                     self._get_sorteddict(
-                        val, True, hash_method=hash_method, hash_files=hash_files
+                        val,
+                        True,
+                        hash_method=hash_method,
+                        hash_files=hash_files,
+                        digests=digests,
                     ),
                 )
             )
         return list_withhash, md5(str(list_nofilename).encode()).hexdigest()
 
     def _get_sorteddict(
-        self, objekt, dictwithhash=False, hash_method=None, hash_files=True
+        self,
+        objekt,
+        dictwithhash=False,
+        hash_method=None,
+        hash_files=True,
+        digests=None,
     ):
         if isinstance(objekt, dict):
             out = []
@@ -285,6 +382,7 @@ class BaseTraitedSpec(traits.HasTraits):
                                 dictwithhash,
                                 hash_method=hash_method,
                                 hash_files=hash_files,
+                                digests=digests,
                             ),
                         )
                     )
@@ -298,6 +396,7 @@ class BaseTraitedSpec(traits.HasTraits):
                             dictwithhash,
                             hash_method=hash_method,
                             hash_files=hash_files,
+                            digests=digests,
                         )
                     )
             if isinstance(objekt, tuple):
@@ -306,6 +405,17 @@ class BaseTraitedSpec(traits.HasTraits):
             out = None
             if isdefined(objekt):
                 if (
+                    hash_files
+                    and isinstance(objekt, (str, bytes))
+                    and digests is not None
+                    and objekt in digests
+                ):
+                    hash = digests[objekt]
+                    if dictwithhash:
+                        out = (objekt, hash)
+                    else:
+                        out = hash
+                elif (
                     hash_files
                     and isinstance(objekt, (str, bytes))
                     and os.path.isfile(objekt)
@@ -313,12 +423,7 @@ class BaseTraitedSpec(traits.HasTraits):
                     if hash_method is None:
                         hash_method = config.get("execution", "hash_method")
 
-                    if hash_method.lower() == "timestamp":
-                        hash = hash_timestamp(objekt)
-                    elif hash_method.lower() == "content":
-                        hash = hash_infile(objekt)
-                    else:
-                        raise Exception("Unknown hash method: %s" % hash_method)
+                    hash = _hash_file(objekt, hash_method)
                     if dictwithhash:
                         out = (objekt, hash)
                     else:
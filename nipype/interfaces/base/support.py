@@ -8,6 +8,7 @@ Miscellaneous tools to support Interface functionality
 
 """
 import os
+import pickle
 from copy import deepcopy
 from textwrap import wrap
 import re
@@ -230,6 +231,73 @@ class InterfaceResult(object):
         return self._version
 
 
+def _lazy_field(name):
+    def fget(self):
+        pickled = self._pickled.pop(name, None)
+        if pickled is not None:
+            setattr(self, "_" + name, pickle.loads(pickled))
+        return getattr(self, "_" + name)
+
+    def fset(self, value):
+        self._pickled.pop(name, None)
+        setattr(self, "_" + name, value)
+
+    return property(fget, fset, doc="Unpickled upon first access")
+
+
+class LazyInterfaceResult(InterfaceResult):
+    """An :class:`InterfaceResult` that defers unpickling its heavy fields.
+
+    When pickled, ``runtime``, ``inputs`` and ``provenance`` are stored as
+    separate, nested pickles that are only loaded upon first access, so
+    that retrieving the outputs from a results file does not pay for
+    rebuilding, e.g., the environment of the runtime.
+
+    >>> result = LazyInterfaceResult(None, Bunch(returncode=0), inputs={'a': 1})
+    >>> result = pickle.loads(pickle.dumps(result))
+    >>> sorted(result._pickled)
+    ['inputs', 'provenance', 'runtime']
+    >>> result.runtime.returncode
+    0
+    >>> sorted(result._pickled)
+    ['inputs', 'provenance']
+
+    """
+
+    _lazy_fields = ("runtime", "inputs", "provenance")
+
+    runtime = _lazy_field("runtime")
+    inputs = _lazy_field("inputs")
+    provenance = _lazy_field("provenance")
+
+    def __init__(self, *args, **kwargs):
+        self._pickled = {}
+        super(LazyInterfaceResult, self).__init__(*args, **kwargs)
+
+    @classmethod
+    def from_result(cls, result):
+        """Wrap the fields of an :class:`InterfaceResult`"""
+        return cls(
+            result.interface,
+            result.runtime,
+            inputs=result.inputs,
+            outputs=result.outputs,
+            provenance=result.provenance,
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        pickled = dict(self._pickled)
+        for name in self._lazy_fields:
+            if name not in pickled:
+                pickled[name] = pickle.dumps(
+                    state["_" + name], protocol=pickle.HIGHEST_PROTOCOL
+                )
+            state.pop("_" + name, None)
+        state["_pickled"] = pickled
+        return state
+
+
 def format_help(cls):
     """
     Prints help text of a Nipype interface
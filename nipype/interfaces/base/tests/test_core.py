@@ -447,6 +447,31 @@ def test_CommandLine_output(tmpdir):
     assert name in res.runtime.stdout
 
 
+def test_CommandLine_stream_log(tmpdir):
+    tmpdir.chdir()
+
+    ci = nib.CommandLine(command="printf 'out1\\nout2'; printf 'err\\n' >&2")
+    res = ci.run()
+    assert res.runtime.stdout == "out1\nout2"
+    assert res.runtime.stderr == "err"
+
+    log = res.runtime.merged.splitlines()
+    assert sorted(row.split(" ", 1)[0] for row in log) == ["stderr"] + ["stdout"] * 2
+    assert [row.split(":", 3)[-1] for row in log if row.startswith("stdout")] == [
+        "out1",
+        "out2",
+    ]
+    # The whole log is written to disk
+    assert tmpdir.join("stream.nipype").read().splitlines() == log
+
+    # Only the last lines are kept in memory
+    with mock.patch("nipype.utils.subprocess.TAIL_LINES", 2):
+        res = nib.CommandLine(command="seq 5").run()
+    assert res.runtime.stdout == "4\n5"
+    assert len(res.runtime.merged.splitlines()) == 2
+    assert len(tmpdir.join("stream.nipype").read().splitlines()) == 5
+
+
 def test_global_CommandLine_output(tmpdir):
     """Ensures CommandLine.set_default_terminal_output works"""
     from nipype.interfaces.fsl import BET
@@ -457,7 +482,7 @@ def test_global_CommandLine_output(tmpdir):
     ci = BET()
     assert ci.terminal_output == "stream"  # default case
 
-    with mock.patch.object(nib.CommandLine, '_terminal_output'):
+    with mock.patch.object(nib.CommandLine, "_terminal_output"):
         nib.CommandLine.set_default_terminal_output("allatonce")
         ci = nib.CommandLine(command="ls -l")
         assert ci.terminal_output == "allatonce"
@@ -531,3 +556,35 @@ def test_runtime_checks():
 
     with pytest.raises(RuntimeError):
         BrokenRuntime().run()
+
+
+def test_run_without_chdir(tmpdir):
+    tmpdir.chdir()
+    tmpdir.mkdir("work")
+
+    class InputSpec(nib.TraitedSpec):
+        in_file = nib.File(exists=True, desc="a file")
+
+    class OutputSpec(nib.TraitedSpec):
+        out_file = nib.File(exists=True, desc="a file")
+        cwd = nib.traits.Str(desc="working directory")
+
+    class WriteInterface(nib.SimpleInterface):
+        input_spec = InputSpec
+        output_spec = OutputSpec
+        _chdir = False
+
+        def _run_interface(self, runtime):
+            with open(os.path.join(runtime.cwd, "out.txt"), "w") as fobj:
+                fobj.write("out")
+            # Relative paths are validated against runtime.cwd
+            self._results["out_file"] = "out.txt"
+            self._results["cwd"] = os.getcwd()
+            return runtime
+
+    tmpdir.join("work", "in.txt").write("in")
+    res = WriteInterface().run(cwd="work", in_file="in.txt")
+    assert res.runtime.cwd == tmpdir.join("work").strpath
+    assert res.outputs.cwd == tmpdir.strpath
+    assert res.outputs.out_file == "out.txt"
+    assert os.getcwd() == tmpdir.strpath
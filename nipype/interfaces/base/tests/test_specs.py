@@ -6,6 +6,7 @@ import warnings
 
 import pytest
 
+from .... import config
 from ....utils.filemanip import split_filename
 from ... import base as nib
 from ...base import traits, Undefined
@@ -381,6 +382,65 @@ def test_TraitedSpec_withFile(setup_file):
     hashval = infields.get_hashval(hash_method="content")
     assert hashval[1] == "a00e9ee24f5bfa9545a515b7a759886b"
 
+    # Digests retrieved from the cache yield the same hash
+    old_cache = config.get("execution", "content_hash_cache")
+    config.set("execution", "content_hash_cache", "true")
+    config.set("execution", "content_hash_cache_file", os.path.join(tmpd, "db"))
+    try:
+        for _ in range(2):
+            hashval = infields.get_hashval(hash_method="content")
+            assert hashval[1] == "a00e9ee24f5bfa9545a515b7a759886b"
+    finally:
+        config.set("execution", "content_hash_cache", old_cache)
+        config._config.remove_option("execution", "content_hash_cache_file")
+
+    # Other hash algorithms are recorded along with the digests
+    old_algorithm = config.get("execution", "hash_algorithm")
+    config.set("execution", "hash_algorithm", "blake2b")
+    try:
+        hashed, hashval = infields.get_hashval(hash_method="content")
+        assert hashval != "a00e9ee24f5bfa9545a515b7a759886b"
+        assert dict(hashed)["moo"][1].startswith("blake2b:")
+    finally:
+        config.set("execution", "hash_algorithm", old_algorithm)
+    # or given explicitly
+    hashed, _ = infields.get_hashval(hash_method="content", algorithm="sha256")
+    assert dict(hashed)["moo"][1].startswith("sha256:")
+
+
+@pytest.mark.parametrize("nthreads", ["1", "4"])
+def test_TraitedSpec_hash_files_once(tmpdir, monkeypatch, nthreads):
+    from .. import specs
+
+    files = []
+    for i in range(10):
+        infile = tmpdir.join("file%d.txt" % i)
+        infile.write("content %d" % i)
+        files.append(infile.strpath)
+
+    class spec3(nib.TraitedSpec):
+        one = nib.File(exists=True)
+        many = nib.traits.List(nib.File(exists=True))
+        nested = nib.traits.Dict()
+
+    infields = spec3(one=files[0], many=files, nested={"f": files[1:3]})
+    expected = infields.get_hashval(hash_method="content")
+
+    hashed = []
+
+    def _hash_file(afile, hash_method, algorithm=None, cache=None):
+        hashed.append(afile)
+        return specs.hash_infile(afile)
+
+    monkeypatch.setattr(specs, "_hash_file", _hash_file)
+    old_threads = config.get("execution", "hash_threads")
+    config.set("execution", "hash_threads", nthreads)
+    try:
+        assert infields.get_hashval(hash_method="content") == expected
+    finally:
+        config.set("execution", "hash_threads", old_threads)
+    assert sorted(hashed) == sorted(files)
+
 
 def test_TraitedSpec_withNoFileHashing(setup_file):
     tmp_infile = setup_file
@@ -35,7 +35,7 @@ except ImportError:
     from traits.trait_handlers import NoDefaultSpecified
 
 from pathlib import Path
-from ...utils.filemanip import path_resolve
+from ...utils.filemanip import path_resolve, get_thread_workdir
 
 if traits_version < "3.7.0":
     raise ImportError("Traits version 3.7.0 or higher must be installed")
@@ -130,18 +130,23 @@ class BasePath(TraitType):
         except Exception:
             self.error(objekt, name, str(value))
 
+        path = value
+        workdir = get_thread_workdir()
+        if workdir is not None and not value.is_absolute():
+            path = Path(workdir) / value
+
         if self.exists:
-            if not value.exists():
+            if not path.exists():
                 self.error(objekt, name, str(value))
 
-            if self._is_file and not value.is_file():
+            if self._is_file and not path.is_file():
                 self.error(objekt, name, str(value))
 
-            if self._is_dir and not value.is_dir():
+            if self._is_dir and not path.is_dir():
                 self.error(objekt, name, str(value))
 
         if self.resolve:
-            value = path_resolve(value, strict=self.exists)
+            value = path_resolve(path, strict=self.exists)
 
         if not return_pathlike:
             value = str(value)
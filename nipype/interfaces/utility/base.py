@@ -56,6 +56,7 @@ class IdentityInterface(IOBase):
 
     input_spec = DynamicTraitedSpec
     output_spec = DynamicTraitedSpec
+    _chdir = False  # Does not depend on the working directory
 
     def __init__(self, fields=None, mandatory_inputs=True, **inputs):
         super(IdentityInterface, self).__init__(**inputs)
@@ -173,6 +174,7 @@ class Merge(IOBase):
 
     input_spec = MergeInputSpec
     output_spec = MergeOutputSpec
+    _chdir = False  # Does not depend on the working directory
 
     def __init__(self, numinputs=0, **inputs):
         super(Merge, self).__init__(**inputs)
@@ -343,6 +345,7 @@ class Split(IOBase):
 
     input_spec = SplitInputSpec
     output_spec = DynamicTraitedSpec
+    _chdir = False  # Does not depend on the working directory
 
     def _add_output_traits(self, base):
         undefined_traits = {}
@@ -404,6 +407,7 @@ class Select(IOBase):
 
     input_spec = SelectInputSpec
     output_spec = SelectOutputSpec
+    _chdir = False  # Does not depend on the working directory
 
     def _list_outputs(self):
         outputs = self._outputs().get()
@@ -19,6 +19,7 @@ from tempfile import mkdtemp
 
 from ... import config, logging
 from ...utils.misc import flatten, unflatten, str2bool, dict_diff
+from ...utils.cacheindex import get_cache_index
 from ...utils.filemanip import (
     md5,
     ensure_list,
@@ -31,6 +32,7 @@ from ...utils.filemanip import (
     emptydirs,
     savepkl,
     indirectory,
+    thread_workdir,
     silentrm,
 )
 
@@ -51,6 +53,7 @@ from .utils import (
     _parameterization_dir,
     save_hashfile as _save_hashfile,
     load_resultfile as _load_resultfile,
+    result_cache as _result_cache,
     save_resultfile as _save_resultfile,
     nodelist_runner as _node_runner,
     strip_temp as _strip_temp,
@@ -60,6 +63,7 @@ from .utils import (
     evaluate_connect_function,
 )
 from .base import EngineBase
+from .store import get_shared_store, store_key
 
 logger = logging.getLogger("nipype.workflow")
 
@@ -181,6 +185,7 @@ class Node(EngineBase):
         self._got_inputs = False
         self._originputs = None
         self._output_dir = None
+        self._index_dir = None
 
         self.iterables = iterables
         self.synchronize = synchronize
@@ -309,6 +314,42 @@ class Node(EngineBase):
         """Print interface help"""
         self._interface.help()
 
+    def _cache_index(self):
+        """Return the cache index of the workflow, if enabled"""
+        if not self.config or not str2bool(
+            self.config["execution"].get("cache_index", False)
+        ):
+            return None
+        return get_cache_index(getattr(self, "_index_dir", None) or self.base_dir)
+
+    def _index_results(self):
+        """Record the hash and results of the node in the cache index"""
+        index = self._cache_index()
+        if index is not None:
+            outdir = self.output_dir()
+            index.record(
+                outdir,
+                self.fullname,
+                self._hashvalue,
+                op.join(outdir, "result_%s.pklz" % self.name),
+            )
+
+    def _shared_store(self):
+        """Return the store of results shared across workflows, if enabled"""
+        root = self.config["execution"].get("shared_cache")
+        if not root or isinstance(self, MapNode) or self._interface.always_run:
+            return None
+        if self.config["execution"]["hash_method"].lower() != "content":
+            logger.debug(
+                '[Node] Not using the shared cache for "%s": inputs are not '
+                "hashed by content.",
+                self.fullname,
+            )
+            return None
+        return get_shared_store(
+            root, float(self.config["execution"].get("shared_cache_size", 50))
+        )
+
     def is_cached(self, rm_outdated=False):
         """
         Check if the interface has been run previously, and whether
@@ -316,6 +357,19 @@ class Node(EngineBase):
         """
         outdir = self.output_dir()
 
+        # Up-to-date nodes in the cache index do not need a directory listing
+        index = self._cache_index()
+        if index is not None:
+            indexed = index.lookup(outdir)
+            if indexed is not None:
+                hashvalue = self._get_hashval()[1]
+                if indexed[0] == hashvalue and op.exists(indexed[1]):
+                    logger.debug(
+                        '[Node] Up-to-date cache found in the index for "%s".',
+                        self.fullname,
+                    )
+                    return True, True
+
         # The output folder does not exist: not cached
         if not op.exists(outdir) or not op.exists(
             op.join(outdir, "result_%s.pklz" % self.name)
@@ -346,6 +400,7 @@ class Node(EngineBase):
         if cached and len(hashfiles) == 1:
             assert hashfile == hashfiles[0]
             logger.debug('[Node] Up-to-date cache found for "%s".', self.fullname)
+            self._index_results()
             return True, True  # Cached and updated
 
         if len(hashfiles) > 1:
@@ -458,6 +513,8 @@ class Node(EngineBase):
             result = self._run_interface(
                 execute=False, updatehash=updatehash and not updated
             )
+            if updatehash and not updated:
+                self._index_results()
             logger.info(
                 '[Node] "%s" found cached%s.',
                 self.fullname,
@@ -475,6 +532,9 @@ class Node(EngineBase):
                 )
 
         # Remove any hashfile that exists at this point (re)running.
+        index = self._cache_index()
+        if index is not None:
+            index.discard(outdir)
         if cached:
             for outdatedhash in glob(op.join(self.output_dir(), "_0x*.json")):
                 os.remove(outdatedhash)
@@ -512,8 +572,24 @@ class Node(EngineBase):
         savepkl(op.join(outdir, "_node.pklz"), self)
         savepkl(op.join(outdir, "_inputs.pklz"), self.inputs.get_traitsfree())
 
+        store = self._shared_store()
+        key = store_key(self._interface, self._hashed_inputs) if store else None
         try:
-            result = self._run_interface(execute=True)
+            result = None
+            if store is not None and not force_run:
+                result = store.fetch(
+                    key,
+                    outdir,
+                    self.name,
+                    rebase=str2bool(self.config["execution"]["use_relative_paths"]),
+                    result_format=self.config["execution"].get("result_format"),
+                )
+            if result is not None:
+                logger.info('[Node] "%s" found in the shared cache.', self.fullname)
+            else:
+                result = self._run_interface(execute=True)
+                if store is not None:
+                    store.publish(key, outdir, self.name, result)
         except Exception:
             logger.warning('[Node] Error on "%s" (%s)', self.fullname, outdir)
             # Tear-up after error
@@ -529,6 +605,7 @@ directory. Please ensure no other concurrent workflows are racing""",
 
         # Tear-up after success
         shutil.move(hashfile_unfinished, hashfile_unfinished.replace("_unfinished", ""))
+        self._index_results()
         write_node_report(self, result=result, is_mapnode=isinstance(self, MapNode))
         logger.info('[Node] Finished "%s".', self.fullname)
         return result
@@ -538,7 +615,7 @@ directory. Please ensure no other concurrent workflows are racing""",
         self._get_inputs()
         if self._hashvalue is None and self._hashed_inputs is None:
             self._hashed_inputs, self._hashvalue = self.inputs.get_hashval(
-                hash_method=self.config["execution"]["hash_method"]
+                **self._hash_options()
             )
             rm_extra = self.config["execution"]["remove_unnecessary_outputs"]
             if str2bool(rm_extra) and self.needed_outputs:
@@ -549,6 +626,21 @@ directory. Please ensure no other concurrent workflows are racing""",
                 self._hashed_inputs.append(("needed_outputs", self.needed_outputs))
         return self._hashed_inputs, self._hashvalue
 
+    def _hash_options(self):
+        """
+        Return the options of the node hashing its inputs.
+
+        They are taken from the configuration of the node (rather than the
+        global one), as workers running the node do.
+        """
+        execution = self.config["execution"]
+        return dict(
+            hash_method=execution["hash_method"],
+            algorithm=execution.get("hash_algorithm", "md5"),
+            threads=execution.get("hash_threads", 1),
+            cache=str2bool(execution.get("content_hash_cache", False)),
+        )
+
     def _get_inputs(self):
         """
         Retrieve inputs from pointers to results files.
@@ -577,7 +669,7 @@ directory. Please ensure no other concurrent workflows are racing""",
         for results_fname, connections in list(prev_results.items()):
             outputs = None
             try:
-                outputs = _load_resultfile(results_fname).outputs
+                outputs = _result_cache.outputs(results_fname)
             except AttributeError as e:
                 logger.critical("%s", e)
 
@@ -674,6 +766,7 @@ Error populating the inputs of node "%s": the results file of the source node \
                 cwd,
                 self.name,
                 rebase=str2bool(self.config["execution"]["use_relative_paths"]),
+                result_format=self.config["execution"].get("result_format"),
             )
         else:
             logger.debug("aggregating mapnode results")
@@ -719,7 +812,8 @@ Error populating the inputs of node "%s": the results file of the source node \
         )
         if issubclass(self._interface.__class__, CommandLine):
             try:
-                with indirectory(outdir):
+                workdir = indirectory if self._interface._chdir else thread_workdir
+                with workdir(outdir):
                     cmd = self._interface.cmdline
             except Exception as msg:
                 result.runtime.stderr = "{}\n\n{}".format(
@@ -730,6 +824,7 @@ Error populating the inputs of node "%s": the results file of the source node \
                     outdir,
                     self.name,
                     rebase=str2bool(self.config["execution"]["use_relative_paths"]),
+                    result_format=self.config["execution"].get("result_format"),
                 )
                 raise
             cmdfile = op.join(outdir, "command.txt")
@@ -748,6 +843,7 @@ Error populating the inputs of node "%s": the results file of the source node \
                 outdir,
                 self.name,
                 rebase=str2bool(self.config["execution"]["use_relative_paths"]),
+                result_format=self.config["execution"].get("result_format"),
             )
             raise
 
@@ -768,6 +864,7 @@ Error populating the inputs of node "%s": the results file of the source node \
             outdir,
             self.name,
             rebase=str2bool(self.config["execution"]["use_relative_paths"]),
+            result_format=self.config["execution"].get("result_format"),
         )
 
         return result
@@ -1185,9 +1282,7 @@ class MapNode(Node):
                 setattr(hashinputs, name, flatten(getattr(self._inputs, name)))
             else:
                 setattr(hashinputs, name, getattr(self._inputs, name))
-        hashed_inputs, hashvalue = hashinputs.get_hashval(
-            hash_method=self.config["execution"]["hash_method"]
-        )
+        hashed_inputs, hashvalue = hashinputs.get_hashval(**self._hash_options())
         rm_extra = self.config["execution"]["remove_unnecessary_outputs"]
         if str2bool(rm_extra) and self.needed_outputs:
             hashobject = md5()
@@ -1228,6 +1323,7 @@ class MapNode(Node):
                 name=nodename,
             )
             node.plugin_args = self.plugin_args
+            node._index_dir = getattr(self, "_index_dir", None) or self.base_dir
             node.interface.inputs.trait_set(
                 **deepcopy(self._interface.inputs.trait_get())
             )
@@ -1396,11 +1492,18 @@ class MapNode(Node):
                 outdir,
                 self.name,
                 rebase=str2bool(self.config["execution"]["use_relative_paths"]),
+                result_format=self.config["execution"].get("result_format"),
             )
             raise
 
         # And store results
-        _save_resultfile(result, cwd, self.name, rebase=False)
+        _save_resultfile(
+            result,
+            cwd,
+            self.name,
+            rebase=False,
+            result_format=self.config["execution"].get("result_format"),
+        )
         # remove any node directories no longer required
         dirs2remove = []
         for path in glob(op.join(cwd, "mapflow", "*")):
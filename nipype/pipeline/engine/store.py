@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Content-addressed store of node results, shared across workflows
+
+When the ``shared_cache`` option of the ``execution`` section points to a
+folder (possibly on a shared filesystem, and used by several users), the
+working directory of every node that finishes is published in that store,
+keyed by the interface, its version and the hash of the inputs of the node
+(where input files are identified by their name and content, regardless of
+their location).
+Nodes of any workflow that would compute the same results link (or copy)
+them from the store into their working directory, instead of running their
+interface.
+
+The store is bounded to ``shared_cache_size`` GB (50 by default): the least
+recently used entries are evicted when publishing an entry takes the total
+size of the store (kept in ``store.size``) over the bound.
+Entries are published and evicted by renaming folders, which is atomic, and
+the bookkeeping is serialized by a lock file, so that a store can be used by
+concurrent processes on several hosts.
+Only nodes hashing their inputs by content (``hash_method = content``) and
+whose outputs are all within their working directory are shared. Shared
+files are read-only, so that they cannot be modified in place.
+
+Entries are created with the permissions given by the umask (and the group
+of the store folder, if it is setgid), so that a store used by several users
+is best a setgid folder of their group, used with a umask of ``002``.
+Entries are marked as used by touching their results file or, for entries
+of other users, by logging their use in ``store.access``.
+"""
+import os
+import os.path as op
+import shutil
+import stat
+from tempfile import mkdtemp
+from time import time
+from uuid import uuid4
+
+from filelock import SoftFileLock
+
+from ... import logging, __version__
+from ...utils.filemanip import md5
+from .utils import load_resultfile, save_resultfile
+
+logger = logging.getLogger("nipype.workflow")
+
+# Files of a working directory that are specific to a node
+_NODE_FILES = ("_inputs.pklz", "_node.pklz", "_report")
+
+# Fraction of the size of the store that eviction frees the store down to,
+# so that the store is not scanned again at every publication once full
+_EVICT_TO = 0.9
+
+
+def _relocatable(hashed_inputs):
+    """Replace the location of the hashed files by their name"""
+    if isinstance(hashed_inputs, list):
+        return [_relocatable(value) for value in hashed_inputs]
+    if isinstance(hashed_inputs, tuple):
+        if (
+            len(hashed_inputs) == 2
+            and isinstance(hashed_inputs[0], str)
+            and isinstance(hashed_inputs[1], str)
+            and op.isfile(hashed_inputs[0])
+        ):
+            return op.basename(hashed_inputs[0]), hashed_inputs[1]
+        return tuple(_relocatable(value) for value in hashed_inputs)
+    return hashed_inputs
+
+
+def store_key(interface, hashed_inputs):
+    """
+    Return the key of the results of an interface in the shared store.
+
+    Parameters
+    ----------
+    interface : :obj:`~nipype.interfaces.base.core.Interface`
+        the interface of the node
+    hashed_inputs : list
+        the hashed inputs of the node, as returned by ``get_hashval``
+
+    """
+    try:
+        version = interface.version
+    except Exception:
+        version = None
+    return md5(
+        str(
+            (
+                __version__,
+                interface.__class__.__module__,
+                interface.__class__.__name__,
+                version,
+                [(name, _relocatable(value)) for name, value in hashed_inputs],
+            )
+        ).encode()
+    ).hexdigest()
+
+
+def _is_node_file(filename, name):
+    return (
+        filename in _NODE_FILES
+        or filename.startswith("_0x")
+        or filename == "result_%s.pklz" % name
+    )
+
+
+def _make_read_only(path):
+    """Remove the write permissions of the files in a folder"""
+    readable = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            filename = op.join(root, filename)
+            os.chmod(filename, stat.S_IMODE(os.stat(filename).st_mode) & readable)
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _path_outputs(value):
+    """Yield the absolute paths found in (nested) output values"""
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _path_outputs(item)
+    elif isinstance(value, str) and op.isabs(value):
+        yield value
+
+
+def _relocate(value, origin, outdir):
+    """Move the paths within ``origin`` found in (nested) values to ``outdir``"""
+    if isinstance(value, dict):
+        return {k: _relocate(v, origin, outdir) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_relocate(v, origin, outdir) for v in value)
+    if isinstance(value, str) and value.startswith(origin + os.sep):
+        return outdir + value[len(origin) :]
+    return value
+
+
+class SharedStore(object):
+    """
+    A size-bounded, content-addressed store of the results of nodes.
+
+    Each entry holds the files of the working directory of a node
+    (``files``), its results file (``result.pklz``, where path outputs are
+    relative to the working directory), and the original location of the
+    working directory (``origin``), to relocate other outputs holding paths.
+    """
+
+    def __init__(self, root, max_size_gb=50):
+        self.root = op.abspath(op.expanduser(root))
+        self.max_size = int(max_size_gb * 1024 ** 3)
+
+    def _entry(self, key):
+        return op.join(self.root, key[:2], key)
+
+    def _lock(self):
+        return SoftFileLock(op.join(self.root, "store.lock"), timeout=60)
+
+    def _touch(self, key):
+        """Mark an entry as recently used"""
+        try:
+            os.utime(op.join(self._entry(key), "result.pklz"))
+            return
+        except PermissionError:  # The entry belongs to another user
+            pass
+        try:
+            with open(op.join(self.root, "store.access"), "a") as fobj:
+                fobj.write("%d %s\n" % (time(), key))
+        except OSError as exc:
+            logger.debug(
+                "Could not log the use of %s in the shared cache: %s", key, exc
+            )
+
+    def _accesses(self):
+        """Return the time each entry was last used, from the access log"""
+        accesses = {}
+        try:
+            with open(op.join(self.root, "store.access")) as fobj:
+                for line in fobj:
+                    used, _, key = line.strip().partition(" ")
+                    if used.isdigit():
+                        accesses[key] = max(int(used), accesses.get(key, 0))
+        except OSError:
+            pass
+        return accesses
+
+    def fetch(self, key, outdir, name, rebase=None, result_format=None):
+        """
+        Link the results of an entry into the working directory of a node.
+
+        Returns the results of the node (saved in ``outdir`` as if the node
+        had run), or ``None`` if there is no such entry.
+        """
+        entry = self._entry(key)
+        resultfile = op.join(entry, "result.pklz")
+        if not op.exists(resultfile):
+            return None
+
+        tmpfile = op.join(outdir, "_shared_result.pklz")
+        try:
+            files = op.join(entry, "files")
+            for root, _, filenames in os.walk(files):
+                dest = op.join(outdir, op.relpath(root, files))
+                os.makedirs(dest, exist_ok=True)
+                for filename in filenames:
+                    _link_or_copy(op.join(root, filename), op.join(dest, filename))
+            shutil.copyfile(resultfile, tmpfile)
+            result = load_resultfile(tmpfile)
+            with open(op.join(entry, "origin")) as fobj:
+                origin = fobj.read()
+            if hasattr(getattr(result, "outputs", None), "trait_get"):
+                for trait, value in result.outputs.trait_get().items():
+                    relocated = _relocate(value, origin, outdir)
+                    if relocated != value:
+                        setattr(result.outputs, trait, relocated)
+        except Exception as exc:
+            # e.g., the entry was evicted meanwhile
+            logger.warning("Could not retrieve %s from the shared cache: %s", key, exc)
+            return None
+        finally:
+            if op.exists(tmpfile):
+                os.remove(tmpfile)
+
+        self._touch(key)
+        save_resultfile(
+            result, outdir, name, rebase=rebase, result_format=result_format
+        )
+        return result
+
+    def publish(self, key, outdir, name, result):
+        """Store the working directory and results of a node that finished"""
+        outputs = getattr(result, "outputs", None)
+        if outputs is not None and hasattr(outputs, "trait_get"):
+            for path in _path_outputs(outputs.trait_get()):
+                path = op.realpath(path)
+                if op.exists(path) and not path.startswith(outdir + os.sep):
+                    logger.debug(
+                        "Not sharing the results in %s: output '%s' is outside "
+                        "the working directory.",
+                        outdir,
+                        path,
+                    )
+                    return
+
+        entry = self._entry(key)
+        if op.exists(entry):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        # Unlike mkdtemp, which makes private folders, honour the umask
+        tmpdir = op.join(self.root, ".publish-%s" % uuid4().hex)
+        os.mkdir(tmpdir)
+        try:
+            size = 0
+            files = op.join(tmpdir, "files")
+            for root, dirnames, filenames in os.walk(outdir):
+                relroot = op.relpath(root, outdir)
+                if relroot == os.curdir:
+                    dirnames[:] = [d for d in dirnames if not _is_node_file(d, name)]
+                    filenames = [f for f in filenames if not _is_node_file(f, name)]
+                os.makedirs(op.join(files, relroot), exist_ok=True)
+                for filename in filenames:
+                    src = op.join(root, filename)
+                    if op.islink(src):  # Links to inputs
+                        continue
+                    dest = op.join(files, relroot, filename)
+                    shutil.copyfile(src, dest)
+                    size += os.path.getsize(dest)
+
+            # Save the results with paths relative to the working directory
+            save_resultfile(result, outdir, "_shared", rebase=True)
+            shutil.move(
+                op.join(outdir, "result__shared.pklz"), op.join(tmpdir, "result.pklz")
+            )
+            with open(op.join(tmpdir, "size"), "w") as fobj:
+                fobj.write("%d" % size)
+            with open(op.join(tmpdir, "origin"), "w") as fobj:
+                fobj.write(outdir)
+            _make_read_only(tmpdir)
+
+            with self._lock():
+                if not op.exists(entry):
+                    os.makedirs(op.dirname(entry), exist_ok=True)
+                    os.rename(tmpdir, entry)
+                    logger.debug("Published %s in the shared cache.", outdir)
+                    total = self._read_size()
+                    if total is not None:
+                        total += size
+                        self._write_size(total)
+                    if total is None or total > self.max_size:
+                        self._evict()
+        except Exception as exc:
+            logger.warning("Could not publish %s in the shared cache: %s", outdir, exc)
+        finally:
+            if op.exists(tmpdir):
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _read_size(self):
+        """Return the total size of the entries, or ``None`` if unknown"""
+        try:
+            with open(op.join(self.root, "store.size")) as fobj:
+                return int(fobj.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_size(self, total):
+        tmpfile = op.join(self.root, ".store.size-%s" % uuid4().hex)
+        with open(tmpfile, "w") as fobj:
+            fobj.write("%d" % total)
+        os.replace(tmpfile, op.join(self.root, "store.size"))
+
+    def entries(self):
+        """Return the ``(last use, size, path)`` of the entries of the store"""
+        accesses = self._accesses()
+        entries = []
+        for prefix in os.listdir(self.root):
+            if prefix.startswith("."):
+                continue
+            prefix = op.join(self.root, prefix)
+            if not op.isdir(prefix):
+                continue
+            for key in os.listdir(prefix):
+                entry = op.join(prefix, key)
+                try:
+                    with open(op.join(entry, "size")) as fobj:
+                        size = int(fobj.read())
+                    used = os.stat(op.join(entry, "result.pklz")).st_mtime
+                except (OSError, ValueError):
+                    continue
+                entries.append((max(used, accesses.get(key, 0)), size, entry))
+        return entries
+
+    def _evict(self):
+        """
+        Remove the least recently used entries beyond the size of the store.
+
+        The store is scanned, and its size and access log are rewritten.
+        Must be called with the lock held.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_size:
+            for _, size, entry in entries:
+                if total <= _EVICT_TO * self.max_size:
+                    break
+                # Renaming first makes the entry disappear at once for readers
+                trash = mkdtemp(prefix=".evict-", dir=self.root)
+                os.rename(entry, op.join(trash, "entry"))
+                shutil.rmtree(trash, ignore_errors=True)
+                total -= size
+                logger.debug("Evicted %s from the shared cache.", entry)
+        self._write_size(total)
+
+        # Keep the last use of the remaining entries only (uses logged while
+        # rewriting may be lost, which only makes entries look older)
+        accesses = self._accesses()
+        if accesses:
+            tmpfile = op.join(self.root, ".store.access-%s" % uuid4().hex)
+            with open(tmpfile, "w") as fobj:
+                for key, used in accesses.items():
+                    if op.exists(self._entry(key)):
+                        fobj.write("%d %s\n" % (used, key))
+            os.replace(tmpfile, op.join(self.root, "store.access"))
+
+
+_stores = {}
+
+
+def get_shared_store(root, max_size_gb=50):
+    """Return the shared store of results in ``root``"""
+    root = op.abspath(op.expanduser(root))
+    if root not in _stores:
+        _stores[root] = SharedStore(root, max_size_gb)
+    _stores[root].max_size = int(max_size_gb * 1024 ** 3)
+    return _stores[root]
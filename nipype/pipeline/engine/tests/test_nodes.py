@@ -2,6 +2,7 @@
 # emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
 # vi: set ft=python sts=4 ts=4 sw=4 et:
 import os
+import stat
 from copy import deepcopy
 import pytest
 
@@ -252,6 +253,173 @@ def test_node_hash(tmpdir):
     w1.run(plugin=RaiseError())
 
 
+def test_cache_index(tmpdir, monkeypatch):
+    from nipype.pipeline.engine import nodes
+    from nipype.utils.cacheindex import INDEX_FILE, get_cache_index, rebuild_index
+
+    tmpdir.chdir()
+    config.set("execution", "cache_index", True)
+
+    def pair(a):
+        return [a, a + 1]
+
+    def increment(a):
+        return a + 1
+
+    n1 = pe.Node(niu.Function(function=pair), name="n1")
+    n2 = pe.MapNode(niu.Function(function=increment), iterfield=["a"], name="n2")
+    n1.inputs.a = 2
+    wf = pe.Workflow(name="wf", base_dir=tmpdir.strpath)
+    wf.connect(n1, "out", n2, "a")
+    try:
+        wf.run()
+        index = get_cache_index(tmpdir.strpath)
+        for outdir in ("wf/n1", "wf/n2", "wf/n2/mapflow/_n20"):
+            assert index.lookup(outdir) is not None
+
+        # Cached nodes are found without listing their directories
+        def _glob(pattern):
+            raise AssertionError("Unexpected listing of %s" % pattern)
+
+        monkeypatch.setattr(nodes, "glob", _glob)
+        execgraph = wf.run()
+        monkeypatch.undo()
+        results = {node.name: node.result for node in execgraph.nodes()}
+        assert results["n2"].outputs.out == [3, 4]
+
+        tmpdir.join(INDEX_FILE).remove()
+        assert rebuild_index(tmpdir.strpath) == 4
+        assert index.lookup("wf/n2/mapflow/_n21") is not None
+    finally:
+        config.set("execution", "cache_index", False)
+
+
+def test_workflow_hash_algorithm(tmpdir, monkeypatch):
+    from nipype.pipeline.engine import nodes
+
+    infile = tmpdir.join("in.txt")
+    infile.write("input")
+
+    def run_workflow():
+        node = pe.Node(UtilsTestInterface(), name="node")
+        node.inputs.in_file = infile.strpath
+        wf = pe.Workflow(name="wf", base_dir=tmpdir.strpath)
+        wf.config["execution"].update(
+            {"hash_method": "content", "hash_algorithm": "sha256"}
+        )
+        wf.add_nodes([node])
+        (node,) = wf.run().nodes()
+        return node
+
+    node = run_workflow()
+    # The inputs are hashed as set for the workflow, not globally
+    assert config.get("execution", "hash_algorithm") == "md5"
+    assert node._hash_options()["algorithm"] == "sha256"
+    assert dict(node._get_hashval()[0])["in_file"][1].startswith("sha256:")
+
+    # and the master finds the results of the node up to date
+    run_interface = nodes.Node._run_interface
+
+    def _run_interface(self, execute=True, updatehash=False):
+        assert not execute, "Node %s was run" % self.fullname
+        return run_interface(self, execute=execute, updatehash=updatehash)
+
+    monkeypatch.setattr(nodes.Node, "_run_interface", _run_interface)
+    run_workflow()
+
+
+def test_shared_cache(tmpdir, monkeypatch):
+    from nipype.pipeline.engine import nodes
+    from nipype.pipeline.engine.store import get_shared_store
+
+    tmpdir.chdir()
+    infile = tmpdir.join("in.txt")
+    infile.write("input")
+    config.set("execution", "hash_method", "content")
+    config.set("execution", "shared_cache", tmpdir.join("store").strpath)
+
+    def write(in_file):
+        import os
+
+        out_file = os.path.abspath("out.txt")
+        with open(in_file) as fin, open(out_file, "w") as fout:
+            fout.write(fin.read().upper())
+        return out_file
+
+    def run_workflow(name):
+        node = pe.Node(niu.Function(function=write), name="write")
+        node.inputs.in_file = infile.strpath
+        wf = pe.Workflow(name=name, base_dir=tmpdir.strpath)
+        wf.add_nodes([node])
+        (node,) = wf.run().nodes()
+        return node.result.outputs.out
+
+    try:
+        assert run_workflow("wf1") == tmpdir.join("wf1", "write", "out.txt").strpath
+        assert len(get_shared_store(tmpdir.join("store").strpath).entries()) == 1
+
+        # Another workflow retrieves the results instead of running the node
+        def _run_interface(self, execute=True, updatehash=False):
+            raise AssertionError("Node %s was run" % self.fullname)
+
+        monkeypatch.setattr(nodes.Node, "_run_interface", _run_interface)
+        out_file = run_workflow("wf2")
+        assert out_file == tmpdir.join("wf2", "write", "out.txt").strpath
+        with open(out_file) as fobj:
+            assert fobj.read() == "INPUT"
+    finally:
+        config.set("execution", "hash_method", "timestamp")
+        config._config.remove_option("execution", "shared_cache")
+
+
+def test_shared_cache_eviction(tmpdir):
+    from nipype.interfaces.base import InterfaceResult
+    from nipype.pipeline.engine.store import SharedStore
+
+    store = SharedStore(tmpdir.join("store").strpath, max_size_gb=15e-9)
+    for i, key in enumerate(("aa01", "bb02", "cc03")):
+        outdir = tmpdir.mkdir("node%d" % i)
+        outdir.join("out.txt").write("0123456789")
+        store.publish(key, outdir.strpath, "node", InterfaceResult(None, None))
+        os.utime(tmpdir.join("store", key[:2], key, "result.pklz").strpath, (i, i))
+    # Only the most recent entry fits in the store
+    assert [entry[-1][-4:] for entry in store.entries()] == ["cc03"]
+    assert tmpdir.join("store", "store.size").read() == "10"
+
+
+def test_shared_cache_other_users(tmpdir, monkeypatch):
+    from nipype.interfaces.base import InterfaceResult
+    from nipype.pipeline.engine import store as store_module
+
+    umask = os.umask(0o022)
+    try:
+        store = store_module.SharedStore(tmpdir.join("store").strpath)
+        outdir = tmpdir.mkdir("node")
+        outdir.join("out.txt").write("0123456789")
+        store.publish("aa01", outdir.strpath, "node", InterfaceResult(None, None))
+    finally:
+        os.umask(umask)
+    # Entries can be read by other users, but not modified
+    entry = tmpdir.join("store", "aa", "aa01")
+    assert stat.S_IMODE(entry.stat().mode) == 0o755
+    assert stat.S_IMODE(entry.join("files", "out.txt").stat().mode) == 0o444
+    assert stat.S_IMODE(entry.join("result.pklz").stat().mode) == 0o444
+
+    os.utime(entry.join("result.pklz").strpath, (0, 0))
+
+    # The results files of other users cannot be touched: uses are logged
+    def utime(path, *args, **kwargs):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(store_module.os, "utime", utime)
+    fetched = tmpdir.mkdir("fetched")
+    assert store.fetch("aa01", fetched.strpath, "node") is not None
+    assert fetched.join("out.txt").read() == "0123456789"
+    ((used, _, _),) = store.entries()
+    assert used > 0
+    assert tmpdir.join("store", "store.access").read().endswith(" aa01\n")
+
+
 def test_outputs_removal(tmpdir):
     def test_function(arg1):
         import os
@@ -9,9 +9,15 @@ import pytest
 
 from ... import engine as pe
 from ....interfaces import base as nib
+from ....interfaces.base.support import LazyInterfaceResult
 from ....interfaces import utility as niu
 from .... import config
-from ..utils import clean_working_directory, write_workflow_prov, load_resultfile
+from ..utils import (
+    clean_working_directory,
+    write_workflow_prov,
+    load_resultfile,
+    ResultCache,
+)
 
 
 class InputSpec(nib.TraitedSpec):
@@ -282,14 +288,17 @@ def test_modify_paths_bug(tmpdir):
 
 
 @pytest.mark.parametrize("use_relative", [True, False])
-def test_save_load_resultfile(tmpdir, use_relative):
+@pytest.mark.parametrize("result_format", ["pklz", "pkl"])
+def test_save_load_resultfile(tmpdir, use_relative, result_format):
     """Test minimally the save/load functions for result files."""
     from shutil import copytree, rmtree
 
     tmpdir.chdir()
 
     old_use_relative = config.getboolean("execution", "use_relative_paths")
+    old_result_format = config.get("execution", "result_format")
     config.set("execution", "use_relative_paths", use_relative)
+    config.set("execution", "result_format", result_format)
 
     spc = pe.Node(StrPathConfuser(in_str="2"), name="spc")
     spc.base_dir = tmpdir.mkdir("node").strpath
@@ -300,6 +309,8 @@ def test_save_load_resultfile(tmpdir, use_relative):
         tmpdir.join("node").join("spc").join("result_spc.pklz").strpath
     )
 
+    # The runtime of fast result files is only unpickled upon access
+    assert isinstance(loaded_result, LazyInterfaceResult) is (result_format == "pkl")
     assert result.runtime.dictcopy() == loaded_result.runtime.dictcopy()
     assert result.inputs == loaded_result.inputs
     assert result.outputs.get() == loaded_result.outputs.get()
@@ -327,3 +338,52 @@ def test_save_load_resultfile(tmpdir, use_relative):
             )
 
     config.set("execution", "use_relative_paths", old_use_relative)
+    config.set("execution", "result_format", old_result_format)
+
+
+@pytest.mark.parametrize("plugin", ["Linear", "MultiProc"])
+def test_workflow_result_format(tmpdir, plugin):
+    """The format of result files can be set per workflow"""
+    spc = pe.Node(StrPathConfuser(in_str="2"), name="spc")
+    wf = pe.Workflow(name="wf", base_dir=tmpdir.strpath)
+    wf.config["execution"]["result_format"] = "pkl"
+    wf.add_nodes([spc])
+    wf.run(plugin=plugin, plugin_args={"n_procs": 1})
+
+    assert config.get("execution", "result_format") == "pklz"
+    loaded_result = load_resultfile(tmpdir.join("wf", "spc", "result_spc.pklz").strpath)
+    assert isinstance(loaded_result, LazyInterfaceResult)
+
+
+def test_result_cache(tmpdir):
+    tmpdir.chdir()
+    results_files = []
+    for name in ("a", "b"):
+        node = pe.Node(niu.IdentityInterface(fields=["x"]), name=name)
+        node.base_dir = tmpdir.strpath
+        node.inputs.x = name
+        node.run()
+        results_files.append(tmpdir.join(name, "result_%s.pklz" % name).strpath)
+
+    cache = ResultCache(maxsize=1)
+    outputs = cache.outputs(results_files[0])
+    assert outputs.x == "a"
+    assert cache.outputs(results_files[0]) is outputs
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 1}
+
+    # The least recently used entry is evicted
+    assert cache.outputs(results_files[1]).x == "b"
+    assert cache.outputs(results_files[0]) is not outputs
+    assert cache.stats() == {"hits": 1, "misses": 3, "size": 1, "maxsize": 1}
+
+    # Rewriting the results file invalidates the entry
+    outputs = cache.outputs(results_files[0])
+    stat = os.stat(results_files[0])
+    os.utime(results_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.outputs(results_files[0]) is not outputs
+
+    cache.clear()
+    assert cache.stats()["size"] == 0
+    cache = ResultCache(maxsize=0)
+    cache.outputs(results_files[0])
+    assert cache.stats() == {"hits": 0, "misses": 1, "size": 0, "maxsize": 0}
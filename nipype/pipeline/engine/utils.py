@@ -5,8 +5,9 @@
 import os
 import sys
 import pickle
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import re
+from threading import Lock
 from copy import deepcopy
 from glob import glob
 from pathlib import Path
@@ -20,7 +21,7 @@ import numpy as np
 
 from ... import logging, config, LooseVersion
 from ...utils.filemanip import (
-    indirectory,
+    thread_workdir,
     relpath,
     fname_presuffix,
     ensure_list,
@@ -41,7 +42,7 @@ from ...interfaces.base.traits_extension import (
     isdefined,
     Undefined,
 )
-from ...interfaces.base.support import Bunch, InterfaceResult
+from ...interfaces.base.support import Bunch, InterfaceResult, LazyInterfaceResult
 from ...interfaces.base import CommandLine
 from ...interfaces.utility import IdentityInterface
 from ...utils.provenance import ProvStore, pm, nipype_ns, get_id
@@ -221,33 +222,62 @@ def write_report(node, report_type=None, is_mapnode=False):
     )
 
 
-def save_resultfile(result, cwd, name, rebase=None):
-    """Save a result pklz file to ``cwd``."""
+def save_resultfile(result, cwd, name, rebase=None, result_format=None):
+    """
+    Save a result pklz file to ``cwd``.
+
+    ``result_format`` (by default, the ``result_format`` option of the
+    ``execution`` section) selects the format of the file: a gzipped pickle (``pklz``, the default), or an
+    uncompressed pickle using the highest protocol available where the
+    runtime, inputs and provenance are only unpickled when accessed (``pkl``,
+    see :class:`~nipype.interfaces.base.support.LazyInterfaceResult`).
+    Both formats use the ``.pklz`` extension and are read by
+    :func:`load_resultfile`.
+    """
     if rebase is None:
         rebase = config.getboolean("execution", "use_relative_paths")
 
+    if result_format is None:
+        result_format = config.get("execution", "result_format", "pklz")
+    if result_format == "pklz":
+        save = savepkl
+    elif result_format == "pkl":
+
+        def save(filename, result):
+            savepkl(
+                filename,
+                LazyInterfaceResult.from_result(result),
+                compress=False,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    else:
+        raise ValueError(
+            "Unknown result_format '%s' (valid formats: 'pklz', 'pkl')." % result_format
+        )
+
     cwd = os.path.abspath(cwd)
     resultsfile = os.path.join(cwd, "result_%s.pklz" % name)
     logger.debug("Saving results file: '%s'", resultsfile)
 
     if result.outputs is None:
         logger.warning("Storing result file without outputs")
-        savepkl(resultsfile, result)
+        save(resultsfile, result)
         return
     try:
         output_names = result.outputs.copyable_trait_names()
     except AttributeError:
         logger.debug("Storing non-traited results, skipping rebase of paths")
-        savepkl(resultsfile, result)
+        save(resultsfile, result)
         return
 
     if not rebase:
-        savepkl(resultsfile, result)
+        save(resultsfile, result)
         return
 
     backup_traits = {}
     try:
-        with indirectory(cwd):
+        with thread_workdir(cwd):
             # All the magic to fix #2944 resides here:
             for key in output_names:
                 old = getattr(result.outputs, key)
@@ -259,7 +289,7 @@ def save_resultfile(result, cwd, name, rebase=None):
                     backup_traits[key] = old
                     val = rebase_path_traits(result.outputs.trait(key), old, cwd)
                     setattr(result.outputs, key, val)
-        savepkl(resultsfile, result)
+        save(resultsfile, result)
     finally:
         # Restore resolved paths from the outputs dict no matter what
         for key, val in list(backup_traits.items()):
@@ -312,6 +342,77 @@ def load_resultfile(results_file, resolve=True):
     return result
 
 
+class ResultCache(object):
+    """
+    A bounded LRU cache of the outputs loaded from results files.
+
+    Entries are keyed by the path, modification time and size of the results
+    file, so that rewriting it (e.g., when the node is rerun) invalidates the
+    cached outputs. The maximum number of entries is read from the
+    ``result_cache_size`` option of the ``execution`` section, unless set
+    with ``maxsize`` (``0`` disables the cache).
+    The cache is thread-safe, and cached outputs are shared: they must not be
+    modified.
+
+    >>> cache = ResultCache(maxsize=2)
+    >>> cache.stats()
+    {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 2}
+
+    """
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return int(config.get("execution", "result_cache_size", 256))
+
+    def outputs(self, results_file):
+        """Return the outputs stored in ``results_file`` (see :func:`load_resultfile`)"""
+        stat = os.stat(results_file)
+        key = (os.path.abspath(results_file), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        outputs = load_resultfile(results_file).outputs
+        maxsize = self.maxsize
+        with self._lock:
+            if maxsize > 0:
+                self._entries[key] = outputs
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+        return outputs
+
+    def clear(self):
+        """Drop all the entries and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the number of hits, misses and entries of the cache"""
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+            )
+
+
+result_cache = ResultCache()
+
+
 def strip_temp(files, wd):
     """Remove temp from a list of file paths"""
     out = []
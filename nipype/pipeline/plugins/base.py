@@ -3,10 +3,12 @@
 # vi: set ft=python sts=4 ts=4 sw=4 et:
 """Common graph operations for execution."""
 import sys
-from copy import deepcopy
+import fnmatch
 from glob import glob
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
 from time import sleep, time
 from traceback import format_exception
 
@@ -14,13 +16,45 @@ import numpy as np
 
 from ... import logging
 from ...utils.misc import str2bool
-from ..engine.utils import topological_sort, load_resultfile
-from ..engine import MapNode
-from .tools import report_crash, report_nodes_not_run, create_pyscript
+from ...utils.history import (
+    RuntimeHistory,
+    input_signature,
+    interface_key,
+    runtime_records,
+)
+from ..engine.utils import topological_sort, load_resultfile, result_cache
+from ...interfaces.utility import IdentityInterface
+from ..engine import MapNode, Node
+from .tools import (
+    report_crash,
+    report_nodes_not_run,
+    create_pyscript,
+    create_array_pyscript,
+    prefetch_inputs,
+    create_cluster_pyscript,
+    _get_batch_dir,
+    _pickle_node,
+)
+from .pilot import TaskQueue
+from ...utils.watcher import get_watcher, wait_for_file
 
 logger = logging.getLogger("nipype.workflow")
 
 
+def _grow(array, size):
+    """
+    Return ``array`` or a copy of it with room for at least ``size`` elements.
+
+    The capacity is doubled every time it is exhausted, so that appending
+    elements one chunk at a time has an amortized cost of O(1) per element.
+    """
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
 class PluginBase(object):
     """Base class for plugins."""
 
@@ -74,15 +108,53 @@ class DistributedPluginBase(PluginBase):
     ----------
     procs : :obj:`list`
         list (N) of underlying interface elements to be processed
+    jobids : :obj:`dict`
+        maps each node of the execution graph onto its index in ``procs``
     proc_done : :obj:`numpy.ndarray`
         a boolean numpy array (N,) signifying whether a process has been
         submitted for execution
     proc_pending : :obj:`numpy.ndarray`
         a boolean numpy array (N,) signifying whether a
         process is currently running.
-    depidx : :obj:`numpy.matrix`
-        a boolean matrix (NxN) storing the dependency structure accross
-        processes. Process dependencies are derived from each column.
+
+    The dependency structure across processes is stored as adjacency lists
+    (``_children``, ``_parents``), and ``proc_done``/``proc_pending`` are
+    views on buffers whose capacity is doubled when exhausted. Expanding a
+    MapNode into N subnodes therefore costs O(N), regardless of the total
+    number of jobs.
+
+    Jobs that are ready to run are not searched for: each job keeps a
+    counter of unfinished dependencies, which is decremented when a
+    parent finishes. Jobs whose counter reaches zero enter a ready set.
+
+    Plugins that learn about finished tasks asynchronously (e.g., through
+    a completion callback) may set ``_events`` to a :obj:`queue.Queue`
+    and call :meth:`_notify_task_done` when a task finishes.
+    The main loop then blocks on that queue instead of sleeping
+    ``poll_sleep_duration`` seconds per iteration, only checks the tasks
+    that have signaled completion, and dispatches dependent jobs as soon
+    as their last parent finishes.
+    Plugins that cannot emit events keep the polling loop.
+
+    With the ``estimate_resources`` plugin argument, the runtime, memory and
+    CPU usage of every executed interface are stored in a persistent history
+    (see :mod:`nipype.utils.history`, and ``runtime_history`` to choose the
+    database file), and :meth:`_estimate_resources` looks up the resources
+    required by a node in previous runs. Memory and CPU usage are only
+    recorded when the resource monitor is enabled.
+
+    With the ``prefetch`` plugin argument (``True`` or a number of threads),
+    jobs waiting for a single parent have the inputs provided by their
+    finished parents loaded and read ahead in background threads (see
+    :func:`~nipype.pipeline.plugins.tools.prefetch_inputs`), so that they
+    start with warm inputs on network filesystems.
+
+    With the ``preflight`` plugin argument (``True`` or a number of threads),
+    the cache of the workflow is checked before scheduling: the nodes whose
+    inputs are known are checked concurrently, cached nodes are marked as
+    done in bulk, and the check is repeated for their dependents until no
+    more cached nodes are found (see :meth:`_preflight_check`). Scheduling
+    then starts from the remaining frontier.
 
     """
 
@@ -93,14 +165,41 @@ class DistributedPluginBase(PluginBase):
         """
         super(DistributedPluginBase, self).__init__(plugin_args=plugin_args)
         self.procs = None
-        self.depidx = None
-        self.refidx = None
+        self.jobids = None
         self.mapnodes = None
         self.mapnodesubids = None
-        self.proc_done = None
-        self.proc_pending = None
+        self._proc_done = None
+        self._proc_pending = None
+        self._children = None
+        self._parents = None
+        self._indegree = None
+        self._refcount = None
+        self._ready = set()
+        self._removed = set()
         self.pending_tasks = []
         self.max_jobs = self.plugin_args.get("max_jobs", np.inf)
+        self._events = None
+        self._finished_tasks = set()
+        self._prefetcher = None
+        self._prefetches = []
+        self._history = None
+        self._runtimes = []
+        if self.plugin_args.get("estimate_resources"):
+            self._history = RuntimeHistory(self.plugin_args.get("runtime_history"))
+
+    @property
+    def proc_done(self):
+        """Whether each job has been submitted for execution"""
+        if self._proc_done is None:
+            return None
+        return self._proc_done[: len(self.procs)]
+
+    @property
+    def proc_pending(self):
+        """Whether each job is currently running"""
+        if self._proc_pending is None:
+            return None
+        return self._proc_pending[: len(self.procs)]
 
     def _prerun_check(self, graph):
         """Stub method to validate/massage graph and nodes before running"""
@@ -119,8 +218,14 @@ class DistributedPluginBase(PluginBase):
         self._prerun_check(graph)
         # Generate appropriate structures for worker-manager model
         self._generate_dependency_list(graph)
-        self.mapnodes = []
+        self.mapnodes = set()
         self.mapnodesubids = {}
+        if self.plugin_args.get("preflight"):
+            self._preflight_check()
+        if self.plugin_args.get("prefetch"):
+            self._prefetcher = ThreadPoolExecutor(
+                max_workers=int(self.plugin_args["prefetch"])
+            )
         # setup polling - TODO: change to threaded model
         notrun = []
 
@@ -129,8 +234,7 @@ class DistributedPluginBase(PluginBase):
         while not np.all(self.proc_done) or np.any(self.proc_pending):
             loop_start = time()
             # Check if a job is available (jobs with all dependencies run)
-            # https://github.com/nipy/nipype/pull/2200#discussion_r141605722
-            jobs_ready = np.nonzero(~self.proc_done & (self.depidx.sum(0) == 0))[1]
+            jobs_ready = self._ready_jobs()
 
             progress_stats = (
                 len(self.proc_done),
@@ -153,10 +257,15 @@ class DistributedPluginBase(PluginBase):
             # trigger callbacks for any pending results
             while self.pending_tasks:
                 taskid, jobid = self.pending_tasks.pop()
+                if self._events is not None and taskid not in self._finished_tasks:
+                    # No completion event received yet, do not query the task
+                    toappend.insert(0, (taskid, jobid))
+                    continue
                 try:
                     result = self._get_result(taskid)
                 except Exception:
                     notrun.append(self._clean_queue(jobid, graph))
+                    self._finished_tasks.discard(taskid)
                 else:
                     if result:
                         if result["traceback"]:
@@ -164,9 +273,11 @@ class DistributedPluginBase(PluginBase):
                                 self._clean_queue(jobid, graph, result=result)
                             )
                         else:
+                            self._record_runtime(result["result"])
                             self._task_finished_cb(jobid)
                             self._remove_node_dirs()
                         self._clear_task(taskid)
+                        self._finished_tasks.discard(taskid)
                     else:
                         assert self.proc_done[jobid] and self.proc_pending[jobid]
                         toappend.insert(0, (taskid, jobid))
@@ -185,19 +296,93 @@ class DistributedPluginBase(PluginBase):
             elif display_stats:
                 logger.debug("Not submitting (max jobs reached)")
 
-            sleep_til = loop_start + poll_sleep_secs
-            sleep(max(0, sleep_til - time()))
+            self._wait_for_events(loop_start + poll_sleep_secs)
 
         self._remove_node_dirs()
+        if self._prefetcher is not None:
+            for future in self._prefetches:
+                future.cancel()
+            self._prefetcher.shutdown()
+            self._prefetcher = None
         report_nodes_not_run(notrun)
 
+        if self._history is not None:
+            self._history.record(self._runtimes)
+            self._runtimes = []
+        logger.debug(
+            "Result cache: %(hits)d hits, %(misses)d misses, "
+            "%(size)d/%(maxsize)d entries.",
+            result_cache.stats(),
+        )
+
         # close any open resources
         self._postrun_check()
 
+    def _notify_task_done(self, taskid):
+        """
+        Signal the main loop that a task has finished.
+
+        This method is thread-safe and can be called from completion
+        callbacks. A ``taskid`` of ``None`` just wakes the main loop up.
+        """
+        if self._events is not None:
+            self._events.put(taskid)
+
+    def _wait_for_events(self, deadline):
+        """
+        Wait until the next scheduling iteration is due.
+
+        Polling plugins sleep until ``deadline``. Event-driven plugins
+        return as soon as some task signals completion, collecting all
+        the queued events. ``deadline`` then acts only as a safety net.
+        """
+        if self._events is None:
+            sleep(max(0, deadline - time()))
+            return
+
+        try:
+            taskid = self._events.get(timeout=max(0, deadline - time()))
+            while True:
+                if taskid is not None:
+                    self._finished_tasks.add(taskid)
+                taskid = self._events.get_nowait()
+        except Empty:
+            pass
+
+    def _record_runtime(self, result):
+        """Keep the runtime of a result, to be stored in the history"""
+        if self._history is not None:
+            self._runtimes.extend(runtime_records(result))
+
+    def _estimate_resources(self, node):
+        """
+        Estimate the memory (GB) and threads required by a node from the history.
+
+        Returns ``None`` if resources are not estimated or the interface of
+        the node has never been monitored.
+        """
+        if self._history is None or not self.plugin_args.get("estimate_resources"):
+            return None
+        try:
+            # The signature depends on the inputs set by upstream nodes
+            node._get_inputs()
+            signature = input_signature(node.inputs.get_traitsfree())
+        except Exception:
+            signature = None
+        return self._history.estimate(interface_key(node.interface), signature)
+
     def _get_result(self, taskid):
         raise NotImplementedError
 
     def _submit_job(self, node, updatehash=False):
+        """
+        Submit a node for execution and return the task id.
+
+        ``node`` is the instance held by the scheduler (it is not copied),
+        so plugins must serialize it before returning (e.g., with
+        :class:`~nipype.pipeline.plugins.tools.NodeTask`) rather than keep
+        a reference to it.
+        """
         raise NotImplementedError
 
     def _report_crash(self, node, result=None):
@@ -225,6 +410,8 @@ class DistributedPluginBase(PluginBase):
         crashfile = self._report_crash(self.procs[jobid], result=result)
         if str2bool(self._config["execution"]["stop_on_first_crash"]):
             raise RuntimeError("".join(result["traceback"]))
+        # Resources are released and dependents removed, check again right away
+        self._notify_task_done(None)
         if jobid in self.mapnodesubids:
             # remove current jobid
             self.proc_pending[jobid] = False
@@ -237,32 +424,25 @@ class DistributedPluginBase(PluginBase):
         return self._remove_node_deps(jobid, crashfile, graph)
 
     def _submit_mapnode(self, jobid):
-        import scipy.sparse as ssp
-
         if jobid in self.mapnodes:
             return True
-        self.mapnodes.append(jobid)
+        self.mapnodes.add(jobid)
         mapnodesubids = self.procs[jobid].get_subnodes()
         numnodes = len(mapnodesubids)
         logger.debug("Adding %d jobs for mapnode %s", numnodes, self.procs[jobid])
-        for i in range(numnodes):
-            self.mapnodesubids[self.depidx.shape[0] + i] = jobid
+        newids = range(len(self.procs), len(self.procs) + numnodes)
+        for newid in newids:
+            self.mapnodesubids[newid] = jobid
         self.procs.extend(mapnodesubids)
-        self.depidx = ssp.vstack(
-            (self.depidx, ssp.lil_matrix(np.zeros((numnodes, self.depidx.shape[1])))),
-            "lil",
-        )
-        self.depidx = ssp.hstack(
-            (self.depidx, ssp.lil_matrix(np.zeros((self.depidx.shape[0], numnodes)))),
-            "lil",
-        )
-        self.depidx[-numnodes:, jobid] = 1
-        self.proc_done = np.concatenate(
-            (self.proc_done, np.zeros(numnodes, dtype=bool))
-        )
-        self.proc_pending = np.concatenate(
-            (self.proc_pending, np.zeros(numnodes, dtype=bool))
-        )
+        self._children.extend([jobid] for _ in newids)
+        self._indegree = _grow(self._indegree, len(self.procs))
+        self._proc_done = _grow(self._proc_done, len(self.procs))
+        self._proc_pending = _grow(self._proc_pending, len(self.procs))
+        # The mapnode waits for its subnodes, which are ready to run
+        self._indegree[jobid] += numnodes
+        self._ready.discard(jobid)
+        self._ready.update(newids)
+        self._notify_task_done(None)
         return False
 
     def _send_procs_to_workers(self, updatehash=False, graph=None):
@@ -281,8 +461,7 @@ class DistributedPluginBase(PluginBase):
                 break
 
             # Check if a job is available (jobs with all dependencies run)
-            # https://github.com/nipy/nipype/pull/2200#discussion_r141605722
-            jobids = np.nonzero(~self.proc_done & (self.depidx.sum(0) == 0))[1]
+            jobids = self._ready_jobs()
 
             if len(jobids) > 0:
                 # send all available jobs
@@ -319,14 +498,14 @@ class DistributedPluginBase(PluginBase):
                                 "Running node %s on master thread", self.procs[jobid]
                             )
                             try:
-                                self.procs[jobid].run()
+                                self._record_runtime(self.procs[jobid].run())
                             except Exception:
                                 self._clean_queue(jobid, graph)
                             self._task_finished_cb(jobid)
                             self._remove_node_dirs()
                         else:
                             tid = self._submit_job(
-                                deepcopy(self.procs[jobid]), updatehash=updatehash
+                                self.procs[jobid], updatehash=updatehash
                             )
                             if tid is None:
                                 self.proc_done[jobid] = False
@@ -339,7 +518,52 @@ class DistributedPluginBase(PluginBase):
             else:
                 break
 
-    def _local_hash_check(self, jobid, graph):
+    def _preflight_check(self):
+        """
+        Mark the jobs with up-to-date cached results as done, before scheduling.
+
+        The jobs that are ready to run are checked concurrently, in waves:
+        once the cached jobs of a wave are marked as done, their dependents
+        that became ready form the next wave. Jobs found not to be cached
+        are left to the scheduler, which does not check them again until
+        they are submitted.
+        """
+        nthreads = self.plugin_args["preflight"]
+        if nthreads is True:
+            nthreads = os.cpu_count() or 1
+        start = time()
+        checked = set()
+        skipped = 0
+        with ThreadPoolExecutor(max_workers=int(nthreads)) as pool:
+            wave = self._ready_jobs().tolist()
+            while wave:
+                checked.update(wave)
+                for jobid, cached in zip(wave, pool.map(self._is_cached, wave)):
+                    if not cached:
+                        continue
+                    self.proc_done[jobid] = True
+                    self.proc_pending[jobid] = True
+                    if self._status_callback:
+                        self._status_callback(self.procs[jobid], "start")
+                    self._task_finished_cb(jobid, cached=True)
+                    skipped += 1
+                wave = [
+                    jobid
+                    for jobid in self._ready_jobs().tolist()
+                    if jobid not in checked
+                ]
+        self._remove_node_dirs()
+        logger.info(
+            "Pre-flight check: %d/%d nodes found cached and skipped, "
+            "%d checked in %.2fs.",
+            skipped,
+            len(self.procs),
+            len(checked),
+            time() - start,
+        )
+
+    def _is_cached(self, jobid):
+        """Whether a job has up-to-date cached results and can be skipped"""
         if not str2bool(self.procs[jobid].config["execution"]["local_hash_check"]):
             return False
 
@@ -367,12 +591,14 @@ class DistributedPluginBase(PluginBase):
         )
         overwrite = self.procs[jobid].overwrite
         always_run = self.procs[jobid].interface.always_run
-
-        if (
+        return (
             cached
             and updated
             and (overwrite is False or overwrite is None and not always_run)
-        ):
+        )
+
+    def _local_hash_check(self, jobid, graph):
+        if self._is_cached(jobid):
             logger.debug(
                 "Skipping cached node %s with ID %s.", self.procs[jobid], jobid
             )
@@ -406,53 +632,114 @@ class DistributedPluginBase(PluginBase):
             self._status_callback(self.procs[jobid], "end")
         # Update job and worker queues
         self.proc_pending[jobid] = False
+        # Dependents may be ready now, do not wait before the next iteration
+        self._notify_task_done(None)
         # update the job dependency structure
-        rowview = self.depidx.getrowview(jobid)
-        rowview[rowview.nonzero()] = 0
+        children, self._children[jobid] = self._children[jobid], []
+        for child in children:
+            self._indegree[child] -= 1
+            if self._indegree[child] == 0:
+                self._ready.add(child)
+            elif self._indegree[child] == 1:
+                self._prefetch(child)
         if jobid not in self.mapnodesubids:
-            self.refidx[self.refidx[:, jobid].nonzero()[0], jobid] = 0
+            parents, self._parents[jobid] = self._parents[jobid], []
+            for parent in parents:
+                self._refcount[parent] -= 1
+
+    def _prefetch(self, jobid):
+        """Read ahead, in the background, the inputs of a job almost ready"""
+        if self._prefetcher is None or jobid in self.mapnodes:
+            return
+        # Only copies are handed to the background thread
+        input_source = dict(self.procs[jobid].input_source)
+        results_files = {
+            os.path.join(
+                self.procs[parent].output_dir(),
+                "result_%s.pklz" % self.procs[parent].name,
+            )
+            for parent in self._parents[jobid]
+            if self.proc_done[parent] and not self.proc_pending[parent]
+        }
+        future = self._prefetcher.submit(prefetch_inputs, input_source, results_files)
+        future.add_done_callback(self._prefetch_done)
+        self._prefetches.append(future)
+
+    def _prefetch_done(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug("Could not prefetch inputs: %s", future.exception())
 
     def _generate_dependency_list(self, graph):
         """ Generates a dependency list for a list of graphs.
         """
-        import networkx as nx
-
         self.procs, _ = topological_sort(graph)
-        try:
-            self.depidx = nx.to_scipy_sparse_matrix(
-                graph, nodelist=self.procs, format="lil"
-            )
-        except:
-            self.depidx = nx.to_scipy_sparse_matrix(graph, nodelist=self.procs)
-        self.refidx = deepcopy(self.depidx)
-        self.refidx.astype = np.int
-        self.proc_done = np.zeros(len(self.procs), dtype=bool)
-        self.proc_pending = np.zeros(len(self.procs), dtype=bool)
+        self.jobids = {node: jobid for jobid, node in enumerate(self.procs)}
+        self._children = [
+            [self.jobids[child] for child in graph.successors(node)]
+            for node in self.procs
+        ]
+        self._parents = [
+            [self.jobids[parent] for parent in graph.predecessors(node)]
+            for node in self.procs
+        ]
+        self._proc_done = np.zeros(len(self.procs), dtype=bool)
+        self._proc_pending = np.zeros(len(self.procs), dtype=bool)
+        # Number of unfinished dependencies of each job
+        self._indegree = np.array(
+            [len(parents) for parents in self._parents], dtype=int
+        )
+        # Number of dependent jobs that have not consumed the outputs of each job
+        self._refcount = np.array(
+            [len(children) for children in self._children], dtype=int
+        )
+        self._ready = set(np.flatnonzero(self._indegree == 0).tolist())
+        self._removed = set()
+
+    def _ready_jobs(self):
+        """
+        Return the (sorted) ids of jobs whose dependencies have all run.
+
+        Jobs that have been marked as done since they became ready (e.g.,
+        submitted or skipped because an upstream node crashed) are dropped
+        from the ready set.
+        """
+        self._ready.difference_update(
+            [jobid for jobid in self._ready if self.proc_done[jobid]]
+        )
+        return np.array(sorted(self._ready), dtype=int)
 
     def _remove_node_deps(self, jobid, crashfile, graph):
-        import networkx as nx
+        """
+        Mark a crashed job and all its descendants as done.
 
-        try:
-            dfs_preorder = nx.dfs_preorder
-        except AttributeError:
-            dfs_preorder = nx.dfs_preorder_nodes
-        subnodes = [s for s in dfs_preorder(graph, self.procs[jobid])]
-        for node in subnodes:
-            idx = self.procs.index(node)
+        The descendants are collected in the same (depth-first) traversal
+        that updates their status. Subgraphs already removed by an earlier
+        crash are not traversed (nor reported) again.
+        """
+        dependents = []
+        stack = [self.procs[jobid]]
+        while stack:
+            node = stack.pop()
+            idx = self.jobids[node]
+            if idx in self._removed:
+                continue
+            self._removed.add(idx)
             self.proc_done[idx] = True
             self.proc_pending[idx] = False
-        return dict(node=self.procs[jobid], dependents=subnodes, crashfile=crashfile)
+            dependents.append(node)
+            stack.extend(reversed(list(graph.successors(node))))
+        return dict(node=self.procs[jobid], dependents=dependents, crashfile=crashfile)
 
     def _remove_node_dirs(self):
         """Removes directories whose outputs have already been used up
         """
         if str2bool(self._config["execution"]["remove_node_directories"]):
-            indices = np.nonzero((self.refidx.sum(axis=1) == 0).__array__())[0]
+            indices = np.flatnonzero(self._refcount == 0)
             for idx in indices:
                 if idx in self.mapnodesubids:
                     continue
                 if self.proc_done[idx] and (not self.proc_pending[idx]):
-                    self.refidx[idx, idx] = -1
+                    self._refcount[idx] = -1
                     outdir = self.procs[idx].output_dir()
                     logger.info(
                         (
@@ -466,8 +753,52 @@ class DistributedPluginBase(PluginBase):
 
 class SGELikeBatchManagerBase(DistributedPluginBase):
     """Execute workflow with SGE/OGE/PBS like batch system
+
+    Plugins that can list the state of all the jobs of the user in a single
+    call to the batch system implement :meth:`_query_statuses`. Pending
+    tasks are then checked against one such bulk query per iteration of the
+    scheduler, instead of calling :meth:`_is_pending` (i.e., a status query)
+    for every task. Bulk queries can be disabled with the ``bulk_status``
+    plugin argument.
+
+    With the ``job_arrays`` plugin argument (``True`` or the maximum size
+    of an array, 1000 by default), plugins supporting job arrays
+    (:meth:`_submit_array`) submit the nodes that are ready at once and
+    share their interface, resources, plugin arguments and configuration
+    as a single job array, which runs a single script reading the node to
+    run from a manifest (see
+    :func:`~nipype.pipeline.plugins.tools.create_array_pyscript`). Results
+    are still collected per node.
+
+    With the ``pilots`` plugin argument (a number of jobs), nodes are not
+    submitted as individual jobs, but put in a queue on the shared
+    filesystem (``pilot`` in the batch directory), from which as many
+    long-lived worker jobs run them back-to-back (see
+    :mod:`~nipype.pipeline.plugins.pilot`). Workers exit once the workflow
+    is done, or after ``pilot_idle_timeout`` seconds without nodes to run
+    (60 by default), and are submitted again as needed. The nodes of
+    workers that did not report for ``pilot_timeout`` seconds (600 by
+    default) are queued again.
+    Pilots are submitted as a node named ``pilot`` whose plugin arguments
+    are the ``pilot_args`` plugin argument (e.g.,
+    ``{'sbatch_args': '--time=12:00:00'}``), not those of the nodes they
+    run. With ``estimate_resources``, pilots request the largest memory
+    and number of threads estimated for the queued nodes (unless set in
+    ``pilot_args``).
+
+    With the ``watch_results`` option of the ``execution`` section, the
+    scheduler waits for results files to be written in the working
+    directories of pending nodes (with inotify, see
+    :mod:`nipype.utils.watcher`) instead of sleeping between iterations,
+    and nodes whose results file was written since their submission are
+    collected without waiting for the batch system to list their job as
+    finished. Results written from other hosts may not be notified, and
+    are then found by the regular checks.
     """
 
+    # Environment variable with the (0-based) index of the task in a job array
+    _array_index_var = None
+
     def __init__(self, template, plugin_args=None):
         super(SGELikeBatchManagerBase, self).__init__(plugin_args=plugin_args)
         self._template = template
@@ -481,21 +812,116 @@ class SGELikeBatchManagerBase(DistributedPluginBase):
             if "qsub_args" in plugin_args:
                 self._qsub_args = plugin_args["qsub_args"]
         self._pending = {}
+        self._bulk_status = self.plugin_args.get("bulk_status", True)
+        self._statuses = None
+        self._statuses_time = None
+        self._checked = set()
+        self._submitted = {}
+        self._job_arrays = self.plugin_args.get("job_arrays", False)
+        if self._job_arrays is True:
+            self._job_arrays = 1000
+        self._array_queue = []
+        self._array_tasks = {}
+        self._array_count = 0
+        self._pilots = self.plugin_args.get("pilots", 0)
+        self._pilot_idle_timeout = self.plugin_args.get("pilot_idle_timeout", 60)
+        self._pilot_timeout = self.plugin_args.get("pilot_timeout", 600)
+        self._pilot_queue = None
+        self._pilot_node = None
+        self._pilot_jobs = []
+        self._pilot_tasks = {}
+        self._pilot_resources = {}
+        self._pilot_count = 0
+        self._watcher = None
 
     def _is_pending(self, taskid):
         """Check if a task is pending in the batch system
         """
         raise NotImplementedError
 
+    def _query_statuses(self):
+        """
+        Query the state of all the jobs of the user in the batch system.
+
+        Returns a dictionary mapping the identifier (as a string) of every
+        job listed by the batch system to whether it is pending (i.e., queued
+        or running), or ``None`` if the plugin does not support bulk queries.
+        """
+        return None
+
+    def _task_pending(self, taskid):
+        """
+        Check if a task is pending, from a bulk query of the batch system.
+
+        The batch system is queried again when a task is checked a second
+        time (i.e., in the next iteration of the scheduler). Tasks submitted
+        after the last query, which may not be listed yet, are pending, while
+        other tasks missing from the query are finished. If a query fails,
+        all the tasks are considered pending until the next one.
+        """
+        if taskid in self._pilot_tasks:
+            return self._pilot_queue.is_pending(self._pilot_tasks[taskid])
+
+        if not self._bulk_status:
+            return self._is_pending(self._array_tasks.get(taskid, taskid))
+
+        if self._statuses_time is None or taskid in self._checked:
+            self._checked = set()
+            self._statuses_time = time()
+            try:
+                self._statuses = self._query_statuses()
+            except Exception as exc:
+                logger.warning(
+                    "Could not query the status of jobs, treating them as "
+                    "pending: %s",
+                    exc,
+                )
+                self._statuses = {}
+                self._statuses_time = -float("inf")
+            if self._statuses is None:  # Not supported
+                self._bulk_status = False
+                return self._is_pending(self._array_tasks.get(taskid, taskid))
+
+        self._checked.add(taskid)
+        pending = self._statuses.get(str(self._array_tasks.get(taskid, taskid)))
+        if pending is None:
+            return self._submitted.get(taskid, -float("inf")) >= self._statuses_time
+        return pending
+
     def _submit_batchtask(self, scriptfile, node):
         """Submit a task to the batch system
         """
         raise NotImplementedError
 
+    def _submit_array(self, scriptfile, nodes):
+        """
+        Submit a job array running ``scriptfile`` once per node.
+
+        Returns the identifier of the job array. The tasks of the array are
+        identified by ``<array id>_<index>`` in the batch system.
+        """
+        raise NotImplementedError
+
+    def _result_written(self, taskid):
+        """Whether the results of a task were written since its submission"""
+        submitted = self._submitted.get(taskid)
+        node_dir = self._pending[taskid]
+        if submitted is None or glob(os.path.join(node_dir, "_0x*_unfinished.json")):
+            return False
+        for results_file in glob(os.path.join(node_dir, "result_*.pklz")):
+            try:
+                # Some filesystems store modification times to the second
+                if os.stat(results_file).st_mtime >= int(submitted):
+                    return True
+            except OSError:
+                pass
+        return False
+
     def _get_result(self, taskid):
         if taskid not in self._pending:
-            raise Exception("Task %d not found" % taskid)
-        if self._is_pending(taskid):
+            raise Exception("Task %s not found" % taskid)
+        written = self._watcher and self._result_written(taskid)
+        if not written and self._task_pending(taskid):
             return None
         node_dir = self._pending[taskid]
         # MIT HACK
@@ -503,17 +929,15 @@ class SGELikeBatchManagerBase(DistributedPluginBase):
         # accessed before internal directories become available. there
         # is a disconnect when the queueing engine knows a job is
         # finished to when the directories become statable.
-        t = time()
         timeout = float(self._config["execution"]["job_finished_timeout"])
-        timed_out = True
-        while (time() - t) < timeout:
-            try:
-                glob(os.path.join(node_dir, "result_*.pklz")).pop()
-                timed_out = False
-                break
-            except Exception as e:
-                logger.debug(e)
-            sleep(2)
+        timed_out = (
+            wait_for_file(
+                os.path.join(node_dir, "result_*.pklz"),
+                timeout,
+                watch=self._config["execution"].get("watch_results", False),
+            )
+            is None
+        )
         if timed_out:
             result_data = {"hostname": "unknown", "result": None, "traceback": None}
             results_file = None
@@ -546,6 +970,17 @@ class SGELikeBatchManagerBase(DistributedPluginBase):
     def _submit_job(self, node, updatehash=False):
         """submit job and return taskid
         """
+        if self._pilots:
+            return self._queue_job(node, updatehash=updatehash)
+
+        if self._job_arrays and self._array_index_var:
+            # Submitted with similar nodes once all the ready jobs are known
+            self._array_count += 1
+            taskid = "array-%d" % self._array_count
+            self._pending[taskid] = node.output_dir()
+            self._array_queue.append((taskid, node, updatehash))
+            return taskid
+
         pyscript = create_pyscript(node, updatehash=updatehash)
         batch_dir, name = os.path.split(pyscript)
         name = ".".join(name.split(".")[:-1])
@@ -553,14 +988,227 @@ class SGELikeBatchManagerBase(DistributedPluginBase):
         batchscriptfile = os.path.join(batch_dir, "batchscript_%s.sh" % name)
         with open(batchscriptfile, "wt") as fp:
             fp.writelines(batchscript)
-        return self._submit_batchtask(batchscriptfile, node)
+        submitted = time()
+        taskid = self._submit_batchtask(batchscriptfile, node)
+        self._submitted[taskid] = submitted
+        return taskid
+
+    def _send_procs_to_workers(self, updatehash=False, graph=None):
+        super(SGELikeBatchManagerBase, self)._send_procs_to_workers(
+            updatehash=updatehash, graph=graph
+        )
+        if self._array_queue:
+            self._submit_arrays()
+        if self._pilot_queue is not None:
+            self._check_pilots()
+
+    def _queue_job(self, node, updatehash=False):
+        """Queue a node to be run by the pilot jobs"""
+        batch_dir, suffix, pkl_file = _pickle_node(node, updatehash)
+        if self._pilot_queue is None:
+            # In the batch directory of the workflow, not of a MapNode
+            self._pilot_queue = TaskQueue(
+                os.path.join(_get_batch_dir(self.procs[0]), "pilot")
+            )
+            self._pilot_queue.stopped = False
+            # Pilots are submitted as this node, rather than as any node
+            self._pilot_node = Node(
+                IdentityInterface(fields=["queue"]),
+                name="pilot",
+                base_dir=self._pilot_queue.root,
+            )
+            self._pilot_node.plugin_args = dict(self.plugin_args.get("pilot_args", {}))
+        self._pilot_count += 1
+        taskid = "pilot-%d" % self._pilot_count
+        self._pilot_tasks[taskid] = self._pilot_queue.put(pkl_file, suffix)
+        self._pilot_resources[taskid] = self._estimate_resources(node)
+        self._pending[taskid] = node.output_dir()
+        return taskid
+
+    def _check_pilots(self):
+        """Queue the nodes of unresponsive pilots again, and start pilots"""
+        for name in self._pilot_queue.requeue_stale(self._pilot_timeout):
+            logger.warning("Pilot running %s did not respond, queued again.", name)
+        running = []
+        for jobid in self._pilot_jobs:
+            if self._task_pending(jobid):
+                running.append(jobid)
+            else:
+                self._submitted.pop(jobid, None)
+                self._checked.discard(jobid)
+        self._pilot_jobs = running
+
+        missing = min(self._pilots, len(self._pilot_queue)) - len(running)
+        for _ in range(missing):
+            batchscript = "\n".join(
+                (
+                    self._template,
+                    "NIPYPE_NO_ET=${NIPYPE_NO_ET:-1} %s -m nipype.pipeline.plugins.pilot "
+                    "%s %s"
+                    % (
+                        sys.executable,
+                        self._pilot_queue.root,
+                        self._pilot_idle_timeout,
+                    ),
+                )
+            )
+            batchscriptfile = os.path.join(
+                self._pilot_queue.root, "batchscript_pilot.sh"
+            )
+            with open(batchscriptfile, "wt") as fp:
+                fp.writelines(batchscript)
+            jobid = self._submit_batchtask(batchscriptfile, self._pilot_node)
+            # Pilots are not tasks of the workflow
+            self._pending.pop(jobid, None)
+            self._submitted[jobid] = time()
+            self._pilot_jobs.append(jobid)
+            logger.info("Submitted pilot job %s.", jobid)
+
+    def _wait_for_events(self, deadline):
+        if self._watcher is None:
+            self._watcher = (
+                get_watcher(self._config["execution"].get("watch_results", False))
+                or False
+            )
+        if not self._watcher:
+            return super(SGELikeBatchManagerBase, self)._wait_for_events(deadline)
+        if not self._pending:
+            if np.all(self.proc_done) and not np.any(self.proc_pending):
+                return  # The workflow is done
+            # Nothing to watch (e.g., a submission failed): sleep
+            return super(SGELikeBatchManagerBase, self)._wait_for_events(deadline)
+
+        # Only results and finished hashfiles (written last) matter
+        while self._pending and time() < deadline and not self._watch_pending():
+            written = [
+                os.path.basename(path)
+                for path in self._watcher.wait(max(0, deadline - time()))
+            ]
+            if fnmatch.filter(written, "result_*.pklz") or [
+                name
+                for name in fnmatch.filter(written, "_0x*.json")
+                if not name.endswith("_unfinished.json")
+            ]:
+                break
+
+    def _watch_pending(self):
+        """
+        Watch the working directories of the pending nodes.
+
+        Directories that are not created yet are watched for through their
+        closest existing parent. Returns whether results were found in newly
+        watched directories.
+        """
+        found = False
+        for node_dir in set(self._pending.values()):
+            if self._watcher.watches(node_dir):
+                continue
+            try:
+                self._watcher.add(node_dir)
+            except OSError:  # Not created yet
+                parent = os.path.dirname(node_dir)
+                while not self._watcher.watches(parent):
+                    try:
+                        self._watcher.add(parent)
+                    except OSError:
+                        if parent == os.path.dirname(parent):
+                            break
+                        parent = os.path.dirname(parent)
+            else:
+                # Written before the directory was watched
+                found = found or bool(glob(os.path.join(node_dir, "result_*.pklz")))
+        return found
+
+    def _postrun_check(self):
+        if self._pilot_queue is not None:
+            self._pilot_queue.stopped = True
+        if self._watcher:
+            self._watcher.close()
+        self._watcher = None
+        super(SGELikeBatchManagerBase, self)._postrun_check()
+
+    def _submit_arrays(self):
+        """Submit the queued nodes as job arrays of similar nodes"""
+        groups = {}
+        for taskid, node, updatehash in self._array_queue:
+            key = (
+                interface_key(node.interface),
+                node.mem_gb,
+                node.n_procs,
+                repr(sorted(node.plugin_args.items())),
+                repr(node.config),
+                updatehash,
+            )
+            groups.setdefault(key, []).append((taskid, node))
+        self._array_queue = []
+
+        for key, tasks in groups.items():
+            for start in range(0, len(tasks), self._job_arrays):
+                chunk = tasks[start : start + self._job_arrays]
+                nodes = [node for _, node in chunk]
+                pyscript = create_array_pyscript(nodes, updatehash=key[-1])
+                batch_dir, name = os.path.split(pyscript)
+                name = ".".join(name.split(".")[:-1])
+                batchscript = "\n".join(
+                    (
+                        self._template,
+                        "%s %s $%s" % (sys.executable, pyscript, self._array_index_var),
+                    )
+                )
+                batchscriptfile = os.path.join(batch_dir, "batchscript_%s.sh" % name)
+                with open(batchscriptfile, "wt") as fp:
+                    fp.writelines(batchscript)
+                submitted = time()
+                arrayid = self._submit_array(batchscriptfile, nodes)
+                logger.info(
+                    "Submitted %d nodes (%s) as job array %s.",
+                    len(nodes),
+                    key[0],
+                    arrayid,
+                )
+                for index, (taskid, _) in enumerate(chunk):
+                    self._array_tasks[taskid] = "%s_%d" % (arrayid, index)
+                    self._submitted[taskid] = submitted
 
     def _clear_task(self, taskid):
-        del self._pending[taskid]
+        node_dir = self._pending.pop(taskid)
+        if self._watcher:
+            self._watcher.remove(node_dir)
+        self._submitted.pop(taskid, None)
+        self._checked.discard(taskid)
+        self._array_tasks.pop(taskid, None)
+        self._pilot_tasks.pop(taskid, None)
+        self._pilot_resources.pop(taskid, None)
+
+    def _estimate_resources(self, node):
+        if node is self._pilot_node:
+            # Pilots may run any of the queued nodes
+            resources = list(self._pilot_resources.values())
+            if not resources or None in resources:
+                return None
+            return tuple(max(values) for values in zip(*resources))
+        return super(SGELikeBatchManagerBase, self)._estimate_resources(node)
 
 
 class GraphPluginBase(PluginBase):
     """Base class for plugins that distribute graphs to workflows
+
+    Nodes can be clustered, so that several nodes run in a single job (one
+    after the other, in a single process, see
+    :func:`~nipype.pipeline.plugins.tools.create_cluster_pyscript`), which
+    spares a queue cycle per node:
+
+    - cluster_chains: fuse linear chains of nodes (nodes with a single
+      parent, which has no other child)
+    - cluster_max_runtime: fuse the nodes that are cheap (running without
+      submitting, or lasting less than the given number of seconds on
+      average in the runtime history, see :mod:`nipype.utils.history`)
+      with their parents, when they all run in the same job
+
+    Only nodes with the same plugin arguments are clustered, and a clustered
+    job is submitted with the plugin arguments of its last node. Where
+    completed jobs are not submitted again (``dont_resubmit_completed_jobs``),
+    a clustered job is considered completed only if all its nodes are.
     """
 
     def __init__(self, plugin_args=None):
@@ -577,15 +1225,89 @@ class GraphPluginBase(PluginBase):
         dependencies = {}
         self._config = config
         nodes = list(nx.topological_sort(graph))
+        jobids = {node: idx for idx, node in enumerate(nodes)}
         logger.debug("Creating executable python files for each node")
         for idx, node in enumerate(nodes):
             pyfiles.append(
                 create_pyscript(node, updatehash=updatehash, store_exception=False)
             )
             dependencies[idx] = [
-                nodes.index(prevnode) for prevnode in list(graph.predecessors(node))
+                jobids[prevnode] for prevnode in graph.predecessors(node)
+            ]
+
+        clusters = self._cluster_graph(graph, nodes)
+        if len(clusters) < len(nodes):
+            logger.info("Clustered %d nodes in %d jobs", len(nodes), len(clusters))
+            clusterids = {}
+            for idx, members in enumerate(clusters):
+                clusterids.update((member, idx) for member in members)
+            pyfiles = [
+                create_cluster_pyscript([pyfiles[member] for member in members])
+                if len(members) > 1
+                else pyfiles[members[0]]
+                for members in clusters
             ]
-        self._submit_graph(pyfiles, dependencies, nodes)
+            dependencies = {
+                idx: sorted(
+                    {
+                        clusterids[parent]
+                        for member in members
+                        for parent in dependencies[member]
+                    }
+                    - {idx}
+                )
+                for idx, members in enumerate(clusters)
+            }
+            clusters = [[nodes[member] for member in members] for members in clusters]
+            nodes = [members[-1] for members in clusters]
+            self._submit_graph(pyfiles, dependencies, nodes, clusters=clusters)
+        else:
+            self._submit_graph(pyfiles, dependencies, nodes)
+
+    def _cluster_graph(self, graph, nodes):
+        """
+        Group the nodes (in topological order) that run in the same job.
+
+        Returns the list of the indices of the nodes of each job, in
+        topological order. A node joins the job of its parents only if they
+        all run in that job, which keeps the jobs acyclic, and leaves the
+        first node of each job as its only node with parents in other jobs.
+        """
+        chains = self.plugin_args.get("cluster_chains", False)
+        max_runtime = self.plugin_args.get("cluster_max_runtime")
+        durations = {}
+        if max_runtime is not None:
+            durations = RuntimeHistory(self.plugin_args.get("runtime_history"))
+            durations = durations.durations()
+
+        jobids = {node: idx for idx, node in enumerate(nodes)}
+        clusters = []
+        clusterids = {}
+        for idx, node in enumerate(nodes):
+            parents = list(graph.predecessors(node))
+            owners = {clusterids[jobids[parent]] for parent in parents}
+            target = None
+            if len(owners) == 1:
+                owner = owners.pop()
+                if nodes[clusters[owner][0]].plugin_args == node.plugin_args:
+                    if (
+                        chains
+                        and len(parents) == 1
+                        and graph.out_degree(parents[0]) == 1
+                    ):
+                        target = owner
+                    elif max_runtime is not None and (
+                        node.run_without_submitting
+                        or durations.get(interface_key(node.interface), float("inf"))
+                        < max_runtime
+                    ):
+                        target = owner
+            if target is None:
+                target = len(clusters)
+                clusters.append([])
+            clusters[target].append(idx)
+            clusterids[idx] = target
+        return clusters
 
     def _get_args(self, node, keywords):
         values = ()
@@ -612,10 +1334,12 @@ class GraphPluginBase(PluginBase):
             values += (value,)
         return values
 
-    def _submit_graph(self, pyfiles, dependencies, nodes):
+    def _submit_graph(self, pyfiles, dependencies, nodes, clusters=None):
         """
         pyfiles: list of files corresponding to a topological sort
         dependencies: dictionary of dependencies based on the toplogical sort
+        nodes: the node of each file (the last node of clustered jobs)
+        clusters: the nodes run by each file, if nodes were clustered
         """
         raise NotImplementedError
 
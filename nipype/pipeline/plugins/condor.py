@@ -30,6 +30,9 @@ class CondorPlugin(SGELikeBatchManagerBase):
                  by condor_qsub
     - qsub_args : arguments to be prepended to the job execution script in the
                   qsub call
+    - bulk_status: check the status of all the jobs of the user with a
+                   single call to ``condor_q`` per iteration (default is
+                   ``True``)
     """
 
     def __init__(self, **kwargs):
@@ -60,6 +63,20 @@ class CondorPlugin(SGELikeBatchManagerBase):
             return True
         return False
 
+    def _query_statuses(self):
+        cmd = CommandLine(
+            "condor_q", resource_monitor=False, terminal_output="allatonce"
+        )
+        cmd.inputs.args = "-af ClusterId JobStatus"
+        result = cmd.run()
+        statuses = {}
+        for line in result.runtime.stdout.splitlines():
+            fields = line.split()
+            if len(fields) == 2:
+                # Job status 3 is removed, and 4 is completed
+                statuses[fields[0]] = fields[1] not in ("3", "4")
+        return statuses
+
     def _submit_batchtask(self, scriptfile, node):
         cmd = CommandLine(
             "condor_qsub",
@@ -36,6 +36,8 @@ class CondorDAGManPlugin(GraphPluginBase):
                     condor_submit_dag call
     - block : if True the plugin call will block until Condor has finished
                  processing the entire workflow (default: False)
+    - cluster_chains, cluster_max_runtime : run several nodes per job (see
+                 :class:`~nipype.pipeline.plugins.base.GraphPluginBase`)
     """
 
     default_submit_template = """
@@ -101,7 +103,7 @@ getenv = True
                 )
         super(CondorDAGManPlugin, self).__init__(**kwargs)
 
-    def _submit_graph(self, pyfiles, dependencies, nodes):
+    def _submit_graph(self, pyfiles, dependencies, nodes, clusters=None):
         # location of all scripts, place dagman output in here too
         batch_dir, _ = os.path.split(pyfiles[0])
         # DAG description filename
@@ -11,17 +11,18 @@ http://stackoverflow.com/a/8963618/1183453
 import os
 import multiprocessing as mp
 from multiprocessing import Pool, cpu_count, pool
+from queue import Queue
 from traceback import format_exception
 import sys
 from logging import INFO
 import gc
 
-from copy import deepcopy
 import numpy as np
 from ... import logging
 from ...utils.profiler import get_system_total_memory_gb
 from ..engine import MapNode
 from .base import DistributedPluginBase
+from .tools import NodeTask
 
 try:
     from textwrap import indent
@@ -46,7 +47,7 @@ def run_node(node, updatehash, taskid):
 
     Parameters
     ----------
-    node : nipype Node instance
+    node : nipype Node instance or :obj:`~nipype.pipeline.plugins.tools.NodeTask`
         the node to run
     updatehash : boolean
         flag for updating hash
@@ -61,6 +62,12 @@ def run_node(node, updatehash, taskid):
 
     # Init variables
     result = dict(result=None, traceback=None, taskid=taskid)
+    if isinstance(node, NodeTask):
+        node = node.load()
+
+    # Don't allow streaming outputs
+    if getattr(node.interface, "terminal_output", "") == "stream":
+        node.interface.terminal_output = "allatonce"
 
     # Try and execute the node via node.run()
     try:
@@ -199,6 +206,8 @@ class LegacyMultiProcPlugin(DistributedPluginBase):
         self._taskresult = {}
         self._task_obj = {}
         self._taskid = 0
+        # Completion of tasks is signaled from the pool's callbacks
+        self._events = Queue()
 
         # Cache current working directory and make sure we
         # change to it when workers are set up
@@ -244,6 +253,7 @@ class LegacyMultiProcPlugin(DistributedPluginBase):
         # Make sure runtime is not left at a dubious working directory
         os.chdir(self._cwd)
         self._taskresult[args["taskid"]] = args
+        self._notify_task_done(args["taskid"])
 
     def _get_result(self, taskid):
         return self._taskresult.get(taskid)
@@ -253,13 +263,10 @@ class LegacyMultiProcPlugin(DistributedPluginBase):
 
     def _submit_job(self, node, updatehash=False):
         self._taskid += 1
-
-        # Don't allow streaming outputs
-        if getattr(node.interface, "terminal_output", "") == "stream":
-            node.interface.terminal_output = "allatonce"
-
         self._task_obj[self._taskid] = self.pool.apply_async(
-            run_node, (node, updatehash, self._taskid), callback=self._async_callback
+            run_node,
+            (NodeTask(node), updatehash, self._taskid),
+            callback=self._async_callback,
         )
 
         logger.debug(
@@ -314,11 +321,8 @@ class LegacyMultiProcPlugin(DistributedPluginBase):
         """
 
         # Check to see if a job is available (jobs with all dependencies run)
-        # See https://github.com/nipy/nipype/pull/2200#discussion_r141605722
         # See also https://github.com/nipy/nipype/issues/2372
-        jobids = np.flatnonzero(
-            ~self.proc_done & (self.depidx.sum(axis=0) == 0).__array__()
-        )
+        jobids = self._ready_jobs()
 
         # Check available resources by summing all threads and memory used
         free_memory_gb, free_processors = self._check_resources(self.pending_tasks)
@@ -452,7 +456,7 @@ class LegacyMultiProcPlugin(DistributedPluginBase):
             # Send job to task manager and add to pending tasks
             if self._status_callback:
                 self._status_callback(self.procs[jobid], "start")
-            tid = self._submit_job(deepcopy(self.procs[jobid]), updatehash=updatehash)
+            tid = self._submit_job(self.procs[jobid], updatehash=updatehash)
             if tid is None:
                 self.proc_done[jobid] = False
                 self.proc_pending[jobid] = False
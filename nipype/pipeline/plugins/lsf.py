@@ -22,6 +22,8 @@ class LSFPlugin(SGELikeBatchManagerBase):
     - template : template to use for batch job submission
     - bsub_args : arguments to be prepended to the job execution script in the
                   bsub call
+    - bulk_status: check the status of all the jobs of the user with a
+                   single call to ``bjobs`` per iteration (default is ``True``)
 
     """
 
@@ -60,6 +62,25 @@ class LSFPlugin(SGELikeBatchManagerBase):
         else:
             return True
 
+    def _query_statuses(self):
+        # List recently finished jobs as well
+        cmd = CommandLine("bjobs", resource_monitor=False, terminal_output="allatonce")
+        cmd.inputs.args = "-a"
+        oldlevel = iflogger.level
+        iflogger.setLevel(logging.getLevelName("CRITICAL"))
+        # bjobs fails when no job is found
+        result = cmd.run(ignore_exception=True)
+        iflogger.setLevel(oldlevel)
+        if result.runtime.returncode and "No " not in result.runtime.stderr:
+            raise RuntimeError(result.runtime.stderr)
+        statuses = {}
+        # Lines read "<id> <user> <state> <queue> ..."
+        for line in result.runtime.stdout.splitlines():
+            fields = line.split()
+            if len(fields) >= 3 and fields[0].isdigit():
+                statuses[fields[0]] = fields[2] not in ("DONE", "EXIT")
+        return statuses
+
     def _submit_batchtask(self, scriptfile, node):
         cmd = CommandLine(
             "bsub",
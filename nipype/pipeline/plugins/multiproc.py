@@ -11,17 +11,19 @@ http://stackoverflow.com/a/8963618/1183453
 import os
 import multiprocessing as mp
 from concurrent.futures import ProcessPoolExecutor, wait
+from queue import Queue
 from traceback import format_exception
 import sys
 from logging import INFO
 import gc
 
-from copy import deepcopy
 import numpy as np
 from ... import logging
+from ...utils.history import RuntimeHistory, interface_key
 from ...utils.profiler import get_system_total_memory_gb
 from ..engine import MapNode
 from .base import DistributedPluginBase
+from .tools import NodeTask
 
 try:
     from textwrap import indent
@@ -46,7 +48,7 @@ def run_node(node, updatehash, taskid):
 
     Parameters
     ----------
-    node : nipype Node instance
+    node : nipype Node instance or :obj:`~nipype.pipeline.plugins.tools.NodeTask`
         the node to run
     updatehash : boolean
         flag for updating hash
@@ -61,6 +63,12 @@ def run_node(node, updatehash, taskid):
 
     # Init variables
     result = dict(result=None, traceback=None, taskid=taskid)
+    if isinstance(node, NodeTask):
+        node = node.load()
+
+    # Don't allow streaming outputs
+    if getattr(node.interface, "terminal_output", "") == "stream":
+        node.interface.terminal_output = "allatonce"
 
     # Try and execute the node via node.run()
     try:
@@ -105,9 +113,21 @@ class MultiProcPlugin(DistributedPluginBase):
     - raise_insufficient: raise error if the requested resources for
         a node over the maximum `n_procs` and/or `memory_gb`
         (default is ``True``).
-    - scheduler: sort jobs topologically (``'tsort'``, default value)
-        or prioritize jobs by, first, memory consumption and, second,
-        number of threads (``'mem_thread'`` option).
+    - scheduler: sort jobs topologically (``'tsort'``, default value),
+        prioritize jobs by, first, memory consumption and, second,
+        number of threads (``'mem_thread'`` option), or prioritize
+        jobs with the longest remaining path (weighted by the expected
+        runtime of each node) down the workflow (``'critical_path'``).
+        With ``'critical_path'``, jobs of equal priority are packed
+        largest-first into the free threads and memory, and expected
+        runtimes are taken from (and recorded into) the runtime history
+        of previous runs (see :mod:`nipype.utils.history`).
+    - estimate_resources: allocate the memory and threads that each node
+        required in previous runs (as recorded by the resource monitor in
+        the runtime history), instead of the ``mem_gb`` and ``n_procs``
+        set on the node (default is ``False``).
+    - runtime_history: path to the runtime history database used by
+        the ``'critical_path'`` scheduler and ``estimate_resources``.
     - mp_context: name of multiprocessing context to use
 
     """
@@ -118,6 +138,8 @@ class MultiProcPlugin(DistributedPluginBase):
         self._taskresult = {}
         self._task_obj = {}
         self._taskid = 0
+        # Completion of tasks is signaled from the executor's callbacks
+        self._events = Queue()
 
         # Cache current working directory and make sure we
         # change to it when workers are set up
@@ -155,9 +177,19 @@ class MultiProcPlugin(DistributedPluginBase):
 
         self._stats = None
 
+        # Expected runtimes are also needed to find the critical path
+        self._priorities = None
+        self._estimates = {}
+        if (
+            self.plugin_args.get("scheduler") == "critical_path"
+            and self._history is None
+        ):
+            self._history = RuntimeHistory(self.plugin_args.get("runtime_history"))
+
     def _async_callback(self, args):
         result = args.result()
         self._taskresult[result["taskid"]] = result
+        self._notify_task_done(result["taskid"])
 
     def _get_result(self, taskid):
         return self._taskresult.get(taskid)
@@ -167,12 +199,9 @@ class MultiProcPlugin(DistributedPluginBase):
 
     def _submit_job(self, node, updatehash=False):
         self._taskid += 1
-
-        # Don't allow streaming outputs
-        if getattr(node.interface, "terminal_output", "") == "stream":
-            node.interface.terminal_output = "allatonce"
-
-        result_future = self.pool.submit(run_node, node, updatehash, self._taskid)
+        result_future = self.pool.submit(
+            run_node, NodeTask(node), updatehash, self._taskid
+        )
         result_future.add_done_callback(self._async_callback)
         self._task_obj[self._taskid] = result_future
 
@@ -208,6 +237,36 @@ class MultiProcPlugin(DistributedPluginBase):
     def _postrun_check(self):
         self.pool.shutdown()
 
+    def _generate_dependency_list(self, graph):
+        super(MultiProcPlugin, self)._generate_dependency_list(graph)
+        # Only the critical path scheduler uses priorities
+        if self.plugin_args.get("scheduler") == "critical_path":
+            self._priorities = self._critical_path_priorities()
+
+    def _critical_path_priorities(self):
+        """
+        Compute the length of the longest path from each job to the end of
+        the workflow, weighting each job by its expected runtime.
+
+        Interfaces without history are given the median of the known
+        runtimes (or 1 second, if there is no history at all).
+        """
+        durations = self._history.durations()
+        default = float(np.median(list(durations.values()))) if durations else 1.0
+        weights = [
+            durations.get(interface_key(node.interface), default) for node in self.procs
+        ]
+        # Jobs are topologically sorted: compute priorities bottom-up
+        priorities = np.zeros(len(self.procs))
+        for jobid in reversed(range(len(self.procs))):
+            downstream = [priorities[child] for child in self._children[jobid]]
+            priorities[jobid] = weights[jobid] + max(downstream, default=0.0)
+        logger.debug(
+            "[MultiProc] Critical path of the workflow: %0.2fs (expected).",
+            priorities.max(initial=0.0),
+        )
+        return priorities
+
     def _check_resources(self, running_tasks):
         """
         Make sure there are resources available
@@ -215,8 +274,9 @@ class MultiProcPlugin(DistributedPluginBase):
         free_memory_gb = self.memory_gb
         free_processors = self.processors
         for _, jobid in running_tasks:
-            free_memory_gb -= min(self.procs[jobid].mem_gb, free_memory_gb)
-            free_processors -= min(self.procs[jobid].n_procs, free_processors)
+            mem_gb, n_procs = self._job_resources(jobid)
+            free_memory_gb -= min(mem_gb, free_memory_gb)
+            free_processors -= min(n_procs, free_processors)
 
         return free_memory_gb, free_processors
 
@@ -226,11 +286,8 @@ class MultiProcPlugin(DistributedPluginBase):
         """
 
         # Check to see if a job is available (jobs with all dependencies run)
-        # See https://github.com/nipy/nipype/pull/2200#discussion_r141605722
         # See also https://github.com/nipy/nipype/issues/2372
-        jobids = np.flatnonzero(
-            ~self.proc_done & (self.depidx.sum(axis=0) == 0).__array__()
-        )
+        jobids = self._ready_jobs()
 
         # Check available resources by summing all threads and memory used
         free_memory_gb, free_processors = self._check_resources(self.pending_tasks)
@@ -303,8 +360,9 @@ class MultiProcPlugin(DistributedPluginBase):
                         continue
 
             # Check requirements of this job
-            next_job_gb = min(self.procs[jobid].mem_gb, self.memory_gb)
-            next_job_th = min(self.procs[jobid].n_procs, self.processors)
+            mem_gb, n_procs = self._job_resources(jobid)
+            next_job_gb = min(mem_gb, self.memory_gb)
+            next_job_th = min(n_procs, self.processors)
 
             # If node does not fit, skip at this moment
             if next_job_th > free_processors or next_job_gb > free_memory_gb:
@@ -341,7 +399,7 @@ class MultiProcPlugin(DistributedPluginBase):
             if updatehash or self.procs[jobid].run_without_submitting:
                 logger.debug("Running node %s on master thread", self.procs[jobid])
                 try:
-                    self.procs[jobid].run(updatehash=updatehash)
+                    self._record_runtime(self.procs[jobid].run(updatehash=updatehash))
                 except Exception:
                     traceback = format_exception(*sys.exc_info())
                     self._clean_queue(
@@ -364,7 +422,7 @@ class MultiProcPlugin(DistributedPluginBase):
             # Send job to task manager and add to pending tasks
             if self._status_callback:
                 self._status_callback(self.procs[jobid], "start")
-            tid = self._submit_job(deepcopy(self.procs[jobid]), updatehash=updatehash)
+            tid = self._submit_job(self.procs[jobid], updatehash=updatehash)
             if tid is None:
                 self.proc_done[jobid] = False
                 self.proc_pending[jobid] = False
@@ -375,8 +433,30 @@ class MultiProcPlugin(DistributedPluginBase):
 
     def _sort_jobs(self, jobids, scheduler="tsort"):
         if scheduler == "mem_thread":
+            return sorted(jobids, key=self._job_resources)
+        if scheduler == "critical_path":
             return sorted(
                 jobids,
-                key=lambda item: (self.procs[item].mem_gb, self.procs[item].n_procs),
+                key=lambda item: (
+                    -self._job_priority(item),
+                    -self._job_resources(item)[1],
+                    -self._job_resources(item)[0],
+                ),
             )
         return jobids
+
+    def _job_resources(self, jobid):
+        """Memory (GB) and threads allocated to a job, estimated only once"""
+        resources = self._estimates.get(jobid)
+        if resources is None:
+            node = self.procs[jobid]
+            resources = self._estimate_resources(node) or (node.mem_gb, node.n_procs)
+            self._estimates[jobid] = resources
+        return resources
+
+    def _job_priority(self, jobid):
+        """Critical path priority of a job (MapNode subnodes inherit it)"""
+        jobid = self.mapnodesubids.get(jobid, jobid)
+        if self._priorities is None or jobid >= len(self._priorities):
+            return 0.0
+        return self._priorities[jobid]
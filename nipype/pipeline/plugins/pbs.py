@@ -21,6 +21,8 @@ class PBSPlugin(SGELikeBatchManagerBase):
     - qsub_args : arguments to be prepended to the job execution script in the
                   qsub call
     - max_jobname_len: maximum length of the job name.  Default 15.
+    - bulk_status: check the status of all the jobs with a single call to
+                   ``qstat`` per iteration (default is ``True``)
 
     """
 
@@ -61,6 +63,21 @@ class PBSPlugin(SGELikeBatchManagerBase):
         else:
             return errmsg not in stderr
 
+    def _query_statuses(self):
+        result = CommandLine(
+            "qstat",
+            environ=dict(os.environ),
+            terminal_output="allatonce",
+            resource_monitor=False,
+        ).run()
+        statuses = {}
+        # Lines read "<id>.<server> <name> <user> <time> <state> <queue>"
+        for line in result.runtime.stdout.splitlines():
+            fields = line.split()
+            if len(fields) >= 5 and fields[0][:1].isdigit():
+                statuses[fields[0].split(".")[0]] = fields[4] not in ("C", "F")
+        return statuses
+
     def _submit_batchtask(self, scriptfile, node):
         cmd = CommandLine(
             "qsub",
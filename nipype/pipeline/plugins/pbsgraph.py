@@ -24,7 +24,7 @@ class PBSGraphPlugin(SGEGraphPlugin):
 #PBS -V
 """
 
-    def _submit_graph(self, pyfiles, dependencies, nodes):
+    def _submit_graph(self, pyfiles, dependencies, nodes, clusters=None):
         batch_dir, _ = os.path.split(pyfiles[0])
         submitjobsfile = os.path.join(batch_dir, "submit_jobs.sh")
         with open(submitjobsfile, "wt") as fp:
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Pilot jobs running the nodes of batch plugins from a shared queue
+
+With the ``pilots`` option of the batch plugins, nodes are not submitted
+as one job each: they are put in a queue on the shared filesystem (a
+directory of task files), and a few long-lived worker jobs (the pilots)
+claim and run them back-to-back, which spares the queue wait and the
+start-up of the interpreter for every node.
+Tasks are claimed by renaming them, which is atomic, so that each task runs
+once. Workers touch the tasks they are running, so that the tasks of
+workers that were killed can be put back in the queue.
+
+A worker can be started with::
+
+    python -m nipype.pipeline.plugins.pilot <queue directory> [idle timeout]
+
+"""
+import os
+import os.path as op
+import sys
+from socket import gethostname
+from threading import Event, Thread
+from time import sleep, time
+from traceback import format_exception
+
+from ... import config, logging
+from ...utils.filemanip import loadpkl, savepkl
+
+logger = logging.getLogger("nipype.workflow")
+
+# Interval (in seconds) between the updates of the tasks workers are running
+HEARTBEAT = 30
+
+
+class TaskQueue(object):
+    """
+    A queue of nodes to run, in a directory of a shared filesystem.
+
+    Tasks are files in ``queued`` (holding the pickle file of the node and
+    the suffix of its crash file), which workers claim by moving them into
+    ``claimed``, and remove once the node has run. The ``stop`` file tells
+    workers to exit once the queue is empty.
+    """
+
+    def __init__(self, root):
+        self.root = op.abspath(root)
+        self.queued = op.join(self.root, "queued")
+        self.claimed = op.join(self.root, "claimed")
+        os.makedirs(self.queued, exist_ok=True)
+        os.makedirs(self.claimed, exist_ok=True)
+
+    def put(self, pkl_file, suffix):
+        """Queue a pickled node, return the name of the task"""
+        name = "%s.task" % suffix
+        tmpfile = op.join(self.root, "." + name)
+        with open(tmpfile, "w") as fobj:
+            fobj.write("%s\t%s" % (pkl_file, suffix))
+        os.rename(tmpfile, op.join(self.queued, name))
+        return name
+
+    def claim(self):
+        """Claim the oldest task, return its name, pickle file and suffix"""
+        for name in sorted(os.listdir(self.queued)):
+            claimed = op.join(self.claimed, name)
+            try:
+                os.rename(op.join(self.queued, name), claimed)
+            except FileNotFoundError:  # Claimed by another worker
+                continue
+            with open(claimed) as fobj:
+                pkl_file, suffix = fobj.read().split("\t")
+            return name, pkl_file, suffix
+        return None
+
+    def touch(self, name):
+        """Signal that a claimed task is still running"""
+        try:
+            os.utime(op.join(self.claimed, name))
+        except FileNotFoundError:
+            pass
+
+    def done(self, name):
+        """Remove a task that has run"""
+        try:
+            os.remove(op.join(self.claimed, name))
+        except FileNotFoundError:
+            pass
+
+    def is_pending(self, name):
+        """Whether a task is queued or running"""
+        return op.exists(op.join(self.queued, name)) or op.exists(
+            op.join(self.claimed, name)
+        )
+
+    def __len__(self):
+        return len(os.listdir(self.queued)) + len(os.listdir(self.claimed))
+
+    def requeue_stale(self, timeout):
+        """Queue again the tasks that were not touched for ``timeout`` seconds"""
+        requeued = []
+        for name in os.listdir(self.claimed):
+            claimed = op.join(self.claimed, name)
+            try:
+                if time() - os.stat(claimed).st_mtime < timeout:
+                    continue
+                os.rename(claimed, op.join(self.queued, name))
+            except FileNotFoundError:  # Just finished
+                continue
+            requeued.append(name)
+        return requeued
+
+    @property
+    def stopped(self):
+        return op.exists(op.join(self.root, "stop"))
+
+    @stopped.setter
+    def stopped(self, value):
+        stopfile = op.join(self.root, "stop")
+        if value:
+            open(stopfile, "w").close()
+        elif op.exists(stopfile):
+            os.remove(stopfile)
+
+
+def run_task(pkl_file, suffix):
+    """Run a pickled node, saving the traceback if it crashes"""
+    info = None
+    try:
+        info = loadpkl(pkl_file)
+        config.update_config(info["node"].config)
+        try:
+            config.update_matplotlib()
+        except ImportError:  # matplotlib is optional
+            pass
+        logging.update_logging(config)
+        info["node"].run(updatehash=info["updatehash"])
+    except Exception:
+        traceback = format_exception(*sys.exc_info())
+        if info is None or not op.exists(info["node"].output_dir()):
+            result = None
+            resultsfile = op.join(op.dirname(pkl_file), "crashdump_%s.pklz" % suffix)
+        else:
+            result = info["node"].result
+            resultsfile = op.join(
+                info["node"].output_dir(), "result_%s.pklz" % info["node"].name
+            )
+        savepkl(
+            resultsfile,
+            dict(result=result, hostname=gethostname(), traceback=traceback),
+        )
+
+
+def _heartbeat(queue, name, stop):
+    while not stop.wait(HEARTBEAT):
+        queue.touch(name)
+
+
+def run_worker(root, idle_timeout=60):
+    """
+    Run the tasks of a queue until it is stopped and empty.
+
+    Workers also exit when no task was queued for ``idle_timeout`` seconds.
+    Returns the number of tasks run.
+    """
+    queue = TaskQueue(root)
+    ntasks = 0
+    idle_since = time()
+    while True:
+        task = queue.claim()
+        if task is None:
+            if queue.stopped or time() - idle_since > idle_timeout:
+                break
+            sleep(1)
+            continue
+
+        name, pkl_file, suffix = task
+        stop = Event()
+        heartbeat = Thread(target=_heartbeat, args=(queue, name, stop), daemon=True)
+        heartbeat.start()
+        try:
+            run_task(pkl_file, suffix)
+        finally:
+            stop.set()
+            heartbeat.join()
+            queue.done(name)
+        ntasks += 1
+        idle_since = time()
+    logger.info("Pilot exiting after running %d tasks.", ntasks)
+    return ntasks
+
+
+if __name__ == "__main__":
+    run_worker(*[float(arg) if i else arg for i, arg in enumerate(sys.argv[1:3])])
@@ -5,6 +5,8 @@ Created on Aug 2, 2013
 
 Parallel workflow execution with SLURM
 """
+import getpass
+import math
 import os
 import re
 from time import sleep
@@ -27,9 +29,36 @@ class SLURMPlugin(SGELikeBatchManagerBase):
 
     - sbatch_args: arguments to pass prepend to the sbatch call
 
+    - estimate_resources: request (``--mem`` and ``--cpus-per-task``) the
+      memory and CPUs that each node required in previous runs, as recorded
+      by the resource monitor in the runtime history (see
+      :mod:`nipype.utils.history`), unless set in ``sbatch_args``
+
+    - runtime_history: path to the runtime history database
+
+    - bulk_status: check the status of all the jobs of the user with a
+      single call to ``squeue`` per iteration (default is ``True``)
+
+    - job_arrays: submit the similar nodes that are ready at once as job
+      arrays (``sbatch --array``), up to 1000 nodes per array (or the given
+      number), to spare the scheduler thousands of submissions (e.g., for
+      the subnodes of MapNodes)
+
+    - pilots: run the nodes in as many long-lived jobs, pulling them from a
+      queue on the shared filesystem (see
+      :class:`~nipype.pipeline.plugins.base.SGELikeBatchManagerBase`)
+
+    - pilot_args: the node plugin arguments of the pilots (e.g.,
+      ``{'sbatch_args': '--time=12:00:00'}``); with ``estimate_resources``,
+      pilots request the largest resources of the queued nodes
+
 
     """
 
+    # Job states of squeue for jobs that are over
+    _done_states = ("BF", "CA", "CD", "DL", "F", "NF", "OOM", "PR", "TO")
+    _array_index_var = "SLURM_ARRAY_TASK_ID"
+
     def __init__(self, **kwargs):
 
         template = "#!/bin/bash"
@@ -74,7 +103,7 @@ class SLURMPlugin(SGELikeBatchManagerBase):
                 # do not raise error and allow recheck
                 logger.warning(
                     "SLURM timeout encountered while checking job status,"
-                    " treating job %d as pending",
+                    " treating job %s as pending",
                     taskid,
                 )
                 return True
@@ -82,20 +111,66 @@ class SLURMPlugin(SGELikeBatchManagerBase):
                 raise (e)
             return False
 
+    def _query_statuses(self):
+        res = CommandLine(
+            "squeue",
+            args="-h -r -o '%%i %%t' -u %s" % getpass.getuser(),
+            resource_monitor=False,
+            terminal_output="allatonce",
+        ).run()
+        statuses = {}
+        for line in res.runtime.stdout.splitlines():
+            fields = line.split()
+            if len(fields) == 2:
+                statuses[fields[0]] = fields[1] not in self._done_states
+        return statuses
+
     def _submit_batchtask(self, scriptfile, node):
         """
         This is more or less the _submit_batchtask from sge.py with flipped
         variable names, different command line switches, and different output
         formatting/processing
         """
-        cmd = CommandLine(
-            "sbatch",
-            environ=dict(os.environ),
-            resource_monitor=False,
-            terminal_output="allatonce",
-        )
         path = os.path.dirname(scriptfile)
+        sbatch_args = self._get_sbatch_args(node, self._estimate_resources(node))
+        if "-o" not in sbatch_args:
+            sbatch_args = "%s -o %s" % (sbatch_args, os.path.join(path, "slurm-%j.out"))
+        if "-e" not in sbatch_args:
+            sbatch_args = "%s -e %s" % (sbatch_args, os.path.join(path, "slurm-%j.out"))
+        taskid = self._sbatch(sbatch_args, self._jobname(node), scriptfile, node)
+        self._pending[taskid] = node.output_dir()
+        logger.debug("submitted sbatch task: %d for node %s" % (taskid, node._id))
+        return taskid
+
+    def _submit_array(self, scriptfile, nodes):
+        """Submit a job array with ``sbatch --array``"""
+        path = os.path.dirname(scriptfile)
+        resources = [self._estimate_resources(node) for node in nodes]
+        if None in resources:
+            resources = None
+        else:
+            resources = tuple(max(values) for values in zip(*resources))
+        sbatch_args = self._get_sbatch_args(nodes[0], resources)
+        sbatch_args += " --array=0-%d" % (len(nodes) - 1)
+        if "-o" not in sbatch_args:
+            sbatch_args = "%s -o %s" % (
+                sbatch_args,
+                os.path.join(path, "slurm-%A_%a.out"),
+            )
+        if "-e" not in sbatch_args:
+            sbatch_args = "%s -e %s" % (
+                sbatch_args,
+                os.path.join(path, "slurm-%A_%a.out"),
+            )
+        arrayid = self._sbatch(
+            sbatch_args, self._jobname(nodes[0]), scriptfile, nodes[0]
+        )
+        logger.debug(
+            "submitted sbatch job array: %d for %d nodes" % (arrayid, len(nodes))
+        )
+        return arrayid
 
+    def _get_sbatch_args(self, node, resources):
         sbatch_args = ""
         if self._sbatch_args:
             sbatch_args = self._sbatch_args
@@ -104,17 +179,31 @@ class SLURMPlugin(SGELikeBatchManagerBase):
                 sbatch_args = node.plugin_args["sbatch_args"]
             else:
                 sbatch_args += " " + node.plugin_args["sbatch_args"]
-        if "-o" not in sbatch_args:
-            sbatch_args = "%s -o %s" % (sbatch_args, os.path.join(path, "slurm-%j.out"))
-        if "-e" not in sbatch_args:
-            sbatch_args = "%s -e %s" % (sbatch_args, os.path.join(path, "slurm-%j.out"))
+        if resources is not None:
+            mem_gb, n_procs = resources
+            if "--mem" not in sbatch_args:
+                sbatch_args += " --mem=%dM" % math.ceil(mem_gb * 1024)
+            if "--cpus-per-task" not in sbatch_args and "-c " not in sbatch_args:
+                sbatch_args += " --cpus-per-task=%d" % n_procs
+        return sbatch_args
+
+    def _jobname(self, node):
         if node._hierarchy:
             jobname = ".".join((dict(os.environ)["LOGNAME"], node._hierarchy, node._id))
         else:
             jobname = ".".join((dict(os.environ)["LOGNAME"], node._id))
         jobnameitems = jobname.split(".")
         jobnameitems.reverse()
-        jobname = ".".join(jobnameitems)
+        return ".".join(jobnameitems)
+
+    def _sbatch(self, sbatch_args, jobname, scriptfile, node):
+        """Run sbatch and return the identifier of the job"""
+        cmd = CommandLine(
+            "sbatch",
+            environ=dict(os.environ),
+            resource_monitor=False,
+            terminal_output="allatonce",
+        )
         cmd.inputs.args = "%s -J %s %s" % (sbatch_args, jobname, scriptfile)
         oldlevel = iflogger.level
         iflogger.setLevel(logging.getLevelName("CRITICAL"))
@@ -144,7 +233,4 @@ class SLURMPlugin(SGELikeBatchManagerBase):
         iflogger.setLevel(oldlevel)
         # retrieve taskid
         lines = [line for line in result.runtime.stdout.split("\n") if line]
-        taskid = int(re.match(self._jobid_re, lines[-1]).groups()[0])
-        self._pending[taskid] = node.output_dir()
-        logger.debug("submitted sbatch task: %d for node %s" % (taskid, node._id))
-        return taskid
+        return int(re.match(self._jobid_re, lines[-1]).groups()[0])
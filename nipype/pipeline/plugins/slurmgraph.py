@@ -35,6 +35,8 @@ class SLURMGraphPlugin(GraphPluginBase):
     - template : template to use for batch job submission
     - qsub_args : arguments to be prepended to the job execution script in the
                   qsub call
+    - cluster_chains, cluster_max_runtime : run several nodes per job (see
+                  :class:`~nipype.pipeline.plugins.base.GraphPluginBase`)
 
     """
 
@@ -61,7 +63,7 @@ class SLURMGraphPlugin(GraphPluginBase):
                 self._dont_resubmit_completed_jobs = False
         super(SLURMGraphPlugin, self).__init__(**kwargs)
 
-    def _submit_graph(self, pyfiles, dependencies, nodes):
+    def _submit_graph(self, pyfiles, dependencies, nodes, clusters=None):
         def make_job_name(jobnumber, nodeslist):
             """
             - jobnumber: The index number of the job to create
@@ -82,7 +84,11 @@ class SLURMGraphPlugin(GraphPluginBase):
         ):  # A future parameter for controlling this behavior could be added here
             for idx, pyscript in enumerate(pyfiles):
                 node = nodes[idx]
-                node_status_done = node_completed_status(node)
+                # A clustered job is done only if all its nodes are
+                members = clusters[idx] if clusters else [node]
+                node_status_done = all(
+                    node_completed_status(member) for member in members
+                )
 
                 # if the node itself claims done, then check to ensure all
                 # dependancies are also done
@@ -3,9 +3,17 @@
 # vi: set ft=python sts=4 ts=4 sw=4 et:
 """Tests for the engine module
 """
+import os
+from time import time
+from unittest import mock
+
+import networkx as nx
 import numpy as np
+import pytest
 import scipy.sparse as ssp
 
+from nipype.pipeline.plugins.base import DistributedPluginBase, GraphPluginBase
+
 
 def test_scipy_sparse():
     foo = ssp.lil_matrix(np.eye(3, k=1))
@@ -14,6 +22,118 @@ def test_scipy_sparse():
     assert foo[0, 1] == 0
 
 
+def test_ready_jobs():
+    graph = nx.DiGraph()
+    graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    plugin = DistributedPluginBase()
+    plugin.mapnodesubids = {}
+    plugin._generate_dependency_list(graph)
+    assert plugin.procs[0] == "a" and plugin.procs[-1] == "d"
+    assert plugin._ready_jobs().tolist() == [0]
+
+    plugin.proc_done[0] = True
+    assert plugin._ready_jobs().tolist() == []
+    plugin._task_finished_cb(0)
+    assert plugin._ready_jobs().tolist() == [1, 2]
+
+    plugin.proc_done[1] = True
+    plugin._task_finished_cb(1)
+    assert plugin._ready_jobs().tolist() == [2]
+    plugin.proc_done[2] = True
+    plugin._task_finished_cb(2)
+    assert plugin._ready_jobs().tolist() == [3]
+
+
+def test_remove_node_deps():
+    graph = nx.DiGraph()
+    graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    graph.add_node("e")
+    plugin = DistributedPluginBase()
+    plugin._generate_dependency_list(graph)
+    assert all(plugin.procs[plugin.jobids[node]] == node for node in graph)
+
+    report = plugin._remove_node_deps(plugin.jobids["b"], "crashfile", graph)
+    assert report["node"] == "b"
+    assert report["dependents"] == ["b", "d"]
+    assert report["crashfile"] == "crashfile"
+    done = [plugin.procs[idx] for idx in np.flatnonzero(plugin.proc_done)]
+    assert sorted(done) == ["b", "d"]
+
+    # The subgraph removed by the first crash is not traversed again
+    report = plugin._remove_node_deps(plugin.jobids["c"], "crashfile", graph)
+    assert report["dependents"] == ["c"]
+    done = [plugin.procs[idx] for idx in np.flatnonzero(plugin.proc_done)]
+    assert sorted(done) == ["b", "c", "d"]
+
+
+class _SubnodesStub(object):
+    """Stands for a MapNode, only generating the (placeholder) subnodes"""
+
+    def __init__(self, nitems):
+        self.nitems = nitems
+
+    def get_subnodes(self):
+        return [None] * self.nitems
+
+
+def _expand_mapnodes(nmapnodes, nitems):
+    """Expand MapNode stubs, return the plugin and the time it took"""
+    graph = nx.DiGraph()
+    graph.add_nodes_from(_SubnodesStub(nitems) for _ in range(nmapnodes))
+    plugin = DistributedPluginBase()
+    plugin.mapnodes = set()
+    plugin.mapnodesubids = {}
+    plugin._generate_dependency_list(graph)
+
+    start = time()
+    for jobid in range(nmapnodes):
+        assert plugin._submit_mapnode(jobid) is False
+    return plugin, time() - start
+
+
+def test_mapnode_expansion():
+    """Expand MapNodes into their subnodes"""
+    nmapnodes, nitems = 50, 10
+    plugin, _ = _expand_mapnodes(nmapnodes, nitems)
+    # Expanded MapNodes are submitted once their subnodes are done
+    assert all(plugin._submit_mapnode(jobid) for jobid in range(nmapnodes))
+
+    njobs = nmapnodes * (nitems + 1)
+    assert len(plugin.procs) == njobs
+    assert plugin.proc_done.shape == plugin.proc_pending.shape == (njobs,)
+    assert not np.any(plugin.proc_done)
+    assert np.all(plugin._indegree[:nmapnodes] == nitems)
+    assert len(plugin._ready) == nmapnodes * nitems
+    # Subnodes are appended in order, and map back to their MapNode
+    for jobid in range(nmapnodes):
+        subids = range(nmapnodes + jobid * nitems, nmapnodes + (jobid + 1) * nitems)
+        assert all(plugin.mapnodesubids[subid] == jobid for subid in subids)
+        assert all(plugin._children[subid] == [jobid] for subid in subids)
+
+
+@pytest.mark.skipif(
+    not os.getenv("NIPYPE_BENCHMARK"), reason="set NIPYPE_BENCHMARK to run benchmarks"
+)
+def test_mapnode_expansion_benchmark():
+    """Expand 10k MapNodes with 100 items each"""
+    nmapnodes, nitems = 10000, 100
+    plugin, elapsed = _expand_mapnodes(nmapnodes, nitems)
+
+    njobs = nmapnodes * (nitems + 1)
+    assert len(plugin.procs) == njobs
+    assert len(plugin._ready) == nmapnodes * nitems
+    assert plugin.mapnodesubids[njobs - 1] == nmapnodes - 1
+    # Growing the dependency structure must not be quadratic
+    assert elapsed < 60
+
+    # Finishing all the subnodes of a MapNode makes it ready again
+    for subid in range(nmapnodes, nmapnodes + nitems):
+        plugin.proc_done[subid] = True
+        plugin._task_finished_cb(subid)
+    assert plugin._indegree[0] == 0
+    assert 0 in plugin._ready
+
+
 """
 Can use the following code to test that a mapnode crash continues successfully
 Need to put this into a unit-test with a timeout
@@ -39,3 +159,72 @@ wf.base_dir = '/tmp'
 
 wf.run(plugin='MultiProc')
 """
+
+
+def test_cluster_graph(tmpdir):
+    from nipype import config
+    from nipype.interfaces.utility import IdentityInterface
+    from nipype.pipeline.engine import Node
+
+    class RecordPlugin(GraphPluginBase):
+        def _submit_graph(self, pyfiles, dependencies, nodes, clusters=None):
+            self.submitted = pyfiles, dependencies, nodes, clusters
+
+    nodes = []
+    for name in "abcdef":
+        node = Node(IdentityInterface(fields=["x"]), name=name)
+        node.base_dir = tmpdir.strpath
+        node.config = config._sections
+        nodes.append(node)
+    a, b, c, d, e, f = nodes
+    graph = nx.DiGraph()
+    graph.add_edges_from([(a, b), (b, c), (c, d), (c, e), (d, f), (e, f)])
+
+    plugin = RecordPlugin(plugin_args={"cluster_chains": True})
+    assert plugin._cluster_graph(graph, nodes) == [[0, 1, 2], [3], [4], [5]]
+
+    # Cheap nodes join their parents
+    d.run_without_submitting = e.run_without_submitting = True
+    history = tmpdir.join("history.sqlite").strpath
+    plugin = RecordPlugin(
+        plugin_args={"cluster_max_runtime": 1, "runtime_history": history}
+    )
+    assert plugin._cluster_graph(graph, nodes) == [[0], [1], [2, 3, 4], [5]]
+    plugin = RecordPlugin(
+        plugin_args={
+            "cluster_chains": True,
+            "cluster_max_runtime": 1,
+            "runtime_history": history,
+        }
+    )
+    assert plugin._cluster_graph(graph, nodes) == [[0, 1, 2, 3, 4], [5]]
+    # but only with the same plugin arguments
+    e.plugin_args = {"qsub_args": "-l h_vmem=8G"}
+    assert plugin._cluster_graph(graph, nodes) == [[0, 1, 2, 3], [4], [5]]
+
+    plugin.run(graph, config._sections)
+    pyfiles, dependencies, submitted, clusters = plugin.submitted
+    assert submitted == [d, e, f]
+    assert clusters == [[a, b, c, d], [e], [f]]
+    assert dependencies == {0: [], 1: [0], 2: [0, 1]}
+    assert pyfiles[0].endswith("_d_cluster.py")
+    with open(pyfiles[0]) as fp:
+        assert fp.read().count("run_path(") == 4
+
+    # Clustered jobs are submitted again unless all their nodes completed
+    from nipype.interfaces.base import CommandLine
+    from nipype.pipeline.plugins import sgegraph
+
+    def completed(node):
+        return node.name != "a"
+
+    plugin = sgegraph.SGEGraphPlugin(
+        plugin_args={"cluster_chains": True, "dont_resubmit_completed_jobs": True}
+    )
+    with mock.patch.object(
+        sgegraph, "node_completed_status", new=completed
+    ), mock.patch.object(CommandLine, "run"):
+        plugin.run(graph, config._sections)
+    with open(tmpdir.join("batch", "submit_jobs.sh").strpath) as fp:
+        submitted = [line.split("=")[0] for line in fp if "qsub" in line]
+    assert submitted == ["j0_c", "j1_d", "j2_e", "j3_f"]
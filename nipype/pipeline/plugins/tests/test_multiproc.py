@@ -6,9 +6,12 @@ Test the resource management of MultiProc
 """
 import sys
 import os
+from time import time
 import pytest
 from nipype.pipeline import engine as pe
+from nipype.pipeline.plugins.multiproc import MultiProcPlugin
 from nipype.interfaces import base as nib
+from nipype.utils.history import RuntimeHistory, interface_key
 
 
 class InputSpec(nib.TraitedSpec):
@@ -34,7 +37,9 @@ class MultiprocTestInterface(nib.BaseInterface):
         return outputs
 
 
-@pytest.mark.skipif(sys.version_info >= (3, 8), reason="multiprocessing issues in Python 3.8")
+@pytest.mark.skipif(
+    sys.version_info >= (3, 8), reason="multiprocessing issues in Python 3.8"
+)
 def test_run_multiproc(tmpdir):
     tmpdir.chdir()
 
@@ -75,6 +80,11 @@ class SingleNodeTestInterface(nib.BaseInterface):
         return outputs
 
 
+class FailingTestInterface(SingleNodeTestInterface):
+    def _run_interface(self, runtime):
+        raise RuntimeError("This interface fails on purpose")
+
+
 def test_no_more_memory_than_specified(tmpdir):
     tmpdir.chdir()
     pipe = pe.Workflow(name="pipe")
@@ -116,7 +126,9 @@ def test_no_more_threads_than_specified(tmpdir):
         pipe.run(plugin="MultiProc", plugin_args={"n_procs": max_threads})
 
 
-@pytest.mark.skipif(sys.version_info >= (3, 8), reason="multiprocessing issues in Python 3.8")
+@pytest.mark.skipif(
+    sys.version_info >= (3, 8), reason="multiprocessing issues in Python 3.8"
+)
 def test_hold_job_until_procs_available(tmpdir):
     tmpdir.chdir()
 
@@ -134,3 +146,152 @@ def test_hold_job_until_procs_available(tmpdir):
 
     max_threads = 2
     pipe.run(plugin="MultiProc", plugin_args={"n_procs": max_threads})
+
+
+def test_event_driven_scheduling(tmpdir):
+    tmpdir.chdir()
+
+    pipe = pe.Workflow(name="pipe")
+    n1 = pe.Node(SingleNodeTestInterface(), name="n1")
+    n2 = pe.Node(MultiprocTestInterface(), name="n2")
+    n3 = pe.MapNode(SingleNodeTestInterface(), iterfield=["input1"], name="n3")
+
+    pipe.connect(n1, "output1", n2, "input1")
+    pipe.connect(n2, "output1", n3, "input1")
+    n1.inputs.input1 = 4
+
+    # Completion events should wake up the scheduler long before the poll timeout
+    pipe.config["execution"]["poll_sleep_duration"] = 30
+    start = time()
+    pipe.run(plugin="MultiProc", plugin_args={"n_procs": 2})
+    assert time() - start < 30
+
+    # So should crashes
+    crash = pe.Workflow(name="crash")
+    n1 = pe.Node(FailingTestInterface(), name="n1")
+    n2 = pe.Node(SingleNodeTestInterface(), name="n2")
+    crash.connect(n1, "output1", n2, "input1")
+    crash.config["execution"]["poll_sleep_duration"] = 30
+    crash.config["execution"]["crashdump_dir"] = tmpdir.strpath
+    start = time()
+    with pytest.raises(RuntimeError):
+        crash.run(plugin="MultiProc", plugin_args={"n_procs": 2})
+    assert time() - start < 30
+
+
+def test_critical_path_scheduler(tmpdir):
+    tmpdir.chdir()
+    history_file = tmpdir.join("history.sqlite").strpath
+
+    pipe = pe.Workflow(name="pipe")
+    short = pe.Node(SingleNodeTestInterface(), name="short")
+    long1 = pe.Node(SingleNodeTestInterface(), name="long1")
+    long2 = pe.Node(SingleNodeTestInterface(), name="long2")
+    long3 = pe.Node(SingleNodeTestInterface(), name="long3")
+    pipe.connect(long1, "output1", long2, "input1")
+    pipe.connect(long2, "output1", long3, "input1")
+    pipe.add_nodes([short])
+    short.inputs.input1 = 1
+    long1.inputs.input1 = 1
+
+    graph = pipe._create_flat_graph()
+    plugin = MultiProcPlugin(
+        plugin_args={
+            "n_procs": 2,
+            "scheduler": "critical_path",
+            "runtime_history": history_file,
+        }
+    )
+    plugin.mapnodesubids = {}
+    plugin._generate_dependency_list(graph)
+    jobids = {node.name: jobid for node, jobid in plugin.jobids.items()}
+    ready = sorted([jobids["short"], jobids["long1"]])
+    # The start of the longest chain goes first
+    assert plugin._sort_jobs(ready, scheduler="critical_path") == [
+        jobids["long1"],
+        jobids["short"],
+    ]
+    plugin._postrun_check()
+
+    # Runtimes are recorded for the next runs
+    pipe.run(
+        plugin="MultiProc",
+        plugin_args={
+            "n_procs": 2,
+            "scheduler": "critical_path",
+            "runtime_history": history_file,
+        },
+    )
+    assert list(RuntimeHistory(history_file).durations()) == [
+        interface_key(SingleNodeTestInterface)
+    ]
+
+
+def test_estimate_resources(tmpdir):
+    tmpdir.chdir()
+    history_file = tmpdir.join("history.sqlite").strpath
+    RuntimeHistory(history_file).record(
+        [
+            (
+                interface_key(SingleNodeTestInterface),
+                0,
+                "2020-01-01T00:00:00",
+                1.0,
+                3.0,
+                250.0,
+            )
+        ]
+    )
+
+    pipe = pe.Workflow(name="pipe")
+    known = pe.Node(SingleNodeTestInterface(), name="known")
+    unknown = pe.Node(MultiprocTestInterface(), name="unknown", mem_gb=1.5)
+    known.inputs.input1 = 1
+    unknown.inputs.input1 = 1
+    pipe.add_nodes([known, unknown])
+
+    graph = pipe._create_flat_graph()
+    for plugin_args, expected in [
+        ({}, (0.2, 1)),
+        ({"estimate_resources": True, "runtime_history": history_file}, (3.0, 3)),
+    ]:
+        plugin = MultiProcPlugin(plugin_args=dict(n_procs=2, **plugin_args))
+        plugin._generate_dependency_list(graph)
+        jobids = {node.name: jobid for node, jobid in plugin.jobids.items()}
+        assert plugin._job_resources(jobids["known"]) == expected
+        # Interfaces never monitored keep the resources set on the node
+        assert plugin._job_resources(jobids["unknown"]) == (1.5, 1)
+        # Priorities are only computed for the critical path scheduler
+        assert plugin._priorities is None
+        plugin._postrun_check()
+
+
+def test_preflight_check(tmpdir, monkeypatch):
+    tmpdir.chdir()
+    pipe = pe.Workflow(name="pipe", base_dir=tmpdir.strpath)
+    n1 = pe.Node(SingleNodeTestInterface(), name="n1")
+    n2 = pe.Node(SingleNodeTestInterface(), name="n2")
+    n3 = pe.MapNode(SingleNodeTestInterface(), iterfield=["input2"], name="n3")
+    n4 = pe.Node(SingleNodeTestInterface(), name="n4")
+    pipe.connect(n1, "output1", n2, "input1")
+    pipe.connect(n2, "output1", n3, "input1")
+    pipe.connect(n2, "output1", n4, "input1")
+    n1.inputs.input1 = 1
+    n3.inputs.input2 = [1, 2, 3]
+    n4.inputs.input2 = 1
+    pipe.run(plugin="MultiProc", plugin_args={"n_procs": 2})
+
+    checked = []
+    monkeypatch.setattr(
+        MultiProcPlugin,
+        "_local_hash_check",
+        lambda self, jobid, graph: checked.append(self.procs[jobid].name),
+    )
+    # The whole workflow is cached, nothing is left to schedule
+    pipe.run(plugin="MultiProc", plugin_args={"n_procs": 2, "preflight": 2})
+    assert checked == []
+
+    # Only the frontier of outdated nodes is scheduled
+    n4.inputs.input2 = 2
+    pipe.run(plugin="MultiProc", plugin_args={"n_procs": 2, "preflight": True})
+    assert checked == ["n4"]
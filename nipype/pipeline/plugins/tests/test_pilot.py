@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Test the pilot jobs of batch plugins
+"""
+import os
+import subprocess
+from unittest.mock import patch
+
+import nipype
+import nipype.pipeline.engine as pe
+from nipype.interfaces.utility import Function
+from nipype.pipeline.plugins.base import SGELikeBatchManagerBase
+from nipype.pipeline.plugins.pilot import TaskQueue, run_worker
+from nipype.pipeline.plugins.tools import _pickle_node
+
+
+def double(x):
+    return 2 * x
+
+
+def test_task_queue(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue"))
+    first = queue.put("/path/to/node_a.pklz", "a")
+    second = queue.put("/path/to/node_b.pklz", "b")
+    assert len(queue) == 2
+
+    assert queue.claim() == (first, "/path/to/node_a.pklz", "a")
+    assert queue.claim() == (second, "/path/to/node_b.pklz", "b")
+    assert queue.claim() is None
+    assert queue.is_pending(first)
+
+    # Tasks that are not touched anymore are queued again
+    assert queue.requeue_stale(3600) == []
+    os.utime(os.path.join(queue.claimed, second), (0, 0))
+    assert queue.requeue_stale(3600) == [second]
+    assert queue.claim()[0] == second
+
+    queue.done(first)
+    assert not queue.is_pending(first)
+    assert len(queue) == 1
+
+
+def test_run_worker(tmp_path):
+    node = pe.Node(Function(function=double), name="double")
+    node.inputs.x = 2
+    node.base_dir = str(tmp_path)
+    wf = pe.Workflow(name="wf", base_dir=str(tmp_path))
+    wf.add_nodes([node])
+    node.config = wf.config
+
+    queue = TaskQueue(str(tmp_path / "queue"))
+    _, suffix, pkl_file = _pickle_node(node, False)
+    queue.put(pkl_file, suffix)
+    queue.stopped = True
+    assert run_worker(queue.root) == 1
+    assert len(queue) == 0
+    assert node.result.outputs.out == 4
+
+
+def submit_pilot(self, scriptfile, node):
+    # Run the nipype under test
+    pythonpath = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(nipype.__file__))]
+        + os.environ.get("PYTHONPATH", "").split(os.pathsep)
+    )
+    env = dict(os.environ, PYTHONPATH=pythonpath)
+    self._workers.append(subprocess.Popen(["bash", scriptfile], env=env))
+    self._pilot_args.append(node.plugin_args)
+    self._pending[len(self._workers)] = node.output_dir()
+    return len(self._workers)
+
+
+def is_pending(self, taskid):
+    return self._workers[taskid - 1].poll() is None
+
+
+@patch.object(SGELikeBatchManagerBase, "_submit_batchtask", new=submit_pilot)
+@patch.object(SGELikeBatchManagerBase, "_is_pending", new=is_pending)
+def test_pilots(tmp_path):
+    pipe = pe.Workflow(name="pipe", base_dir=str(tmp_path))
+    mapnode = pe.MapNode(Function(function=double), iterfield=["x"], name="double")
+    mapnode.inputs.x = [1, 2, 3]
+    pipe.add_nodes([mapnode])
+    plugin = SGELikeBatchManagerBase(
+        "", plugin_args={"pilots": 2, "pilot_args": {"qsub_args": "-l h_rt=1:00:00"}}
+    )
+    plugin._workers = []
+    plugin._pilot_args = []
+    execgraph = pipe.run(plugin=plugin)
+
+    node = list(execgraph.nodes())[0]
+    assert node.result.outputs.out == [2, 4, 6]
+    # Workers exit once the workflow is done
+    for worker in plugin._workers:
+        assert worker.wait(timeout=30) == 0
+    assert 1 <= len(plugin._workers) <= 4
+    assert not plugin._pending
+    # Pilots are submitted with their own arguments
+    assert plugin._pilot_args == [{"qsub_args": "-l h_rt=1:00:00"}] * len(
+        plugin._workers
+    )
+
+
+def test_pilot_resources():
+    plugin = SGELikeBatchManagerBase("", plugin_args={"pilots": 2})
+    plugin._pilot_node = pe.Node(Function(function=double), name="pilot")
+    assert plugin._estimate_resources(plugin._pilot_node) is None
+    # Pilots request the largest resources of the nodes they may run
+    plugin._pilot_resources = {"pilot-1": (4.0, 1), "pilot-2": (1.0, 8)}
+    assert plugin._estimate_resources(plugin._pilot_node) == (4.0, 8)
+    plugin._pilot_resources["pilot-3"] = None
+    assert plugin._estimate_resources(plugin._pilot_node) is None
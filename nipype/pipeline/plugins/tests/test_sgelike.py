@@ -1,9 +1,12 @@
+import nipype
 from nipype.pipeline.plugins.base import SGELikeBatchManagerBase
 from nipype.interfaces.utility import Function
 import nipype.pipeline.engine as pe
 import pytest
 from unittest.mock import patch
+import os
 import subprocess
+from time import time
 
 
 def crasher():
@@ -33,3 +36,148 @@ def test_crashfile_creation(tmp_path):
 
     crashfiles = tmp_path.glob("crash*crasher*.pklz")
     assert len(list(crashfiles)) == 1
+
+
+def test_bulk_status():
+    queries = []
+
+    def query_statuses(self):
+        queries.append(None)
+        return {"1": True, "2": False}
+
+    plugin = SGELikeBatchManagerBase("")
+    plugin._pending.update({1: "", 2: "", 3: ""})
+    with patch.object(SGELikeBatchManagerBase, "_query_statuses", new=query_statuses):
+        # One query per iteration of the scheduler
+        assert [plugin._task_pending(taskid) for taskid in (1, 2, 3)] == [
+            True,
+            False,
+            False,
+        ]
+        assert len(queries) == 1
+        # Tasks submitted after the query may not be listed yet
+        plugin._submitted[4] = time()
+        plugin._pending[4] = ""
+        assert plugin._task_pending(4) is True
+        assert len(queries) == 1
+        assert plugin._task_pending(1) is True
+        assert len(queries) == 2
+        assert plugin._task_pending(4) is False
+
+    # Plugins without bulk queries check every task
+    with patch.object(SGELikeBatchManagerBase, "_is_pending", new=is_pending):
+        plugin = SGELikeBatchManagerBase("")
+        assert plugin._task_pending(1) is False
+        assert plugin._bulk_status is False
+
+
+def test_slurm_query_statuses():
+    from nipype.pipeline.plugins import slurm
+
+    stdout = "101 R\n102 PD\n103 CD\n104_1 R\n"
+    with patch.object(slurm, "CommandLine") as command:
+        command.return_value.run.return_value.runtime.stdout = stdout
+        statuses = slurm.SLURMPlugin()._query_statuses()
+    assert statuses == {"101": True, "102": True, "103": False, "104_1": True}
+
+
+def double(x):
+    return 2 * x
+
+
+def submit_array(self, scriptfile, nodes):
+    self._array_sizes.append(len(nodes))
+    for index in range(len(nodes)):
+        # Run the nipype under test
+        pythonpath = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(nipype.__file__))]
+            + os.environ.get("PYTHONPATH", "").split(os.pathsep)
+        )
+        env = dict(os.environ, ARRAY_INDEX="%d" % index, PYTHONPATH=pythonpath)
+        subprocess.call(["bash", scriptfile], env=env)
+    return 1
+
+
+@patch.object(SGELikeBatchManagerBase, "_submit_array", new=submit_array)
+@patch.object(SGELikeBatchManagerBase, "_is_pending", new=is_pending)
+@patch.object(SGELikeBatchManagerBase, "_array_index_var", new="ARRAY_INDEX")
+def test_job_arrays(tmp_path):
+    pipe = pe.Workflow(name="pipe", base_dir=str(tmp_path))
+    mapnode = pe.MapNode(Function(function=double), iterfield=["x"], name="double")
+    mapnode.inputs.x = [1, 2, 3]
+    pipe.add_nodes([mapnode])
+    plugin = SGELikeBatchManagerBase("", plugin_args={"job_arrays": 2})
+    plugin._array_sizes = []
+    execgraph = pipe.run(plugin=plugin)
+
+    node = list(execgraph.nodes())[0]
+    assert node.result.outputs.out == [2, 4, 6]
+    # The subnodes are submitted as two arrays (then the MapNode itself)
+    assert plugin._array_sizes == [2, 1, 1]
+    assert not plugin._array_tasks
+
+
+def test_result_written(tmp_path):
+    plugin = SGELikeBatchManagerBase("")
+    plugin._pending[1] = str(tmp_path)
+    plugin._submitted[1] = time()
+    assert not plugin._result_written(1)
+
+    # Results of previous runs are ignored
+    result_file = tmp_path / "result_node.pklz"
+    result_file.write_text("")
+    os.utime(str(result_file), (0, 0))
+    assert not plugin._result_written(1)
+
+    result_file.write_text("")
+    assert plugin._result_written(1)
+    # until the node is finished
+    (tmp_path / "_0x1234_unfinished.json").write_text("")
+    assert not plugin._result_written(1)
+
+
+def submit_watched(self, scriptfile, node):
+    taskid = len(self._pending) + 1
+    submit_array(self, scriptfile, [node])
+    self._pending[taskid] = node.output_dir()
+    return taskid
+
+
+def is_running(self, taskid):
+    return True
+
+
+@patch.object(SGELikeBatchManagerBase, "_submit_batchtask", new=submit_watched)
+@patch.object(SGELikeBatchManagerBase, "_is_pending", new=is_running)
+def test_watch_results(tmp_path):
+    from nipype.utils.watcher import get_watcher
+
+    watcher = get_watcher(True)
+    if watcher is None:
+        pytest.skip("inotify is not available")
+    watcher.close()
+    pipe = pe.Workflow(name="pipe", base_dir=str(tmp_path))
+    first = pe.Node(Function(function=double), name="first")
+    first.inputs.x = 1
+    second = pe.Node(Function(function=double), name="second")
+    pipe.connect(first, "out", second, "x")
+    pipe.config["execution"]["watch_results"] = True
+    pipe.config["execution"]["poll_sleep_duration"] = 60
+    plugin = SGELikeBatchManagerBase("")
+    plugin._array_sizes = []
+    start = time()
+    execgraph = pipe.run(plugin=plugin)
+    # Results are collected as soon as they are written, while the batch
+    # system still lists the jobs
+    assert time() - start < 60
+    assert sorted(node.result.outputs.out for node in execgraph.nodes()) == [2, 4]
+
+    # With no pending tasks, the scheduler sleeps rather than spinning
+    plugin._watcher = get_watcher(True)
+    plugin.proc_done[-1] = False
+    try:
+        start = time()
+        plugin._wait_for_events(start + 0.2)
+        assert time() - start >= 0.2
+    finally:
+        plugin._watcher.close()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Test the Thread plugin
+"""
+import os
+import pytest
+from nipype.pipeline import engine as pe
+from nipype.interfaces import base as nib
+
+
+class PwdOutputSpec(nib.TraitedSpec):
+    out_file = nib.File(exists=True, desc="output of the command")
+
+
+class PwdInputSpec(nib.CommandLineInputSpec):
+    delay = nib.traits.Float(0, usedefault=True, argstr="%g", desc="sleep time")
+
+
+class Pwd(nib.CommandLine):
+    _cmd = "sleep"
+    input_spec = PwdInputSpec
+    output_spec = PwdOutputSpec
+    _terminal_output = "file"
+
+    @property
+    def cmdline(self):
+        return "%s; pwd" % super(Pwd, self).cmdline
+
+    def _list_outputs(self):
+        outputs = self._outputs().get()
+        # Relies on the working directory
+        outputs["out_file"] = os.path.abspath("output.nipype")
+        return outputs
+
+
+class WhereOutputSpec(nib.TraitedSpec):
+    cwd = nib.traits.Str(desc="working directory")
+    pid = nib.traits.Int(desc="process identifier")
+
+
+class WhereInputSpec(nib.BaseInterfaceInputSpec):
+    index = nib.traits.Int(desc="an identifier")
+
+
+class Where(nib.SimpleInterface):
+    input_spec = WhereInputSpec
+    output_spec = WhereOutputSpec
+
+    def _run_interface(self, runtime):
+        self._results["cwd"] = os.getcwd()
+        self._results["pid"] = os.getpid()
+        return runtime
+
+
+def test_run_thread(tmpdir):
+    tmpdir.chdir()
+
+    wf = pe.Workflow(name="wf", base_dir=tmpdir.strpath)
+    pwd = pe.Node(Pwd(), name="pwd")
+    pwd.iterables = ("delay", [0.2, 0.1, 0.0, 0.3])
+    wf.add_nodes([pwd])
+    execgraph = wf.run(plugin="Thread", plugin_args={"n_procs": 4})
+
+    assert len(execgraph.nodes()) == 4
+    for node in execgraph.nodes():
+        out_file = node.get_output("out_file")
+        assert os.path.dirname(out_file) == node.output_dir()
+        with open(out_file) as fobj:
+            assert fobj.read().strip() == node.output_dir()
+    assert os.getcwd() == tmpdir.strpath
+
+
+def test_run_thread_all(tmpdir):
+    tmpdir.chdir()
+
+    wf = pe.Workflow(name="wf", base_dir=tmpdir.strpath)
+    where = pe.Node(Where(), name="where")
+    where.iterables = ("index", [0, 1])
+    wf.add_nodes([where])
+    execgraph = wf.run(plugin="Thread", plugin_args={"n_procs": 2, "in_threads": "all"})
+
+    for node in execgraph.nodes():
+        assert node.get_output("pid") == os.getpid()
+        assert node.get_output("cwd") == node.output_dir()
+
+    with pytest.raises(ValueError):
+        wf.run(plugin="Thread", plugin_args={"in_threads": "some"})
@@ -3,13 +3,26 @@
 # vi: set ft=python sts=4 ts=4 sw=4 et:
 """Tests for the engine module
 """
+import os
+from glob import glob
+
 import numpy as np
 import scipy.sparse as ssp
+import pickle
 import re
 
 from unittest import mock
 
-from nipype.pipeline.plugins.tools import report_crash
+from nipype.interfaces.base import Bunch, InterfaceResult
+from nipype.interfaces.utility import IdentityInterface
+from nipype.pipeline.engine import Node
+from nipype.pipeline.plugins.tools import (
+    report_crash,
+    prefetch_inputs,
+    create_array_pyscript,
+    NodeTask,
+)
+from nipype.utils.filemanip import savepkl
 
 
 def test_report_crash():
@@ -34,6 +47,42 @@ def test_report_crash():
             assert mock_pickle_dump.call_count == 1
 
 
+def test_prefetch_inputs(tmpdir):
+    files = [tmpdir.join("file%d.txt" % i) for i in range(3)]
+    for fobj in files:
+        fobj.write("data")
+    done = tmpdir.join("result_done.pklz").strpath
+    running = tmpdir.join("result_running.pklz").strpath
+    outputs = Bunch(
+        out_file=files[0].strpath, out_files=[files[1].strpath, files[2].strpath], n=3
+    )
+    savepkl(done, InterfaceResult(IdentityInterface, None, outputs=outputs))
+
+    node = Node(IdentityInterface(fields=["a", "b", "c", "d"]), name="node")
+    node.input_source = {
+        "a": (done, "out_file"),
+        "b": (done, ("out_files", "def f(x): return x", ())),
+        "c": (done, "n"),
+        "d": (running, "out_file"),
+    }
+    prefetched = prefetch_inputs(dict(node.input_source), {done})
+    assert sorted(prefetched) == sorted(fobj.strpath for fobj in files)
+
+
+def test_node_task():
+    node = Node(IdentityInterface(fields=["a"]), name="node")
+    node.inputs.a = list(range(10))
+    task = NodeTask(node)
+    # Changes to the node after the task is created do not affect it
+    node.inputs.a = 1
+
+    task = pickle.loads(pickle.dumps(task))
+    assert task.fullname == node.fullname
+    loaded = task.load()
+    assert loaded is not node
+    assert loaded.inputs.a == list(range(10))
+
+
 """
 Can use the following code to test that a mapnode crash continues successfully
 Need to put this into a unit-test with a timeout
@@ -59,3 +108,25 @@ wf.base_dir = '/tmp'
 
 wf.run(plugin='MultiProc')
 """
+
+
+def test_create_array_pyscript(tmpdir):
+    tmpdir.chdir()
+    nodes = []
+    for index in range(2):
+        node = Node(IdentityInterface(fields=["a"]), name="node%d" % index)
+        node.base_dir = tmpdir.strpath
+        node.config = {"execution": {"matplotlib_backend": "Agg"}}
+        nodes.append(node)
+
+    pyscript = create_array_pyscript(nodes)
+    assert os.path.basename(pyscript).endswith("_node0_array.py")
+    manifest = glob(os.path.join(os.path.dirname(pyscript), "manifest_*_array.txt"))
+    with open(manifest[0]) as fp:
+        entries = [line.split("\t") for line in fp.read().splitlines()]
+    assert [os.path.basename(pkl_file) for pkl_file, _ in entries] == [
+        "node_%s.pklz" % suffix for _, suffix in entries
+    ]
+    assert entries[1][1].endswith("_node1")
+    with open(pyscript) as fp:
+        assert "sys.argv[1]" in fp.read()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""Parallel workflow execution via threads and multiprocessing
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from ... import logging
+from ...interfaces.base import CommandLine
+from ...interfaces.io import IOBase
+from .multiproc import MultiProcPlugin, run_node
+from .tools import NodeTask
+
+logger = logging.getLogger("nipype.workflow")
+
+
+class ThreadPlugin(MultiProcPlugin):
+    """
+    Execute workflow with threads for the nodes that spend their time
+    waiting, and with multiprocessing for the others.
+
+    Command-line interfaces (waiting on their command) and I/O interfaces
+    (waiting on the filesystem) run in threads of the main process, which
+    spares spawning worker processes and sending nodes to them. Other
+    interfaces, which run Python code holding the interpreter lock, run in
+    worker processes, as with MultiProc (which are only started if needed).
+    Threads take turns at using the working directory of the process,
+    except while commands are running (see
+    :class:`~nipype.utils.filemanip.WorkdirLock`) and for interfaces that
+    do not change into their working directory (``_chdir = False``).
+
+    Resources are allocated as with MultiProc, and the options are the
+    same, plus:
+
+    - in_threads: which nodes run in threads: command-line and I/O
+        interfaces (``'auto'``, default value) or all of them
+        (``'all'``, e.g., when Python interfaces mostly release the
+        interpreter lock).
+
+    """
+
+    def __init__(self, plugin_args=None):
+        super(ThreadPlugin, self).__init__(plugin_args=plugin_args)
+        self._in_threads = self.plugin_args.get("in_threads", "auto")
+        if self._in_threads not in ("auto", "all"):
+            raise ValueError(
+                "Invalid value for the in_threads option: %s" % self._in_threads
+            )
+        self._threads = ThreadPoolExecutor(max_workers=self.processors)
+
+    def _runs_in_thread(self, node):
+        return self._in_threads == "all" or isinstance(
+            node.interface, (CommandLine, IOBase)
+        )
+
+    def _submit_job(self, node, updatehash=False):
+        if not self._runs_in_thread(node):
+            return super(ThreadPlugin, self)._submit_job(node, updatehash=updatehash)
+
+        self._taskid += 1
+        # Run a copy of the node, as the worker processes do
+        result_future = self._threads.submit(
+            run_node, NodeTask(node), updatehash, self._taskid
+        )
+        result_future.add_done_callback(self._async_callback)
+        self._task_obj[self._taskid] = result_future
+
+        logger.debug(
+            "[Thread] Submitted task %s (taskid=%d).", node.fullname, self._taskid
+        )
+        return self._taskid
+
+    def _postrun_check(self):
+        self._threads.shutdown()
+        super(ThreadPlugin, self)._postrun_check()
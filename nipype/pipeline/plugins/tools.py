@@ -5,6 +5,7 @@
 """
 import os
 import getpass
+import pickle
 from socket import gethostname
 import sys
 import uuid
@@ -76,6 +77,27 @@ another exception occurred:\n\n{}.""".format(
     return crashfile
 
 
+class NodeTask(object):
+    """
+    A serialized snapshot of a node, to be executed by a worker.
+
+    The node is pickled once, when the task is created, so that submitting
+    it requires neither copying the node beforehand (the task is not affected
+    by later changes to the node) nor pickling it again to send it to the
+    worker, which rebuilds the node with :meth:`load`.
+    """
+
+    __slots__ = ("fullname", "_pickled")
+
+    def __init__(self, node):
+        self.fullname = node.fullname
+        self._pickled = pickle.dumps(node, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self):
+        """Rebuild the node"""
+        return pickle.loads(self._pickled)
+
+
 def report_nodes_not_run(notrun):
     """List nodes that crashed with crashfile info
 
@@ -99,19 +121,83 @@ def report_nodes_not_run(notrun):
         )
 
 
-def create_pyscript(node, updatehash=False, store_exception=True):
-    # pickle node
+def prefetch_inputs(input_source, results_files, chunk_size=8 * 1024 * 1024):
+    """
+    Read ahead the inputs that a node will take from some finished nodes.
+
+    ``input_source`` maps the inputs of the node to their results file and
+    output (as :attr:`~nipype.pipeline.engine.Node.input_source`). The
+    results files in ``results_files`` are loaded (into the
+    :data:`~nipype.pipeline.engine.utils.result_cache`), and the files that
+    their outputs provide to the node are read ahead (with ``posix_fadvise``
+    where available), so that they are in the filesystem cache by the time
+    the node starts. Plain values are taken rather than the node, which the
+    scheduler may update meanwhile.
+
+    Returns the list of files read ahead.
+    """
+    from ..engine.utils import result_cache
+
+    connections = {}
+    for results_file, sourceinfo in input_source.values():
+        if results_file in results_files:
+            connections.setdefault(results_file, []).append(sourceinfo)
+
+    filenames = []
+    for results_file, sources in connections.items():
+        outputs = result_cache.outputs(results_file)
+        if outputs is None:
+            continue
+        values = [
+            getattr(outputs, src[0] if isinstance(src, tuple) else src, None)
+            for src in sources
+        ]
+        while values:
+            value = values.pop()
+            if isinstance(value, (list, tuple)):
+                values.extend(value)
+            elif isinstance(value, str) and os.path.isfile(value):
+                filenames.append(value)
+
+    for filename in filenames:
+        with open(filename, "rb") as fobj:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fobj.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while fobj.read(chunk_size):
+                    pass
+    return filenames
+
+
+def _get_batch_dir(node):
+    """Return the directory of the batch scripts of a node"""
+    if node._hierarchy:
+        return os.path.join(node.base_dir, node._hierarchy.split(".")[0], "batch")
+    return os.path.join(node.base_dir, "batch")
+
+
+def _pickle_node(node, updatehash):
+    """Pickle a node to be run by a batch job, return the batch dir and file"""
     timestamp = strftime("%Y%m%d_%H%M%S")
     if node._hierarchy:
         suffix = "%s_%s_%s" % (timestamp, node._hierarchy, node._id)
-        batch_dir = os.path.join(node.base_dir, node._hierarchy.split(".")[0], "batch")
     else:
         suffix = "%s_%s" % (timestamp, node._id)
-        batch_dir = os.path.join(node.base_dir, "batch")
+    batch_dir = _get_batch_dir(node)
     if not os.path.exists(batch_dir):
         os.makedirs(batch_dir)
     pkl_file = os.path.join(batch_dir, "node_%s.pklz" % suffix)
     savepkl(pkl_file, dict(node=node, updatehash=updatehash))
+    return batch_dir, suffix, pkl_file
+
+
+def _write_pyscript(pyscript, locate, node, batch_dir, store_exception):
+    """
+    Write a python script running a pickled node.
+
+    ``locate`` is the code defining the pickle file of the node
+    (``pklfile``) and the suffix of its crash file (``suffix``).
+    """
     mpl_backend = node.config["execution"]["matplotlib_backend"]
     # create python script to load and trap exception
     cmdstr = """import os
@@ -136,7 +222,7 @@ from nipype.utils.filemanip import loadpkl, savepkl
 from socket import gethostname
 from traceback import format_exception
 info = None
-pklfile = '%s'
+%s
 batchdir = '%s'
 from nipype.utils.filemanip import loadpkl, savepkl
 try:
@@ -157,7 +243,7 @@ except Exception as e:
     traceback = format_exception(etype,eval,etr)
     if info is None or not os.path.exists(info['node'].output_dir()):
         result = None
-        resultsfile = os.path.join(batchdir, 'crashdump_%s.pklz')
+        resultsfile = os.path.join(batchdir, 'crashdump_%%s.pklz' %% suffix)
     else:
         result = info['node'].result
         resultsfile = os.path.join(info['node'].output_dir(),
@@ -178,8 +264,53 @@ except Exception as e:
         report_crash(info['node'], traceback, gethostname())
     raise Exception(e)
 """
-    cmdstr = cmdstr % (mpl_backend, pkl_file, batch_dir, node.config, suffix)
-    pyscript = os.path.join(batch_dir, "pyscript_%s.py" % suffix)
+    cmdstr = cmdstr % (mpl_backend, locate, batch_dir, node.config)
     with open(pyscript, "wt") as fp:
         fp.writelines(cmdstr)
+
+
+def create_pyscript(node, updatehash=False, store_exception=True):
+    batch_dir, suffix, pkl_file = _pickle_node(node, updatehash)
+    pyscript = os.path.join(batch_dir, "pyscript_%s.py" % suffix)
+    locate = "pklfile = '%s'\nsuffix = '%s'" % (pkl_file, suffix)
+    _write_pyscript(pyscript, locate, node, batch_dir, store_exception)
+    return pyscript
+
+
+def create_cluster_pyscript(pyscripts):
+    """
+    Create a python script running other python scripts in a single process.
+
+    The scripts are run in order, and the first one raising an exception
+    stops the others.
+    """
+    cluster = "%s_cluster.py" % os.path.splitext(pyscripts[-1])[0]
+    with open(cluster, "wt") as fp:
+        fp.write("from runpy import run_path\n")
+        for pyscript in pyscripts:
+            fp.write("run_path(%r, run_name='__main__')\n" % pyscript)
+    return cluster
+
+
+def create_array_pyscript(nodes, updatehash=False, store_exception=True):
+    """
+    Create a single python script running any of a list of nodes.
+
+    The nodes are pickled, and listed in a manifest file next to the script,
+    which runs the node at the (0-based) index given as first argument
+    (e.g., the index of the task within a job array). The nodes must share
+    their configuration.
+    """
+    pkl_files = [_pickle_node(node, updatehash) for node in nodes]
+    batch_dir, suffix, _ = pkl_files[0]
+    manifest = os.path.join(batch_dir, "manifest_%s_array.txt" % suffix)
+    with open(manifest, "wt") as fp:
+        fp.writelines("%s\t%s\n" % (pkl_file, sfx) for _, sfx, pkl_file in pkl_files)
+    pyscript = os.path.join(batch_dir, "pyscript_%s_array.py" % suffix)
+    locate = (
+        "with open(%r) as fp:\n"
+        "    pklfile, suffix = fp.read().splitlines()[int(sys.argv[1])].split('\\t')"
+        % manifest
+    )
+    _write_pyscript(pyscript, locate, nodes[0], batch_dir, store_exception)
     return pyscript
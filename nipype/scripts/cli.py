@@ -111,6 +111,22 @@ def show(pklz_file):
     pprint(pkl_data)
 
 
+@cli.command(context_settings=CONTEXT_SETTINGS)
+@click.argument("base_dir", type=ExistingDirPath, callback=check_not_none)
+def cacheindex(base_dir):
+    """Rebuild the cache index of a working directory.
+
+    Index the cached results of all the nodes found in the base directory
+    of a workflow (used with the "cache_index" execution option).
+
+    Examples:\n
+    nipypecli cacheindex /path/to/base_dir
+    """
+    from ..utils.cacheindex import rebuild_index
+
+    click.echo("Indexed %d cached nodes." % rebuild_index(base_dir))
+
+
 @cli.command(context_settings=UNKNOWN_OPTIONS)
 @click.argument("module", type=PythonModule(), required=False, callback=check_not_none)
 @click.argument("interface", type=str, required=False)
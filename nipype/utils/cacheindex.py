@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Workflow-wide index of the cached results of nodes
+
+Checking whether a node is cached requires listing its working directory
+for ``_0x*.json`` hashfiles, which is a metadata round-trip per node on
+parallel filesystems.
+When the ``cache_index`` option of the ``execution`` section is on, the
+hash of every finished node and the location of its results file are
+stored in a SQLite database in the base directory of the workflow
+(``_cacheindex.sqlite``), so that up-to-date nodes are recognized without
+listing their directory.
+Nodes missing from the index fall back to the directory listing, and the
+index can be rebuilt from the working directories with :func:`rebuild_index`
+(or ``nipypecli cacheindex``).
+"""
+import os
+import os.path as op
+import re
+import sqlite3
+from contextlib import closing
+
+from .. import logging
+
+logger = logging.getLogger("nipype.utils")
+
+INDEX_FILE = "_cacheindex.sqlite"
+_HASHFILE = re.compile(r"^_0x([0-9a-f]+)\.json$")
+
+
+class CacheIndex(object):
+    """
+    A SQLite store of the hash and results file of the nodes of a workflow.
+
+    Paths are stored relative to the folder of the index, so that the index
+    remains valid when the working directory is moved.
+
+    >>> index = CacheIndex('wd')
+    >>> index.record('wd/wf/node', 'wf.node', 'abc123', 'wd/wf/node/result_node.pklz')
+    >>> index.lookup('wd/wf/node') == ('abc123', op.abspath('wd/wf/node/result_node.pklz'))
+    True
+    >>> index.discard('wd/wf/node')
+    >>> index.lookup('wd/wf/node') is None
+    True
+
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = op.abspath(base_dir)
+        self.filename = op.join(self.base_dir, INDEX_FILE)
+
+    def _connect(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        conn = sqlite3.connect(self.filename, timeout=60)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "outdir TEXT PRIMARY KEY, fullname TEXT, "
+            "hashvalue TEXT NOT NULL, resultfile TEXT NOT NULL)"
+        )
+        return conn
+
+    def _relpath(self, path):
+        return op.relpath(op.abspath(path), self.base_dir)
+
+    def lookup(self, outdir):
+        """Return the hash and results file of the node in ``outdir``, if indexed"""
+        if not op.exists(self.filename):
+            return None
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT hashvalue, resultfile FROM nodes WHERE outdir = ?",
+                    (self._relpath(outdir),),
+                ).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("Could not read cache index '%s': %s", self.filename, exc)
+            return None
+        if row is None:
+            return None
+        return row[0], op.join(self.base_dir, row[1])
+
+    def record(self, outdir, fullname, hashvalue, resultfile):
+        """Index the results of a node that finished"""
+        self._execute(
+            "INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?)",
+            (self._relpath(outdir), fullname, hashvalue, self._relpath(resultfile)),
+        )
+
+    def discard(self, outdir):
+        """Remove a node (e.g., about to be rerun) from the index"""
+        if op.exists(self.filename):
+            self._execute(
+                "DELETE FROM nodes WHERE outdir = ?", (self._relpath(outdir),)
+            )
+
+    def _execute(self, query, params):
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(query, params)
+        except sqlite3.Error as exc:
+            logger.warning("Could not update cache index '%s': %s", self.filename, exc)
+
+
+_indexes = {}
+
+
+def get_cache_index(base_dir):
+    """Return the cache index of the workflows in ``base_dir``"""
+    base_dir = op.abspath(base_dir)
+    if base_dir not in _indexes:
+        _indexes[base_dir] = CacheIndex(base_dir)
+    return _indexes[base_dir]
+
+
+def rebuild_index(base_dir):
+    """
+    Rebuild the cache index of ``base_dir`` from the working directories.
+
+    Every folder holding a results file (``result_<name>.pklz``) and a
+    single, finished hashfile is indexed. Returns the number of nodes
+    indexed.
+
+    """
+    index = get_cache_index(base_dir)
+    entries = []
+    for root, _, files in os.walk(index.base_dir):
+        name = op.basename(root)
+        hashes = [m.group(1) for m in map(_HASHFILE.match, files) if m]
+        if len(hashes) != 1 or "result_%s.pklz" % name not in files:
+            continue
+        entries.append(
+            (
+                index._relpath(root),
+                None,
+                hashes[0],
+                index._relpath(op.join(root, "result_%s.pklz" % name)),
+            )
+        )
+
+    with closing(index._connect()) as conn, conn:
+        conn.execute("DELETE FROM nodes")
+        conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?)", entries)
+    logger.info("Indexed %d cached nodes in '%s'.", len(entries), index.filename)
+    return len(entries)
@@ -6,6 +6,7 @@ Created on 20 Apr 2010
 
 logging options : INFO, DEBUG
 hash_method : content, timestamp
+hash_algorithm : md5, sha1, sha256, sha512, blake2b, blake2s, xxhash
 
 @author: Chris Filo Gorgolewski
 """
@@ -43,6 +44,10 @@ log_rotate = 4
 create_report = true
 crashdump_dir = {crashdump_dir}
 hash_method = timestamp
+hash_algorithm = md5
+hash_threads = 4
+content_hash_cache = false
+cache_index = false
 job_finished_timeout = 5
 keep_inputs = false
 local_hash_check = true
@@ -53,6 +58,8 @@ remove_unnecessary_outputs = true
 try_hard_link_datasink = true
 single_thread_matlab = true
 crashfile_format = pklz
+result_format = pklz
+result_cache_size = 256
 stop_on_first_crash = false
 stop_on_first_rerun = false
 use_relative_paths = false
@@ -60,6 +67,7 @@ stop_on_unknown_version = false
 write_provenance = false
 parameterize_dirs = true
 poll_sleep_duration = 2
+watch_results = false
 xvfb_max_wait = 10
 check_version = true
 
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Persistent cache of the content hashes of files
+
+With ``hash_method = content``, every file input is hashed each time the
+hash of the inputs of a node is computed, which happens several times per
+node and again in every node consuming the same file.
+When the ``content_hash_cache`` option of the ``execution`` section is on,
+digests are stored in a SQLite database (by default, ``digests.sqlite``
+within the nipype configuration folder, which can be changed with the
+``content_hash_cache_file`` option) keyed by the device, inode, size and
+modification time of the file, and files are only hashed again when any
+of these change.
+"""
+import os
+import sqlite3
+import stat
+from contextlib import closing
+from threading import Lock
+
+from .. import config, logging
+from .filemanip import hash_infile
+
+logger = logging.getLogger("nipype.utils")
+
+
+def _cache_file(filename=None):
+    if filename is None:
+        filename = config.get(
+            "execution",
+            "content_hash_cache_file",
+            os.path.join(os.path.dirname(config.data_file), "digests.sqlite"),
+        )
+    return os.path.abspath(os.path.expanduser(filename))
+
+
+class DigestCache(object):
+    """
+    A SQLite store of the digests of files, keyed by their stat signature.
+
+    Files smaller than ``min_size`` bytes are cheaper to hash than to look
+    up, and are always hashed. Digests are also kept in memory, so that each
+    file is looked up at most once per process while it does not change.
+
+    >>> cache = DigestCache(filename='digests.sqlite', min_size=0)
+    >>> cache.hash_infile('surf01.vtk')
+    'fdf1cf359b4e346034372cdeb58f9a88'
+    >>> cache.hash_infile('surf01.vtk')  # Retrieved from the cache
+    'fdf1cf359b4e346034372cdeb58f9a88'
+    >>> cache.stats()
+    {'hits': 1, 'misses': 1}
+
+    """
+
+    def __init__(self, filename=None, min_size=1024 * 1024):
+        self.filename = _cache_file(filename)
+        self.min_size = min_size
+        self._memo = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        conn = sqlite3.connect(self.filename, timeout=60)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            "device INTEGER NOT NULL, inode INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "algorithm TEXT NOT NULL, digest TEXT NOT NULL, "
+            "PRIMARY KEY (device, inode, size, mtime_ns, algorithm))"
+        )
+        return conn
+
+    def _lookup(self, key):
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT digest FROM digests WHERE device = ? AND inode = ? "
+                    "AND size = ? AND mtime_ns = ? AND algorithm = ?",
+                    key,
+                ).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("Could not read digests from '%s': %s", self.filename, exc)
+            return None
+        return row[0] if row else None
+
+    def _store(self, key, digest):
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)",
+                    key + (digest,),
+                )
+        except sqlite3.Error as exc:
+            logger.warning("Could not store digest in '%s': %s", self.filename, exc)
+
+    def hash_infile(self, afile, algorithm="md5"):
+        """
+        Return the digest of a file, as :func:`~nipype.utils.filemanip.hash_infile`.
+
+        The digest is only computed if the file was not hashed before with
+        the hash ``algorithm``, or if its stat signature changed since.
+        """
+        try:
+            before = os.stat(afile)
+        except OSError:
+            return None
+        if not stat.S_ISREG(before.st_mode):
+            return None
+        if before.st_size < self.min_size:
+            return hash_infile(afile, crypto=algorithm)
+
+        key = (
+            before.st_dev,
+            before.st_ino,
+            before.st_size,
+            before.st_mtime_ns,
+            algorithm.lower(),
+        )
+        digest = self._memo.get(key)
+        if digest is None:
+            digest = self._lookup(key)
+            if digest is not None:
+                self._memo[key] = digest
+        if digest is not None:
+            with self._lock:
+                self.hits += 1
+            return digest
+
+        with self._lock:
+            self.misses += 1
+        digest = hash_infile(afile, crypto=algorithm)
+        if digest is None:
+            return None
+        after = os.stat(afile)
+        # Do not store digests of files modified while they were hashed
+        if (after.st_size, after.st_mtime_ns) == key[2:4]:
+            self._memo[key] = digest
+            self._store(key, digest)
+        return digest
+
+    def stats(self):
+        """Return the number of digests retrieved from the cache and computed"""
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses)
+
+
+_caches = {}
+
+
+def get_digest_cache(filename=None):
+    """Return the (per-process) digest cache stored in ``filename``"""
+    filename = _cache_file(filename)
+    if filename not in _caches:
+        _caches[filename] = DigestCache(filename)
+    return _caches[filename]
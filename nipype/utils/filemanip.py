@@ -16,13 +16,20 @@ import os.path as op
 import re
 import shutil
 import contextlib
+import glob
 import posixpath
+import threading
 from pathlib import Path
 import simplejson as json
-from time import sleep, time
 
 from .. import logging, config, __version__ as version
 from .misc import is_container
+from .watcher import wait_for_file
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 fmlogger = logging.getLogger("nipype.utils")
 
@@ -181,10 +188,54 @@ def check_forhash(filename):
         return False, None
 
 
-def hash_infile(afile, chunk_len=8192, crypto=hashlib.md5, raise_notfound=False):
+def _xxhash():
+    if xxhash is None:
+        raise ImportError("The xxhash hash algorithm requires the xxhash package.")
+    if hasattr(xxhash, "xxh3_128"):
+        return xxhash.xxh3_128()
+    return xxhash.xxh64()
+
+
+HASH_ALGORITHMS = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s,
+    "xxhash": _xxhash,
+}
+
+
+def get_hash_algorithm(name):
+    """
+    Return the constructor of the hash algorithm called ``name``.
+
+    >>> get_hash_algorithm('blake2b')().name
+    'blake2b'
+    >>> get_hash_algorithm('crc')  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown hash algorithm 'crc'
+
+    """
+    try:
+        return HASH_ALGORITHMS[name.lower()]
+    except KeyError:
+        raise ValueError(
+            "Unknown hash algorithm '%s' (valid algorithms: %s)."
+            % (name, ", ".join(sorted(HASH_ALGORITHMS)))
+        )
+
+
+def hash_infile(afile, chunk_len=1024 * 1024, crypto=hashlib.md5, raise_notfound=False):
     """
     Computes hash of a file using 'crypto' module
 
+    ``crypto`` is a hash constructor (e.g., from :mod:`hashlib`) or the
+    name of one of the :data:`HASH_ALGORITHMS`.
+    The file is read in chunks of ``chunk_len`` bytes into a single buffer.
+
     >>> hash_infile('smri_ants_registration_settings.json')
     'f225785dfb0db9032aa5a0e4f2c730ad'
 
@@ -197,6 +248,8 @@ def hash_infile(afile, chunk_len=8192, crypto=hashlib.md5, raise_notfound=False)
     >>> hash_infile('fsl_motion_outliers_fd.txt')
     'defd1812c22405b1ee4431aac5bbdd73'
 
+    >>> hash_infile('surf01.vtk', crypto='sha1')
+    '4d9a7541627ac9950625745b9e61b004752ed422'
 
     """
     if not op.isfile(afile):
@@ -204,13 +257,17 @@ def hash_infile(afile, chunk_len=8192, crypto=hashlib.md5, raise_notfound=False)
             raise RuntimeError('File "%s" not found.' % afile)
         return None
 
+    if isinstance(crypto, str):
+        crypto = get_hash_algorithm(crypto)
     crypto_obj = crypto()
-    with open(afile, "rb") as fp:
+    buf = bytearray(min(chunk_len, max(op.getsize(afile), 1)))
+    view = memoryview(buf)
+    with open(afile, "rb", buffering=0) as fp:
         while True:
-            data = fp.read(chunk_len)
-            if not data:
+            nbytes = fp.readinto(buf)
+            if not nbytes:
                 break
-            crypto_obj.update(data)
+            crypto_obj.update(view[:nbytes])
     return crypto_obj.hexdigest()
 
 
@@ -602,21 +659,17 @@ def loadcrash(infile, *args):
 
 
 def loadpkl(infile):
-    """Load a zipped or plain cPickled file."""
+    """
+    Load a zipped or plain cPickled file.
+
+    Compression is detected from the contents of the file, so plain pickles
+    with the ``.pklz`` extension (see :func:`savepkl`) are also loaded.
+    """
     infile = Path(infile)
     fmlogger.debug("Loading pkl: %s", infile)
-    pklopen = gzip.open if infile.suffix == ".pklz" else open
 
-    t = time()
     timeout = float(config.get("execution", "job_finished_timeout"))
-    timed_out = True
-    while (time() - t) < timeout:
-        if infile.exists():
-            timed_out = False
-            break
-        fmlogger.debug("'{}' missing; waiting 2s".format(infile))
-        sleep(2)
-    if timed_out:
+    if not infile.exists() and wait_for_file(glob.escape(str(infile)), timeout) is None:
         error_message = (
             "Result file {0} expected, but "
             "does not exist after ({1}) "
@@ -624,8 +677,10 @@ def loadpkl(infile):
         )
         raise IOError(error_message)
 
-    with pklopen(str(infile), "rb") as pkl_file:
+    with open(str(infile), "rb") as pkl_file:
         pkl_contents = pkl_file.read()
+    if pkl_contents[:2] == b"\x1f\x8b":  # gzip magic number
+        pkl_contents = gzip.decompress(pkl_contents)
 
     pkl_metadata = None
 
@@ -642,14 +697,15 @@ def loadpkl(infile):
             pkl_contents = pkl_contents[idx + 1 :]
 
     # Pickle files may contain relative paths that must be resolved relative
-    # to the working directory, so use indirectory while attempting to load
+    # to the folder of the file, which is set as working directory of the
+    # thread (without changing directory) while attempting to load
     unpkl = None
     try:
-        with indirectory(infile.parent):
+        with thread_workdir(infile.parent.absolute()):
             unpkl = pickle.loads(pkl_contents)
     except UnicodeDecodeError:
         # Was this pickle created with Python 2.x?
-        with indirectory(infile.parent):
+        with thread_workdir(infile.parent.absolute()):
             unpkl = pickle.loads(pkl_contents, fix_imports=True, encoding="utf-8")
         fmlogger.info("Successfully loaded pkl in compatibility mode.")
     # Unpickling problems
@@ -709,18 +765,39 @@ def read_stream(stream, logger=None, encoding=None):
     return out.splitlines()
 
 
-def savepkl(filename, record, versioning=False):
+def savepkl(filename, record, versioning=False, compress=None, protocol=None):
+    """
+    Save a (gzip compressed) pickle.
+
+    Parameters
+    ----------
+    filename : str
+        path of the pickle file.
+    record : object
+        object to pickle.
+    versioning : bool
+        whether to prepend the nipype version as JSON metadata.
+    compress : bool or None
+        whether to gzip the pickle. By default, files with the ``.pklz``
+        extension are compressed.
+    protocol : int or None
+        the pickle protocol (defaults to :data:`pickle.DEFAULT_PROTOCOL`).
+
+    """
     from io import BytesIO
 
+    if compress is None:
+        compress = filename.endswith(".pklz")
+
     with BytesIO() as f:
         if versioning:
             metadata = json.dumps({"version": version})
             f.write(metadata.encode("utf-8"))
             f.write("\n".encode("utf-8"))
-        pickle.dump(record, f)
+        pickle.dump(record, f, protocol=protocol)
         content = f.getvalue()
 
-    pkl_open = gzip.open if filename.endswith(".pklz") else open
+    pkl_open = gzip.open if compress else open
     tmpfile = filename + ".tmp"
     with pkl_open(tmpfile, "wb") as pkl_file:
         pkl_file.write(content)
@@ -944,11 +1021,131 @@ def relpath(path, start=None):
     return op.join(*rel_list)
 
 
+class WorkdirLock(object):
+    """
+    A re-entrant lock on the working directory, which is process-wide.
+
+    Code that changes or relies on the working directory holds the lock, so
+    that interfaces run in several threads of a process (e.g., by the
+    ``Thread`` plugin) do not move each other out of their directory.
+    Holders waiting on external processes (which are given their working
+    directory explicitly) let other threads run meanwhile with
+    :meth:`released`.
+
+    >>> lock = WorkdirLock()
+    >>> with lock:
+    ...     with lock:
+    ...         with lock.released():
+    ...             lock._owner is None
+    True
+
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._owner = None
+        self._count = 0
+        self._home = None
+
+    def _wait(self, count):
+        while self._owner is not None:
+            self._cond.wait()
+        self._owner, self._count = threading.get_ident(), count
+        try:
+            self._home = os.getcwd()
+        except OSError:  # The working directory was removed
+            self._home = None
+
+    def acquire(self):
+        with self._cond:
+            if self._owner == threading.get_ident():
+                self._count += 1
+            else:
+                self._wait(1)
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("cannot release un-acquired lock")
+            self._count -= 1
+            if not self._count:
+                self._owner = None
+                self._cond.notify()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args):
+        self.release()
+
+    @contextlib.contextmanager
+    def released(self):
+        """
+        Release the lock (if held) for the duration of the context.
+
+        The working directory is reset to where it was when the lock was
+        acquired, and restored when the lock is acquired back.
+        """
+        with self._cond:
+            count = self._count if self._owner == threading.get_ident() else 0
+            if count:
+                cwd = os.getcwd()
+                if self._home is not None:
+                    os.chdir(self._home)
+                self._owner, self._count = None, 0
+                self._cond.notify()
+        if not count:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._wait(count)
+            os.chdir(cwd)
+
+
+workdir_lock = WorkdirLock()
+
+
+_thread_state = threading.local()
+
+
+def get_thread_workdir():
+    """Return the working directory set with :func:`thread_workdir`, if any"""
+    return getattr(_thread_state, "workdir", None)
+
+
 @contextlib.contextmanager
-def indirectory(path):
-    cwd = os.getcwd()
-    os.chdir(str(path))
+def thread_workdir(path):
+    """
+    Resolve relative paths against ``path`` in the calling thread.
+
+    The working directory of the process is left unchanged: only code
+    looking up :func:`get_thread_workdir` (e.g., the validation of path
+    traits) resolves relative paths against ``path``.
+
+    >>> with thread_workdir('/tmp'):
+    ...     get_thread_workdir()
+    '/tmp'
+    >>> get_thread_workdir() is None
+    True
+
+    """
+    previous = get_thread_workdir()
+    _thread_state.workdir = op.abspath(str(path))
     try:
         yield
     finally:
-        os.chdir(cwd)
+        _thread_state.workdir = previous
+
+
+@contextlib.contextmanager
+def indirectory(path):
+    with workdir_lock, thread_workdir(path):
+        cwd = os.getcwd()
+        os.chdir(str(path))
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Persistent history of the runtime of interfaces
+
+The runtime information of executed interfaces is stored in a SQLite
+database (by default, ``history.sqlite`` within the nipype configuration
+folder, which can be changed with the ``history_file`` option of the
+``monitoring`` section) so that the execution plugins can make informed
+scheduling decisions in subsequent runs.
+
+Along with the duration, the peak memory and CPU usage measured by the
+resource monitor (when enabled) are stored, keyed by the interface and a
+signature of the size of its input files.
+"""
+import math
+import os
+import sqlite3
+from contextlib import closing
+
+from .. import config, logging
+
+logger = logging.getLogger("nipype.utils")
+
+
+def interface_key(interface):
+    """
+    Return the identifier of an interface (class or instance) in the history.
+
+    >>> from nipype.interfaces.utility import IdentityInterface
+    >>> interface_key(IdentityInterface)
+    'nipype.interfaces.utility.base.IdentityInterface'
+
+    """
+    if not isinstance(interface, type):
+        interface = interface.__class__
+    return "%s.%s" % (interface.__module__, interface.__name__)
+
+
+def input_signature(inputs):
+    """
+    Summarize the size of the files among a dictionary of inputs.
+
+    The signature is the number of bits of the total size (in bytes) of
+    the existing files found in the inputs (and nested lists, tuples or
+    dictionaries thereof), so that inputs within a factor of two in size
+    usually share a signature. Inputs without files have signature 0.
+
+    >>> with open('signature.txt', 'w') as f:
+    ...     _ = f.write('x' * 1000)
+    >>> input_signature({'in_file': 'signature.txt', 'n': 3})
+    10
+    >>> input_signature({'in_files': ['signature.txt'] * 3})
+    12
+    >>> input_signature({'n': 3})
+    0
+
+    """
+    total = 0
+    stack = [inputs]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, str) and os.path.isfile(value):
+            total += os.path.getsize(value)
+    return total.bit_length()
+
+
+def runtime_records(result):
+    """
+    Extract records of the execution of interfaces from an interface result.
+
+    Records are tuples ``(interface, signature, start, duration,
+    mem_peak_gb, cpu_percent)``, where the two last fields are ``None``
+    unless the resource monitor was enabled.
+    Results of MapNodes, which hold lists of interfaces and runtimes,
+    produce one record per subnode. Runtimes without timing information
+    or corresponding to failed executions are skipped.
+
+    """
+    interfaces = getattr(result, "interface", None)
+    runtimes = getattr(result, "runtime", None)
+    inputs = getattr(result, "inputs", None)
+    if isinstance(runtimes, list):
+        # Failed subnodes leave a None runtime, but no interface or inputs
+        runtimes = [runtime for runtime in runtimes if runtime is not None]
+        if not isinstance(inputs, list) or len(inputs) != len(runtimes):
+            inputs = [None] * len(runtimes)
+    else:
+        interfaces, runtimes, inputs = [interfaces], [runtimes], [inputs]
+
+    records = []
+    for interface, runtime, values in zip(interfaces, runtimes, inputs):
+        if interface is None or runtime is None:
+            continue
+        if getattr(runtime, "traceback", None):
+            continue
+        start = getattr(runtime, "startTime", None)
+        duration = getattr(runtime, "duration", None)
+        if start is None or duration is None:
+            continue
+        records.append(
+            (
+                interface_key(interface),
+                input_signature(values or {}),
+                start,
+                float(duration),
+                getattr(runtime, "mem_peak_gb", None),
+                getattr(runtime, "cpu_percent", None),
+            )
+        )
+    return records
+
+
+class RuntimeHistory(object):
+    """
+    A SQLite store of the runtime of previously executed interfaces.
+
+    Every execution is stored once, identified by the interface and its
+    start time, so that recording the result of a cached node again does
+    not skew the statistics.
+
+    >>> history = RuntimeHistory(filename='history.sqlite')
+    >>> history.record([
+    ...     ('nipype.interfaces.fsl.BET', 20, '2020-01-01T00:00:00', 2.0, 1.5, 95.0),
+    ...     ('nipype.interfaces.fsl.BET', 21, '2020-01-02T00:00:00', 4.0, 2.5, 180.0)])
+    >>> history.durations()
+    {'nipype.interfaces.fsl.BET': 3.0}
+    >>> history.estimate('nipype.interfaces.fsl.BET', 20)
+    (1.5, 1)
+    >>> history.estimate('nipype.interfaces.fsl.BET', 25)
+    (2.5, 2)
+
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = config.get(
+                "monitoring",
+                "history_file",
+                os.path.join(os.path.dirname(config.data_file), "history.sqlite"),
+            )
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self._resources = None
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        conn = sqlite3.connect(self.filename, timeout=60)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS runtimes ("
+            "interface TEXT NOT NULL, signature INTEGER NOT NULL, "
+            "start TEXT NOT NULL, duration REAL NOT NULL, "
+            "mem_peak_gb REAL, cpu_percent REAL, "
+            "PRIMARY KEY (interface, start))"
+        )
+        return conn
+
+    def record(self, records):
+        """Store a list of records, as returned by :func:`runtime_records`."""
+        if not records:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO runtimes VALUES (?, ?, ?, ?, ?, ?)", records
+                )
+        except sqlite3.Error as exc:
+            logger.warning(
+                "Could not store runtime history in '%s': %s", self.filename, exc
+            )
+
+    def durations(self):
+        """Return a dictionary with the average duration of each interface."""
+        if not os.path.exists(self.filename):
+            return {}
+        try:
+            with closing(self._connect()) as conn:
+                return dict(
+                    conn.execute(
+                        "SELECT interface, AVG(duration) FROM runtimes "
+                        "GROUP BY interface"
+                    )
+                )
+        except sqlite3.Error as exc:
+            logger.warning(
+                "Could not read runtime history from '%s': %s", self.filename, exc
+            )
+        return {}
+
+    def resources(self):
+        """
+        Return the peak memory (GB) and CPU usage (%) of each interface.
+
+        The keys of the dictionary are ``(interface, signature)`` tuples,
+        and the maximum over the executions of the interface with inputs
+        of that signature is reported. Executions that were not monitored
+        are ignored.
+        """
+        if not os.path.exists(self.filename):
+            return {}
+        try:
+            with closing(self._connect()) as conn:
+                return {
+                    (interface, signature): (mem_gb, cpu)
+                    for interface, signature, mem_gb, cpu in conn.execute(
+                        "SELECT interface, signature, MAX(mem_peak_gb), "
+                        "MAX(cpu_percent) FROM runtimes "
+                        "WHERE mem_peak_gb IS NOT NULL AND cpu_percent IS NOT NULL "
+                        "GROUP BY interface, signature"
+                    )
+                }
+        except sqlite3.Error as exc:
+            logger.warning(
+                "Could not read runtime history from '%s': %s", self.filename, exc
+            )
+        return {}
+
+    def estimate(self, interface, signature=None):
+        """
+        Estimate the memory (GB) and number of threads required by an interface.
+
+        The estimate is based on previous executions with inputs of the same
+        signature, or of any signature when there are none (or ``signature``
+        is ``None``). If the interface has never been monitored, ``None`` is
+        returned. The history is read only once per instance.
+        """
+        if self._resources is None:
+            self._resources = self.resources()
+            # Fall back to the peak usage across all the signatures
+            for (name, _), (mem_gb, cpu) in list(self._resources.items()):
+                known = self._resources.get((name, None), (0.0, 0.0))
+                self._resources[(name, None)] = (
+                    max(known[0], mem_gb),
+                    max(known[1], cpu),
+                )
+
+        usage = self._resources.get((interface, signature))
+        if usage is None:
+            usage = self._resources.get((interface, None))
+        if usage is None:
+            return None
+        mem_gb, cpu = usage
+        return mem_gb, max(1, int(math.ceil(cpu / 100.0)))
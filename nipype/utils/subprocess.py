@@ -5,74 +5,85 @@
 """
 import os
 import sys
+import codecs
 import gc
 import errno
-import select
+import selectors
 import locale
 import datetime
+from collections import deque
 from subprocess import Popen, STDOUT, PIPE
-from .filemanip import canonicalize_env, read_stream
+from .filemanip import canonicalize_env, read_stream, workdir_lock
 
 from .. import logging
 
 iflogger = logging.getLogger("nipype.interface")
 
+# Number of the last lines of the output of streamed commands kept in memory
+TAIL_LINES = 10000
+
 
 class Stream(object):
     """Function to capture stdout and stderr streams with timestamps
 
     stackoverflow.com/questions/4984549/merge-and-sync-stdout-and-stderr/5188359
+
+    Lines are decoded as they are read, and written (prefixed with the name
+    of the stream and a timestamp) to the logger and the ``log`` file object,
+    if any, as soon as they are complete. When written to a ``log``, only
+    the last :data:`TAIL_LINES` lines are kept in ``lines`` (and the last
+    prefixed lines are appended to the ``tail`` deque, if any).
     """
 
-    def __init__(self, name, impl):
+    def __init__(self, name, impl, log=None, tail=None):
         self._name = name
         self._impl = impl
+        self._log = log
+        self._tail = tail
         self._buf = ""
-        self._rows = []
-        self._lastidx = 0
+        self.lines = [] if log is None else deque(maxlen=TAIL_LINES)
         self.default_encoding = locale.getdefaultlocale()[1] or "UTF-8"
+        self._decoder = codecs.getincrementaldecoder(self.default_encoding)(
+            errors="replace"
+        )
 
     def fileno(self):
         "Pass-through for file descriptor."
         return self._impl.fileno()
 
-    def read(self, drain=0):
-        "Read from the file descriptor. If 'drain' set, read until EOF."
-        while self._read(drain) is not None:
-            if not drain:
-                break
-
-    def _read(self, drain):
-        "Read from the file descriptor"
-        fd = self.fileno()
-        buf = os.read(fd, 4096).decode(self.default_encoding)
-        if not buf and not self._buf:
-            return None
-        if "\n" not in buf:
-            if not drain:
-                self._buf += buf
-                return []
-
-        # prepend any data previously read, then split into lines and format
-        buf = self._buf + buf
-        if "\n" in buf:
-            tmp, rest = buf.rsplit("\n", 1)
+    def read(self):
+        "Read available data from the file descriptor, return False at EOF."
+        data = os.read(self.fileno(), 65536)
+        buf = self._buf + self._decoder.decode(data, final=not data)
+        if data:  # Keep the incomplete line for later
+            rows = buf.split("\n")
+            self._buf = rows.pop()
         else:
-            tmp = buf
-            rest = None
-        self._buf = rest
-        now = datetime.datetime.now().isoformat()
-        rows = tmp.split("\n")
-        self._rows += [(now, "%s %s:%s" % (self._name, now, r), r) for r in rows]
-        for idx in range(self._lastidx, len(self._rows)):
-            iflogger.info(self._rows[idx][1])
-        self._lastidx = len(self._rows)
+            rows = [buf] if buf else []
+            self._buf = ""
+        if rows:
+            now = datetime.datetime.now().isoformat()
+            for row in rows:
+                row_log = "%s %s:%s" % (self._name, now, row)
+                iflogger.info(row_log)
+                if self._log is not None:
+                    self._log.write(row_log + "\n")
+                if self._tail is not None:
+                    self._tail.append(row_log)
+            if self._log is not None:
+                self._log.flush()
+            self.lines.extend(rows)
+        return bool(data)
 
 
 def run_command(runtime, output=None, timeout=0.01):
     """Run a command, read stdout and stderr, prefix with timestamp.
 
-    The returned runtime contains a merged stdout+stderr log with timestamps
+    The returned runtime contains a merged stdout+stderr log with timestamps.
+    When ``output`` is ``'stream'``, the merged log is written to
+    ``stream.nipype`` in the working directory as the command runs, and the
+    runtime only holds the last :data:`TAIL_LINES` lines of each output.
+    The ``timeout`` argument is not used anymore.
     """
 
     # Init variables
@@ -100,80 +111,73 @@ def run_command(runtime, output=None, timeout=0.01):
         errfile = os.path.join(runtime.cwd, "stderr.nipype")
         stderr = open(errfile, "wb")
 
-    proc = Popen(
-        cmdline,
-        stdout=stdout,
-        stderr=stderr,
-        shell=True,
-        cwd=runtime.cwd,
-        env=env,
-        close_fds=(not sys.platform.startswith("win")),
-    )
-
-    result = {
-        "stdout": [],
-        "stderr": [],
-        "merged": [],
-    }
-
-    if output == "stream":
-        streams = [Stream("stdout", proc.stdout), Stream("stderr", proc.stderr)]
-
-        def _process(drain=0):
-            try:
-                res = select.select(streams, [], [], timeout)
-            except select.error as e:
-                iflogger.info(e)
-                if e[0] == errno.EINTR:
-                    return
-                else:
-                    raise
-            else:
-                for stream in res[0]:
-                    stream.read(drain)
-
-        while proc.returncode is None:
-            proc.poll()
-            _process()
-
-        _process(drain=1)
-
-        # collect results, merge and return
-        result = {}
-        temp = []
-        for stream in streams:
-            rows = stream._rows
-            temp += rows
-            result[stream._name] = [r[2] for r in rows]
-        temp.sort()
-        result["merged"] = [r[1] for r in temp]
-
-    if output.startswith("file"):
-        proc.wait()
-        if outfile is not None:
-            stdout.flush()
-            stdout.close()
-            with open(outfile, "rb") as ofh:
-                stdoutstr = ofh.read()
-            result["stdout"] = read_stream(stdoutstr, logger=iflogger)
-            del stdoutstr
-
-        if errfile is not None:
-            stderr.flush()
-            stderr.close()
-            with open(errfile, "rb") as efh:
-                stderrstr = efh.read()
-            result["stderr"] = read_stream(stderrstr, logger=iflogger)
-            del stderrstr
-
-        if output == "file":
-            result["merged"] = result["stdout"]
-            result["stdout"] = []
-    else:
-        stdout, stderr = proc.communicate()
-        if output == "allatonce":  # Discard stdout and stderr otherwise
-            result["stdout"] = read_stream(stdout, logger=iflogger)
-            result["stderr"] = read_stream(stderr, logger=iflogger)
+    # The command is given its working directory: other threads may use the
+    # working directory of the process while it runs
+    with workdir_lock.released():
+        proc = Popen(
+            cmdline,
+            stdout=stdout,
+            stderr=stderr,
+            shell=True,
+            cwd=runtime.cwd,
+            env=env,
+            close_fds=(not sys.platform.startswith("win")),
+        )
+
+        result = {
+            "stdout": [],
+            "stderr": [],
+            "merged": [],
+        }
+
+        if output == "stream":
+            # Block until any of the streams can be read (no polling), and
+            # write the merged log to disk as lines come
+            logfile = os.path.join(runtime.cwd, "stream.nipype")
+            merged = deque(maxlen=TAIL_LINES)
+            with open(logfile, "w") as log, selectors.DefaultSelector() as selector:
+                streams = [
+                    Stream("stdout", proc.stdout, log, merged),
+                    Stream("stderr", proc.stderr, log, merged),
+                ]
+                for stream in streams:
+                    selector.register(stream, selectors.EVENT_READ)
+                while selector.get_map():
+                    for key, _ in selector.select():
+                        if not key.fileobj.read():
+                            selector.unregister(key.fileobj)
+                proc.wait()
+
+                result["stdout"] = streams[0].lines
+                result["stderr"] = streams[1].lines
+                result["merged"] = merged
+
+        if output.startswith("file"):
+            proc.wait()
+            if outfile is not None:
+                stdout.flush()
+                stdout.close()
+                with open(outfile, "rb") as ofh:
+                    stdoutstr = ofh.read()
+                result["stdout"] = read_stream(stdoutstr, logger=iflogger)
+                del stdoutstr
+
+            if errfile is not None:
+                stderr.flush()
+                stderr.close()
+                with open(errfile, "rb") as efh:
+                    stderrstr = efh.read()
+                result["stderr"] = read_stream(stderrstr, logger=iflogger)
+                del stderrstr
+
+            if output == "file":
+                result["merged"] = result["stdout"]
+                result["stdout"] = []
+        else:
+            stdout, stderr = proc.communicate()
+            if output == "allatonce":  # Discard stdout and stderr otherwise
+                result["stdout"] = read_stream(stdout, logger=iflogger)
+                result["stderr"] = read_stream(stderr, logger=iflogger)
 
     runtime.returncode = proc.returncode
     try:
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+import os
+
+from ..digests import DigestCache, get_digest_cache
+from ..filemanip import hash_infile
+
+
+def test_digest_cache(tmpdir):
+    dbfile = tmpdir.join("digests.sqlite").strpath
+    infile = tmpdir.join("data.txt")
+    infile.write("some data")
+    expected = hash_infile(infile.strpath)
+
+    cache = DigestCache(dbfile, min_size=0)
+    assert cache.hash_infile(infile.strpath) == expected
+    assert cache.hash_infile(infile.strpath) == expected
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    # Digests persist across processes
+    cache = DigestCache(dbfile, min_size=0)
+    assert cache.hash_infile(infile.strpath) == expected
+    assert cache.stats() == {"hits": 1, "misses": 0}
+    # Algorithms are cached separately
+    assert cache.hash_infile(infile.strpath, algorithm="sha1") == hash_infile(
+        infile.strpath, crypto="sha1"
+    )
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    # Modified files are hashed again
+    infile.write("other data")
+    stat = os.stat(infile.strpath)
+    os.utime(infile.strpath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.hash_infile(infile.strpath) == hash_infile(infile.strpath)
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+    assert cache.hash_infile(tmpdir.join("missing").strpath) is None
+    assert cache.hash_infile(tmpdir.strpath) is None
+
+    # Small files are always hashed
+    cache = DigestCache(dbfile)
+    assert cache.hash_infile(infile.strpath) == hash_infile(infile.strpath)
+    assert cache.stats() == {"hits": 0, "misses": 0}
+
+    assert get_digest_cache(dbfile) is get_digest_cache(dbfile)
@@ -3,6 +3,7 @@
 # vi: set ft=python sts=4 ts=4 sw=4 et:
 import os
 import time
+import pickle
 from pathlib import Path
 
 from unittest import mock, SkipTest
@@ -13,6 +14,8 @@ from ...utils.filemanip import (
     load_json,
     fname_presuffix,
     fnames_presuffix,
+    get_hash_algorithm,
+    hash_infile,
     hash_rename,
     check_forhash,
     _parse_mount_table,
@@ -580,6 +583,22 @@ def test_indirectory(tmpdir):
     assert os.getcwd() == tmpdir.strpath
 
 
+@pytest.mark.parametrize("algorithm", ["md5", "sha256", "blake2b"])
+@pytest.mark.parametrize("size", [0, 10, 3 * 1024 * 1024 + 7])
+def test_hash_infile(tmpdir, algorithm, size):
+    import hashlib
+
+    data = os.urandom(size)
+    infile = tmpdir.join("data.bin")
+    infile.write_binary(data)
+
+    expected = hashlib.new(algorithm, data).hexdigest()
+    assert hash_infile(infile.strpath, crypto=algorithm) == expected
+    assert hash_infile(infile.strpath, crypto=get_hash_algorithm(algorithm)) == expected
+    assert hash_infile(infile.strpath, chunk_len=4096, crypto=algorithm) == expected
+    assert hash_infile(tmpdir.join("missing").strpath, crypto=algorithm) is None
+
+
 def test_pklization(tmpdir):
     tmpdir.chdir()
 
@@ -591,6 +610,20 @@ def test_pklization(tmpdir):
     assert os.getcwd() == tmpdir.strpath
 
 
+def test_uncompressed_pklz(tmpdir):
+    tmpdir.chdir()
+
+    obj = {"a": [1, 2], "b": "c"}
+    savepkl("./plain.pklz", obj, compress=False, protocol=pickle.HIGHEST_PROTOCOL)
+    with open("./plain.pklz", "rb") as fobj:
+        assert fobj.read(2) != b"\x1f\x8b"
+    assert loadpkl("./plain.pklz") == obj
+
+    # Compression is detected regardless of the extension
+    savepkl("./compressed.pkl", obj, compress=True)
+    assert loadpkl("./compressed.pkl") == obj
+
+
 class Pickled:
     def __getstate__(self):
         return self.__dict__
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+from ...interfaces.base import Bunch, InterfaceResult
+from ...interfaces.utility import IdentityInterface
+from ..history import RuntimeHistory, input_signature, interface_key, runtime_records
+
+
+def test_runtime_records(tmpdir):
+    tmpdir.chdir()
+    tmpdir.join("in.txt").write("x" * 100)
+    key = interface_key(IdentityInterface)
+    runtime = Bunch(startTime="2020-01-01T00:00:00", duration=1)
+    monitored = Bunch(
+        startTime="2020-01-01T00:00:02", duration=3, mem_peak_gb=1.0, cpu_percent=50.0
+    )
+    failed = Bunch(startTime="2020-01-01T00:00:01", duration=2, traceback="Error")
+    result = InterfaceResult(IdentityInterface, runtime, inputs={"a": "in.txt"})
+    assert runtime_records(result) == [(key, 7, "2020-01-01T00:00:00", 1.0, None, None)]
+
+    # MapNodes store lists of interfaces and runtimes, failed subnodes
+    # leave no interface nor inputs
+    result = InterfaceResult(
+        [IdentityInterface] * 3,
+        [runtime, None, failed, monitored],
+        inputs=[{"a": "in.txt"}, {}, {"a": 1}],
+        outputs=None,
+    )
+    assert runtime_records(result) == [
+        (key, 7, "2020-01-01T00:00:00", 1.0, None, None),
+        (key, 0, "2020-01-01T00:00:02", 3.0, 1.0, 50.0),
+    ]
+    assert runtime_records(None) == []
+
+
+def test_input_signature(tmpdir):
+    tmpdir.join("a.txt").write("x" * 3)
+    tmpdir.join("b.txt").write("x" * 5)
+    files = [tmpdir.join("a.txt").strpath, tmpdir.join("b.txt").strpath]
+    assert input_signature({"in_file": files[0]}) == 2
+    assert input_signature({"in_files": files, "n": 1, "x": None}) == 4
+    assert input_signature({"nested": [(files[0], {"k": files * 2})]}) == 5
+    assert input_signature({"in_file": tmpdir.join("missing").strpath}) == 0
+
+
+def test_runtime_history(tmpdir):
+    history = RuntimeHistory(tmpdir.join("sub", "history.sqlite").strpath)
+    assert history.durations() == {}
+    assert history.resources() == {}
+    assert history.estimate("a") is None
+
+    history.record([("a", 0, "2020-01-01T00:00:00", 1.0, None, None)])
+    # Recording the same execution twice does not alter the history
+    history.record(
+        [
+            ("a", 0, "2020-01-01T00:00:00", 1.0, None, None),
+            ("b", 0, "2020-01-01", 5.0, None, None),
+        ]
+    )
+    history.record([("a", 0, "2020-01-02T00:00:00", 3.0, None, None)])
+    assert history.durations() == {"a": 2.0, "b": 5.0}
+    # Unmonitored executions do not provide resource usage
+    assert history.resources() == {}
+
+    history.record(
+        [
+            ("a", 10, "2020-01-03", 1.0, 0.5, 120.0),
+            ("a", 10, "2020-01-04", 1.0, 0.7, 90.0),
+            ("a", 20, "2020-01-05", 1.0, 4.0, 390.0),
+        ]
+    )
+    assert history.resources() == {("a", 10): (0.7, 120.0), ("a", 20): (4.0, 390.0)}
+    history = RuntimeHistory(tmpdir.join("sub", "history.sqlite").strpath)
+    assert history.estimate("a", 10) == (0.7, 2)
+    # Unknown signatures fall back to the largest usage of the interface
+    assert history.estimate("a", 15) == (4.0, 4)
+    assert history.estimate("a") == (4.0, 4)
+    assert history.estimate("b") is None
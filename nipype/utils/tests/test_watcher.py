@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+from threading import Timer
+from time import time
+
+import pytest
+
+from ..watcher import Inotify, get_watcher, wait_for_file
+
+
+def _write_later(path, delay=0.2):
+    timer = Timer(delay, lambda: path.write(""))
+    timer.start()
+    return timer
+
+
+@pytest.mark.parametrize("watch", [False, True])
+def test_wait_for_file(tmpdir, watch):
+    _write_later(tmpdir.join("result_node.pklz")).join()
+    found = wait_for_file(tmpdir.join("result_*.pklz").strpath, 5, watch=watch)
+    assert found == tmpdir.join("result_node.pklz").strpath
+
+    # Found shortly after being written
+    start = time()
+    _write_later(tmpdir.join("other.pklz"))
+    assert wait_for_file(tmpdir.join("other*").strpath, 5, watch=watch)
+    assert time() - start < 1
+
+    assert wait_for_file(tmpdir.join("missing*").strpath, 0.1, watch=watch) is None
+
+
+def test_inotify(tmpdir):
+    try:
+        watcher = Inotify()
+    except OSError:
+        pytest.skip("inotify is not available")
+    assert get_watcher(False) is None
+
+    with watcher:
+        watcher.add(tmpdir.strpath)
+        assert watcher.wait(0.05) == set()
+        _write_later(tmpdir.join("result_node.pklz"))
+        assert watcher.wait(5) == {tmpdir.join("result_node.pklz").strpath}
+        watcher.remove(tmpdir.strpath)
+        tmpdir.join("other.pklz").write("")
+        assert watcher.wait(0.05) == set()
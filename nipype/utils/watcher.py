@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+"""
+Waiting for files written by other processes (e.g., results of batch jobs)
+
+Files are looked up with exponential backoff: often at first, so that files
+written shortly after are found within milliseconds, then every 2 seconds
+at most.
+When the ``watch_results`` option of the ``execution`` section is on, the
+waits between lookups block on inotify (on Linux), and are interrupted as
+soon as a file is written in the watched directories. Files written from
+other hosts on network filesystems are not notified, and are found by the
+lookups.
+"""
+import ctypes
+import ctypes.util
+import os
+import os.path as op
+import select
+import struct
+from glob import glob
+from time import sleep, time
+
+from .. import config, logging
+from .misc import str2bool
+
+logger = logging.getLogger("nipype.utils")
+
+# Events of files written (and closed), moved into a directory, or created
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_EVENT = struct.Struct("iIII")
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    return _libc
+
+
+class Inotify(object):
+    """
+    Watch directories for written files with inotify.
+
+    >>> watcher = Inotify()  # doctest: +SKIP
+    >>> watcher.add('.')  # doctest: +SKIP
+    >>> watcher.wait(0.1)  # doctest: +SKIP
+    set()
+
+    """
+
+    def __init__(self):
+        libc = _get_libc()
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Could not initialize inotify")
+        self._watches = {}
+        self._directories = {}
+
+    def add(self, directory):
+        """Watch a directory"""
+        if directory in self._directories:
+            return
+        wd = _get_libc().inotify_add_watch(
+            self._fd,
+            os.fsencode(directory),
+            _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE,
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "Could not watch %s" % directory)
+        self._watches[wd] = directory
+        self._directories[directory] = wd
+
+    def watches(self, directory):
+        """Whether a directory is watched"""
+        return directory in self._directories
+
+    def remove(self, directory):
+        """Stop watching a directory"""
+        wd = self._directories.pop(directory, None)
+        if wd is not None:
+            del self._watches[wd]
+            # Fails if the directory was removed, which removed the watch
+            _get_libc().inotify_rm_watch(self._fd, wd)
+
+    def wait(self, timeout):
+        """Wait for files written or created, return their paths"""
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        paths = set()
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return paths
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length]
+            offset += _EVENT.size + length
+            if wd in self._watches:
+                paths.add(op.join(self._watches[wd], os.fsdecode(name.rstrip(b"\0"))))
+        return paths
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_watcher(watch=None):
+    """
+    Return an :class:`Inotify` watcher if enabled and available, else None.
+
+    Watchers are enabled by ``watch`` or, if ``None``, by the configuration.
+    """
+    if watch is None:
+        watch = config.get("execution", "watch_results", "false")
+    if not str2bool(watch):
+        return None
+    try:
+        return Inotify()
+    except (OSError, AttributeError, TypeError) as exc:
+        logger.debug("Cannot watch files with inotify: %s", exc)
+        return None
+
+
+def wait_for_file(pattern, timeout, watch=None, max_delay=2.0):
+    """
+    Wait for a file matching a glob pattern, return its path or ``None``.
+
+    Lookups are spaced by at most ``max_delay`` seconds. ``watch`` enables
+    waiting with inotify (see :func:`get_watcher`).
+
+    >>> wait_for_file('missing_*.pklz', 0.05) is None
+    True
+    >>> open('found_1.pklz', 'w').close()
+    >>> wait_for_file('found_*.pklz', 0)
+    'found_1.pklz'
+
+    """
+    deadline = time() + timeout
+    delay = 0.01
+    watcher = None
+    try:
+        while True:
+            matches = glob(pattern)
+            if matches:
+                return matches[0]
+            remaining = deadline - time()
+            if remaining <= 0:
+                return None
+            if watcher is None:
+                watcher = get_watcher(watch) or False
+                if watcher:
+                    try:
+                        watcher.add(op.dirname(op.abspath(pattern)))
+                    except OSError:  # e.g., the directory does not exist yet
+                        watcher.close()
+                        watcher = False
+                    continue  # Files may have been written meanwhile
+            if watcher:
+                watcher.wait(min(delay, remaining))
+            else:
+                sleep(min(delay, remaining))
+            delay = min(2 * delay, max_delay)
+    finally:
+        if watcher:
+            watcher.close()